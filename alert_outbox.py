@@ -0,0 +1,372 @@
+# ALERT OUTBOX
+# Detected buys are written to a SQLite outbox (one row per chat) and a
+# separate dispatcher delivers them, so a slow Bot API never stalls the
+# monitor and pending alerts survive a restart. Delivery is at-least-once:
+# a row is marked sent only after Telegram accepted the message.
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+import heapq
+from typing import Dict, List, Optional, Set
+
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from alert_subscriptions import SUBSCRIPTIONS, AlertSubscriptions
+from deletions import DELETIONS
+from metrics import BUY_ALERT_LAG, ALERT_DELIVERIES, ALERT_MESSAGES, ALERT_OUTBOX_PENDING
+from token_registry import PRIMARY_TOKEN
+from media import MEDIA
+
+# ===== CONFIGURATION =====
+OUTBOX_DB = os.getenv("OUTBOX_DB", os.getenv("STATS_DB", "weekly_stats.db"))
+
+# Alerts for buys older than this (seconds since the swap) are dropped, not sent
+ALERT_FRESHNESS_SECONDS = float(os.getenv("ALERT_FRESHNESS_SECONDS", "300"))
+
+# Retries with exponential backoff (2, 4, 8... seconds, capped) before giving up
+ALERT_MAX_ATTEMPTS = int(os.getenv("ALERT_MAX_ATTEMPTS", "6"))
+ALERT_MAX_BACKOFF = 60
+
+# Dispatcher wakes up on every enqueue, and at least this often for retries
+DISPATCH_POLL_SECONDS = 1.0
+DISPATCH_BATCH = 50
+
+# After an alert is sent to a chat, further buys for that chat within this many
+# seconds are held and sent together as one digest (0 = one message per buy)
+ALERT_COALESCE_SECONDS = float(os.getenv("ALERT_COALESCE_SECONDS", "10"))
+
+# Delivered and dropped rows are kept this long for inspection
+OUTBOX_KEEP_SECONDS = 86400
+
+ALERT_PHOTO = "buy.png"
+
+
+# Database files the outbox table exists in (checked once per process)
+_schema_ready: Set[str] = set()
+_schema_lock = threading.Lock()
+
+
+def _setup_schema(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS alert_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER,
+        dedup_key TEXT,
+        payload TEXT,
+        event_at REAL,
+        enqueued_at REAL,
+        status TEXT DEFAULT 'pending',
+        attempts INTEGER DEFAULT 0,
+        next_attempt_at REAL,
+        done_at REAL,
+        last_error TEXT,
+        UNIQUE (chat_id, dedup_key)
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON alert_outbox (status, next_attempt_at)")
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=10)
+    if db_path not in _schema_ready:
+        with _schema_lock:
+            if db_path not in _schema_ready:
+                _setup_schema(conn)
+                _schema_ready.add(db_path)
+    return conn
+
+
+def alert_mint(alert: dict) -> str:
+    """Token of an alert (alerts queued before multi-token support are the primary token's)"""
+    return alert.get("mint") or PRIMARY_TOKEN.mint
+
+
+def alert_symbol(alert: dict) -> str:
+    return alert.get("symbol") or PRIMARY_TOKEN.symbol
+
+
+def format_buy_alert(alert: dict) -> str:
+    """Caption for one buy (clean, no links, no web preview)"""
+    wallet = alert["wallet"]
+    return (
+        f"🟢 {alert_symbol(alert)} BUY\n\n"
+        f"💰 Buy Size: ${alert['usd_value']:,.2f} USD / {alert['sol_amount']:.4f} SOL\n"
+        f"👤 Buyer: {wallet[:4]}...{wallet[-4:]}\n"
+        f"📈 Price: ${alert['price_usd']:.10f}\n"
+        f"🏦 MCap: ${alert['market_cap']:,.0f}\n"
+        f"💧 Liquidity: ${alert['liquidity_usd']:,.0f}\n\n"
+        f"Don't miss the chance 🚀"
+    )
+
+
+def format_buy_digest(alerts: List[dict], window: float) -> str:
+    """Caption merging a burst of buys of one token into one message"""
+    total_usd = sum(a["usd_value"] for a in alerts)
+    total_sol = sum(a["sol_amount"] for a in alerts)
+    largest = max(alerts, key=lambda a: a["usd_value"])
+    latest = max(alerts, key=lambda a: a.get("timestamp", 0))
+    wallet = largest["wallet"]
+    span = max(a.get("timestamp", 0) for a in alerts) - min(a.get("timestamp", 0) for a in alerts)
+    return (
+        f"🟢 {alert_symbol(alerts[0])} BUYS x{len(alerts)} (last {max(span, window):.0f}s)\n\n"
+        f"💰 Total: ${total_usd:,.2f} USD / {total_sol:.4f} SOL\n"
+        f"🐋 Largest: ${largest['usd_value']:,.2f} by {wallet[:4]}...{wallet[-4:]}\n"
+        f"📈 Price: ${latest['price_usd']:.10f}\n"
+        f"🏦 MCap: ${latest['market_cap']:,.0f}\n"
+        f"💧 Liquidity: ${latest['liquidity_usd']:,.0f}\n\n"
+        f"Don't miss the chance 🚀"
+    )
+
+
+class AlertOutbox:
+    """Durable queue of alerts, one row per (alert, chat)"""
+
+    def __init__(self, db_path: str = OUTBOX_DB):
+        self.db_path = db_path
+        self.wakeup = asyncio.Event()
+
+    def _enqueue(self, alert: dict, chat_ids: List[int]) -> int:
+        now = time.time()
+        event_at = alert.get("timestamp") or now
+        payload = json.dumps(alert)
+        # A swap between two tracked tokens is one signature but two alerts
+        dedup_key = f"{alert['mint']}:{alert['signature']}" if alert.get("mint") else alert["signature"]
+        conn = _connect(self.db_path)
+        try:
+            with conn:  # all chats or none
+                before = conn.total_changes
+                conn.executemany("""
+                INSERT OR IGNORE INTO alert_outbox (chat_id, dedup_key, payload, event_at, enqueued_at, next_attempt_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """, [(chat_id, dedup_key, payload, event_at, now, now) for chat_id in chat_ids])
+                return conn.total_changes - before
+        finally:
+            conn.close()
+
+    async def enqueue(self, alert: dict, chat_ids: List[int]) -> int:
+        """Queue an alert for every chat; a (token, signature) already queued for a chat is skipped"""
+        added = await asyncio.to_thread(self._enqueue, alert, chat_ids)
+        if added:
+            self.wakeup.set()
+        return added
+
+    def due(self, limit: int = DISPATCH_BATCH) -> List[tuple]:
+        """(id, chat_id, payload, event_at, attempts) of pending rows ready to send"""
+        conn = _connect(self.db_path)
+        try:
+            return conn.execute("""
+            SELECT id, chat_id, payload, event_at, attempts FROM alert_outbox
+            WHERE status = 'pending' AND next_attempt_at <= ?
+            ORDER BY id LIMIT ?
+            """, (time.time(), limit)).fetchall()
+        finally:
+            conn.close()
+
+    def mark(self, row_ids: List[int], status: str, error: Optional[str] = None):
+        """Finish rows: 'sent' or 'dropped'"""
+        now = time.time()
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany("UPDATE alert_outbox SET status=?, done_at=?, last_error=? WHERE id=?",
+                                 [(status, now, error, row_id) for row_id in row_ids])
+        finally:
+            conn.close()
+
+    def retry(self, row_ids: List[int], delay: float, error: str, count_attempt: bool = True):
+        """Make rows due again after a delay"""
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany("""
+                UPDATE alert_outbox SET attempts = attempts + ?, next_attempt_at = ?, last_error = ?
+                WHERE id = ?
+                """, [(int(count_attempt), time.time() + delay, error, row_id) for row_id in row_ids])
+        finally:
+            conn.close()
+
+    def defer(self, row_ids: List[int], until: float):
+        """Hold rows until a coalescing window closes"""
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany("UPDATE alert_outbox SET next_attempt_at=? WHERE id=?",
+                                 [(until, row_id) for row_id in row_ids])
+        finally:
+            conn.close()
+
+    def housekeeping(self) -> int:
+        """Delete finished rows past OUTBOX_KEEP_SECONDS; returns the pending count"""
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                conn.execute("DELETE FROM alert_outbox WHERE status != 'pending' AND done_at < ?",
+                             (time.time() - OUTBOX_KEEP_SECONDS,))
+            return conn.execute("SELECT COUNT(*) FROM alert_outbox WHERE status = 'pending'").fetchone()[0]
+        finally:
+            conn.close()
+
+
+class AlertDispatcher:
+    """
+    Drains the outbox: per-chat order, chats in parallel, retries with backoff.
+    The first buy in a quiet chat goes out at once; buys that follow within
+    coalesce_seconds are merged into one digest when the window closes.
+    """
+
+    def __init__(self, bot, outbox: AlertOutbox, subscriptions: AlertSubscriptions = SUBSCRIPTIONS,
+                 coalesce_seconds: float = ALERT_COALESCE_SECONDS):
+        self.bot = bot
+        self.outbox = outbox
+        self.subscriptions = subscriptions  # per-chat, per-token media and auto-delete settings
+        self.coalesce_seconds = coalesce_seconds
+        self.last_sent: Dict[int, float] = {}  # chat_id -> time of the last message
+        self.window_closes: List[float] = []  # heap of times when held digests become due
+        self.running = False
+        self.sent = 0
+        self.dropped = 0
+        self.messages = 0
+
+    async def run(self):
+        self.running = True
+        last_housekeeping = 0.0
+        print("[OUTBOX] Dispatcher started")
+        while self.running:
+            try:
+                if time.time() - last_housekeeping >= 60:
+                    pending = await asyncio.to_thread(self.outbox.housekeeping)
+                    ALERT_OUTBOX_PENDING.set(value=pending)
+                    last_housekeeping = time.time()
+
+                # Cleared before looking, so an enqueue during delivery is not missed
+                self.outbox.wakeup.clear()
+                rows = await asyncio.to_thread(self.outbox.due)
+                if rows:
+                    by_chat: Dict[int, list] = {}
+                    for row in rows:
+                        by_chat.setdefault(row[1], []).append(row)
+                    await asyncio.gather(*(self._deliver_chat(chat_id, chat_rows)
+                                           for chat_id, chat_rows in by_chat.items()))
+                    continue  # more may be due right away
+            except Exception as e:
+                print(f"[OUTBOX] Dispatcher error: {e}")
+
+            # Sleep until the next enqueue, poll, or the moment a held digest is due
+            timeout = DISPATCH_POLL_SECONDS
+            now = time.time()
+            while self.window_closes and self.window_closes[0] <= now:
+                heapq.heappop(self.window_closes)
+            if self.window_closes:
+                timeout = min(timeout, self.window_closes[0] - now)
+            try:
+                await asyncio.wait_for(self.outbox.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self):
+        self.running = False
+        self.outbox.wakeup.set()
+
+    async def _deliver_chat(self, chat_id: int, rows: list):
+        now = time.time()
+        fresh = []
+        for row in rows:
+            age = now - row[3]
+            if age > ALERT_FRESHNESS_SECONDS:
+                await asyncio.to_thread(self.outbox.mark, [row[0]], "dropped", f"stale ({age:.0f}s)")
+                ALERT_DELIVERIES.inc("dropped_stale")
+                self.dropped += 1
+                print(f"[OUTBOX] Dropped stale alert for chat {chat_id} ({age:.0f}s old)")
+            else:
+                fresh.append(row)
+        if not fresh:
+            return
+
+        by_mint: Dict[str, list] = {}
+        for row in fresh:
+            by_mint.setdefault(alert_mint(json.loads(row[2])), []).append(row)
+        for mint, mint_rows in list(by_mint.items()):
+            if not self.subscriptions.get(chat_id, mint).enabled:
+                # Turned off with /alerts after these were queued
+                await asyncio.to_thread(self.outbox.mark, [row[0] for row in mint_rows], "dropped", "alerts disabled")
+                ALERT_DELIVERIES.inc("dropped_disabled", amount=len(mint_rows))
+                self.dropped += len(mint_rows)
+                del by_mint[mint]
+        if not by_mint:
+            return
+
+        if self.coalesce_seconds <= 0:
+            for mint, mint_rows in by_mint.items():
+                for row in mint_rows:
+                    await self._deliver(chat_id, mint, [row])
+            return
+
+        # The window is per chat; a chat following several tokens gets one digest per token
+        hold_until = self.last_sent.get(chat_id, 0) + self.coalesce_seconds
+        if now < hold_until:
+            await asyncio.to_thread(self.outbox.defer, [row[0] for rows in by_mint.values() for row in rows],
+                                    hold_until)
+            heapq.heappush(self.window_closes, hold_until)
+            return
+        for mint, mint_rows in by_mint.items():
+            await self._deliver(chat_id, mint, mint_rows)
+
+    async def _deliver(self, chat_id: int, mint: str, rows: list):
+        """Send one message for the rows of one token: a single alert or a digest"""
+        row_ids = [row[0] for row in rows]
+        alerts = [json.loads(row[2]) for row in rows]
+        attempts = max(row[4] for row in rows)
+        if len(alerts) == 1:
+            caption = format_buy_alert(alerts[0])
+        else:
+            caption = format_buy_digest(alerts, self.coalesce_seconds)
+
+        sub = self.subscriptions.get(chat_id, mint)
+        try:
+            if sub.media:
+                with open(await MEDIA.get(ALERT_PHOTO), "rb") as photo:
+                    sent_msg = await self.bot.send_photo(chat_id=chat_id, photo=photo, caption=caption)
+            else:
+                sent_msg = await self.bot.send_message(chat_id=chat_id, text=caption)
+        except RetryAfter as e:
+            # Flood control: not a failed attempt, just wait as told
+            await asyncio.to_thread(self.outbox.retry, row_ids, float(e.retry_after), str(e), False)
+            ALERT_DELIVERIES.inc("retry", amount=len(rows))
+            return
+        except (Forbidden, BadRequest) as e:
+            # Bot removed from the chat, chat gone, etc. Retrying will not help
+            await asyncio.to_thread(self.outbox.mark, row_ids, "dropped", str(e))
+            ALERT_DELIVERIES.inc("dropped_failed", amount=len(rows))
+            self.dropped += len(rows)
+            print(f"[OUTBOX] Dropped {len(rows)} alert(s) for chat {chat_id}: {e}")
+            return
+        except Exception as e:
+            if attempts + 1 >= ALERT_MAX_ATTEMPTS:
+                await asyncio.to_thread(self.outbox.mark, row_ids, "dropped", str(e))
+                ALERT_DELIVERIES.inc("dropped_failed", amount=len(rows))
+                self.dropped += len(rows)
+                print(f"[OUTBOX] Giving up on {len(rows)} alert(s) for chat {chat_id} after {attempts + 1} attempts: {e}")
+            else:
+                await asyncio.to_thread(self.outbox.retry, row_ids, min(ALERT_MAX_BACKOFF, 2 ** (attempts + 1)), str(e))
+                ALERT_DELIVERIES.inc("retry", amount=len(rows))
+                print(f"[OUTBOX] Send to {chat_id} failed (attempt {attempts + 1}), will retry: {e}")
+            return
+
+        # A crash before this line means the alert is sent again after restart (at-least-once)
+        await asyncio.to_thread(self.outbox.mark, row_ids, "sent")
+        self.last_sent[chat_id] = time.time()
+        ALERT_DELIVERIES.inc("sent", amount=len(rows))
+        ALERT_MESSAGES.inc("single" if len(rows) == 1 else "digest")
+        self.sent += len(rows)
+        self.messages += 1
+        for alert, row in zip(alerts, rows):
+            BUY_ALERT_LAG.observe(max(0.0, time.time() - alert.get("timestamp", row[3])))
+        total = sum(a["usd_value"] for a in alerts)
+        print(f"[BUY ALERT] Sent alert for ${total:.2f} ({len(rows)} buy(s)) to chat {chat_id}")
+
+        if sub.delete_delay > 0:
+            DELETIONS.schedule(sent_msg, sub.delete_delay)
@@ -0,0 +1,231 @@
+# ALERT SUBSCRIPTIONS
+# Per-chat, per-token buy alert settings (on/off, USD threshold, auto-delete
+# delay, photo or text only), stored in SQLite and set by chat admins with
+# /alerts. Buys are routed through a sorted threshold index per token: a chat
+# gets a buy when its threshold is at or below the buy's USD value.
+# Chats get the primary token's alerts by default; other tokens are opt-in.
+
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from token_registry import PRIMARY_TOKEN, token_symbol
+
+# ===== CONFIGURATION =====
+SUBSCRIPTIONS_DB = os.getenv("SUBSCRIPTIONS_DB", os.getenv("STATS_DB", "weekly_stats.db"))
+
+# Defaults for chats that never ran /alerts
+DEFAULT_MIN_USD = float(os.getenv("MIN_BUY_USD", "1000"))
+DEFAULT_DELETE_DELAY = int(os.getenv("ALERT_DELETE_DELAY", "120"))
+
+# Lowest threshold a chat may set (keeps dust out of the outbox)
+MIN_THRESHOLD_USD = 50.0
+
+# How often the monitor checks the table for changes made by other processes
+SUBSCRIPTIONS_REFRESH_SECONDS = 15
+
+
+@dataclass
+class Subscription:
+    """Alert settings of one chat for one token"""
+    chat_id: int
+    mint: str = PRIMARY_TOKEN.mint
+    enabled: bool = True
+    min_usd: float = DEFAULT_MIN_USD
+    delete_delay: int = DEFAULT_DELETE_DELAY  # 0 keeps alerts
+    media: bool = True  # False sends text-only alerts
+
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS alert_subscriptions (
+    chat_id INTEGER,
+    mint TEXT,
+    enabled INTEGER,
+    min_usd REAL,
+    delete_delay INTEGER,
+    media INTEGER,
+    updated_at REAL,
+    PRIMARY KEY (chat_id, mint)
+)
+"""
+
+
+# Database files set up (and migrated) by this process
+_schema_ready: Set[str] = set()
+_schema_lock = threading.Lock()
+
+
+def _setup_schema(conn: sqlite3.Connection):
+    conn.execute(_CREATE_TABLE)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(alert_subscriptions)")]
+    if "mint" not in columns:
+        _migrate_to_per_token(conn)
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=10)
+    if db_path not in _schema_ready:
+        with _schema_lock:
+            if db_path not in _schema_ready:
+                _setup_schema(conn)
+                _schema_ready.add(db_path)
+    return conn
+
+
+def _migrate_to_per_token(conn: sqlite3.Connection):
+    """Settings saved before multi-token support belong to the primary token"""
+    with conn:
+        conn.execute("ALTER TABLE alert_subscriptions RENAME TO alert_subscriptions_old")
+        conn.execute(_CREATE_TABLE)
+        conn.execute("""
+        INSERT INTO alert_subscriptions (chat_id, mint, enabled, min_usd, delete_delay, media, updated_at)
+        SELECT chat_id, ?, enabled, min_usd, delete_delay, media, updated_at FROM alert_subscriptions_old
+        """, (PRIMARY_TOKEN.mint,))
+        conn.execute("DROP TABLE alert_subscriptions_old")
+    print(f"[ALERTS] Migrated alert settings to per-token ({PRIMARY_TOKEN.symbol})")
+
+
+def default_subscription(chat_id: int, mint: str = PRIMARY_TOKEN.mint) -> Subscription:
+    """Settings of a chat that never ran /alerts for this token"""
+    return Subscription(chat_id, mint, enabled=mint == PRIMARY_TOKEN.mint)
+
+
+class ThresholdIndex:
+    """Enabled chats sorted by threshold; route() is O(log n + matches)"""
+
+    def __init__(self, subscriptions: Iterable[Subscription]):
+        ordered = sorted((s.min_usd, s.chat_id) for s in subscriptions if s.enabled)
+        self.thresholds = [t for t, _ in ordered]
+        self.chat_ids = [c for _, c in ordered]
+
+    def route(self, usd_value: float) -> List[int]:
+        return self.chat_ids[:bisect_right(self.thresholds, usd_value)]
+
+    @property
+    def min_threshold(self) -> Optional[float]:
+        return self.thresholds[0] if self.thresholds else None
+
+    def __len__(self):
+        return len(self.chat_ids)
+
+
+class AlertSubscriptions:
+    """In-memory copy of the subscriptions table plus one routing index per token"""
+
+    def __init__(self, db_path: str = SUBSCRIPTIONS_DB):
+        self.db_path = db_path
+        self.by_chat: Dict[Tuple[int, str], Subscription] = {}
+        self.indexes: Dict[str, ThresholdIndex] = {}
+        self._version = None
+        self._checked_at: float = 0
+
+    def ensure(self, chat_ids: Iterable[int]):
+        """Give chats without a row the default settings for the primary token"""
+        now = time.time()
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany("""
+                INSERT OR IGNORE INTO alert_subscriptions
+                    (chat_id, mint, enabled, min_usd, delete_delay, media, updated_at)
+                VALUES (?, ?, 1, ?, ?, 1, ?)
+                """, [(chat_id, PRIMARY_TOKEN.mint, DEFAULT_MIN_USD, DEFAULT_DELETE_DELAY, now)
+                      for chat_id in chat_ids])
+        finally:
+            conn.close()
+
+    def _table_version(self, conn) -> tuple:
+        return conn.execute("SELECT COUNT(*), MAX(updated_at) FROM alert_subscriptions").fetchone()
+
+    def load(self):
+        """Read the whole table and rebuild the indexes"""
+        conn = _connect(self.db_path)
+        try:
+            version = self._table_version(conn)
+            rows = conn.execute(
+                "SELECT chat_id, mint, enabled, min_usd, delete_delay, media FROM alert_subscriptions"
+            ).fetchall()
+        finally:
+            conn.close()
+        self.by_chat = {
+            (chat_id, mint): Subscription(chat_id, mint, bool(enabled), min_usd, delete_delay, bool(media))
+            for chat_id, mint, enabled, min_usd, delete_delay, media in rows
+        }
+        by_mint: Dict[str, List[Subscription]] = {}
+        for sub in self.by_chat.values():
+            by_mint.setdefault(sub.mint, []).append(sub)
+        self.indexes = {mint: ThresholdIndex(subs) for mint, subs in by_mint.items()}
+        self._version = version
+
+    def _changed(self) -> bool:
+        conn = _connect(self.db_path)
+        try:
+            return self._table_version(conn) != self._version
+        finally:
+            conn.close()
+
+    async def refresh(self, force: bool = False):
+        """Reload if another process (e.g. /alerts on a follower replica) changed the table"""
+        if not force and time.time() - self._checked_at < SUBSCRIPTIONS_REFRESH_SECONDS:
+            return
+        self._checked_at = time.time()
+        if force or await asyncio.to_thread(self._changed):
+            await asyncio.to_thread(self.load)
+            for mint, index in self.indexes.items():
+                print(f"[ALERTS] {token_symbol(mint)}: {len(index)} chat(s) subscribed, "
+                      f"lowest threshold ${self.min_threshold(mint):,.0f}")
+
+    def min_threshold(self, mint: str = PRIMARY_TOKEN.mint) -> float:
+        """Smallest buy of this token any chat wants to hear about (inf if none)"""
+        index = self.indexes.get(mint)
+        lowest = index.min_threshold if index else None
+        return float("inf") if lowest is None else lowest
+
+    def route(self, mint: str, usd_value: float) -> List[int]:
+        """Chats subscribed to the token whose threshold is at or below the buy"""
+        index = self.indexes.get(mint)
+        return index.route(usd_value) if index else []
+
+    def get(self, chat_id: int, mint: str = PRIMARY_TOKEN.mint) -> Subscription:
+        return self.by_chat.get((chat_id, mint)) or default_subscription(chat_id, mint)
+
+
+def load_subscription(chat_id: int, mint: str = PRIMARY_TOKEN.mint,
+                      db_path: str = SUBSCRIPTIONS_DB) -> Subscription:
+    """Settings of one chat for one token (defaults if it has no row)"""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT enabled, min_usd, delete_delay, media FROM alert_subscriptions WHERE chat_id=? AND mint=?",
+            (chat_id, mint)
+        ).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return default_subscription(chat_id, mint)
+    return Subscription(chat_id, mint, bool(row[0]), row[1], row[2], bool(row[3]))
+
+
+def save_subscription(sub: Subscription, db_path: str = SUBSCRIPTIONS_DB):
+    """Insert or replace one chat's settings for one token"""
+    conn = _connect(db_path)
+    try:
+        with conn:
+            conn.execute("""
+            INSERT INTO alert_subscriptions (chat_id, mint, enabled, min_usd, delete_delay, media, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(chat_id, mint) DO UPDATE SET
+                enabled=excluded.enabled, min_usd=excluded.min_usd, delete_delay=excluded.delete_delay,
+                media=excluded.media, updated_at=excluded.updated_at
+            """, (sub.chat_id, sub.mint, int(sub.enabled), sub.min_usd, sub.delete_delay, int(sub.media), time.time()))
+    finally:
+        conn.close()
+
+
+# Shared by the monitor (routing) and the dispatcher (per-chat delivery settings)
+SUBSCRIPTIONS = AlertSubscriptions()
@@ -0,0 +1,154 @@
+# ADAPTIVE POLLING BENCHMARK
+# Runs the real monitor loop against benchmarks/fake_services.py on a
+# quiet / burst / quiet swap trace and compares the old fixed 5 s polling
+# with the adaptive interval: RPC calls spent and swap detection delay.
+# Optionally injects a run of 429s to exercise the backoff.
+#
+#   python benchmarks/adaptive_polling.py
+#   python benchmarks/adaptive_polling.py --minutes 30 --speed 30 --reject 3
+#
+# Time is compressed by --speed (intervals, 429 backoff, trace and RPC rate are scaled),
+# so figures are reported in real-time units.
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic import percentile  # noqa: E402
+
+
+def swap_trace(rng, minutes, burst_minutes, burst_gap, quiet_per_hour):
+    """Offsets (seconds) of swaps: a quiet period, a burst in the middle, quiet again"""
+    duration = minutes * 60
+    burst_start = (duration - burst_minutes * 60) / 2
+    offsets, t = [], 0.0
+    while True:
+        t += rng.expovariate(quiet_per_hour / 3600)
+        if t >= duration:
+            break
+        offsets.append(t)
+    t = burst_start
+    while t < burst_start + burst_minutes * 60:
+        offsets.append(t)
+        t += rng.expovariate(1 / burst_gap)
+    return sorted(offsets), duration
+
+
+async def run(services, label, interval_args, trace, duration, speed, reject, rng):
+    import buy_alert
+    from buy_alert import BuyAlertMonitor
+    from rpc_budget import RpcBudget, AdaptiveInterval, RPC_MAX_RPS, RPC_BURST
+
+    budget = buy_alert.RPC_BUDGET = RpcBudget(rps=RPC_MAX_RPS * speed, burst=RPC_BURST)
+    detected = {}
+
+    class TimedMonitor(BuyAlertMonitor):
+        async def _parse_transaction(self, state, signature, tx_data):
+            swap = await super()._parse_transaction(state, signature, tx_data)
+            if swap:
+                detected.setdefault(signature, time.perf_counter())
+            return swap
+
+    monitor = TimedMonitor(None, [])
+    for state in monitor.tokens.values():
+        state.interval = AdaptiveInterval(*(seconds / speed for seconds in interval_args))
+    await monitor._poll_once()  # skip swaps from earlier runs
+    services.rpc_calls = services.rpc_requests = services.rpc_rejected = 0
+
+    monitor.running = True
+    loop_task = asyncio.create_task(monitor._monitor_loop())
+    created = {}
+    started = time.perf_counter()
+    for i, offset in enumerate(trace):
+        delay = started + offset / speed - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if reject and i == len(trace) // 2:
+            services.reject_rpc(reject)
+        swap = await asyncio.to_thread(services.swap, "buy", rng.uniform(1, 10))
+        created[swap["signature"]] = services.pool.created_at[swap["signature"]]
+    await asyncio.sleep(max(0.0, started + duration / speed - time.perf_counter()))
+    await asyncio.sleep(20 / speed)  # let the last poll land
+    monitor.running = False
+    await loop_task
+
+    delays = [(detected[sig] - t) * speed for sig, t in created.items() if sig in detected]
+    return {
+        "label": label,
+        "calls": services.rpc_calls,
+        "requests": services.rpc_requests,
+        "rejected": services.rpc_rejected,
+        "detected": len(delays),
+        "swaps": len(created),
+        "p50": percentile(delays, 50),
+        "p99": percentile(delays, 99),
+        "budget": budget.used_today,
+    }
+
+
+async def main(args):
+    tmp = tempfile.mkdtemp(prefix="suolala-polling-")
+    base = f"http://127.0.0.1:{args.port}"
+    os.environ.update({
+        "SOLANA_RPC_HTTP": f"{base}/rpc",
+        "DEXSCREENER_BASE": base,
+        "STATS_DB": os.path.join(tmp, "weekly_stats.db"),
+        "METRICS_PORT": "0",
+    })
+
+    from fake_services import FakeServices
+    import rpc_budget
+    from rpc_budget import POLL_START_SECONDS, POLL_MIN_SECONDS, POLL_MAX_SECONDS
+    from http_client import HTTP
+
+    rpc_budget.RPC_BACKOFF_BASE /= args.speed
+    rpc_budget.RPC_BACKOFF_MAX /= args.speed
+
+    services = FakeServices(port=args.port, latency_ms={"rpc": args.rpc_ms})
+    services.start()
+    rng = random.Random(args.seed)
+    trace, duration = swap_trace(rng, args.minutes, args.burst_minutes, args.burst_gap, args.quiet_per_hour)
+    print(f"{len(trace)} swaps over {args.minutes} min ({args.burst_minutes} min burst) at {args.speed}x\n")
+    try:
+        results = [
+            await run(services, "fixed 5s", (5, 5, 5), trace, duration, args.speed, args.reject, random.Random(1)),
+            await run(services, f"adaptive {POLL_MIN_SECONDS:g}-{POLL_MAX_SECONDS:g}s",
+                      (POLL_START_SECONDS, POLL_MIN_SECONDS, POLL_MAX_SECONDS),
+                      trace, duration, args.speed, args.reject, random.Random(1)),
+        ]
+    finally:
+        await HTTP.close()
+        services.stop()
+
+    for r in results:
+        per_hour = r["calls"] * 3600 / duration
+        print(f"== {r['label']} ==")
+        print(f"  {r['calls']} RPC calls in {r['requests']} requests ({per_hour:,.0f}/h), "
+              f"{r['rejected']} answered 429")
+        print(f"  detected {r['detected']}/{r['swaps']} swaps, delay p50 {r['p50']:.1f}s p99 {r['p99']:.1f}s")
+    fixed, adaptive = results
+    if fixed["calls"]:
+        print(f"\nAdaptive polling used {1 - adaptive['calls'] / fixed['calls']:.0%} fewer RPC calls")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fixed vs adaptive buy monitor polling")
+    parser.add_argument("--minutes", type=float, default=20, help="length of the trace")
+    parser.add_argument("--burst-minutes", type=float, default=4)
+    parser.add_argument("--burst-gap", type=float, default=3, help="mean seconds between swaps in the burst")
+    parser.add_argument("--quiet-per-hour", type=float, default=12, help="swaps per hour outside the burst")
+    parser.add_argument("--reject", type=int, default=2, help="answer this many RPC requests with 429 mid-run")
+    parser.add_argument("--speed", type=float, default=20, help="time compression factor")
+    parser.add_argument("--rpc-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8732)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,148 @@
+# ALERT REPLAY BENCHMARK
+# Replays a stream of buys through the real alert outbox and dispatcher
+# (with a FakeBot) and compares outbound Telegram calls and alert delay
+# with and without burst coalescing.
+#
+#   python benchmarks/alert_replay.py                          # synthetic 2h with 3 pumps
+#   python benchmarks/alert_replay.py --window 10 --chats 5 --speed 50
+#   python benchmarks/alert_replay.py --from-history weekly_stats.db   # recorded buys
+#
+# Time is compressed by --speed: inter-arrival gaps and the coalescing window
+# are both divided by it, so the results match a real-time run.
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+os.environ.setdefault("METRICS_PORT", "0")
+os.chdir(ROOT)  # buy.png is relative
+
+from alert_outbox import AlertOutbox, AlertDispatcher  # noqa: E402
+from buy_alert import MIN_BUY_USD  # noqa: E402
+from fake_bot import FakeBot  # noqa: E402
+from synthetic import percentile  # noqa: E402
+
+
+def synthetic_buys(rng, duration, pumps, pump_buys, pump_seconds, background_per_hour):
+    """(offset_seconds, usd_value, wallet) for a quiet day with a few pumps"""
+    events = []
+    t = 0.0
+    while True:
+        t += rng.expovariate(background_per_hour / 3600)
+        if t >= duration:
+            break
+        events.append(t)
+    for _ in range(pumps):
+        start = rng.uniform(0, duration - pump_seconds)
+        events.extend(start + rng.uniform(0, pump_seconds) for _ in range(pump_buys))
+    return [(t, MIN_BUY_USD * rng.lognormvariate(0.5, 0.6), f"Wallet{rng.randrange(10**9):09d}xxxxxxxxxxxxxxxxxxxxxxxxxx")
+            for t in sorted(events)]
+
+
+def history_buys(db_path):
+    """Recorded buys at or above MIN_BUY_USD from the swaps table (see buy_history.py)"""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT timestamp, usd_value, wallet FROM swaps WHERE side='buy' AND usd_value >= ? ORDER BY timestamp",
+            (MIN_BUY_USD,)
+        ).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        raise SystemExit(f"No buys >= ${MIN_BUY_USD:.0f} in {db_path}")
+    t0 = rows[0][0]
+    return [(ts - t0, usd, wallet) for ts, usd, wallet in rows]
+
+
+async def replay(events, chats, window, speed, api_latency):
+    db_path = os.path.join(tempfile.mkdtemp(prefix="suolala-replay-"), "outbox.db")
+    fake_bot = FakeBot(api_latency=api_latency)
+    await fake_bot.initialize()
+    fake_bot.reset_calls()
+
+    outbox = AlertOutbox(db_path)
+    dispatcher = AlertDispatcher(fake_bot, outbox, coalesce_seconds=window / speed)
+    task = asyncio.create_task(dispatcher.run())
+
+    chat_ids = [-100500 - i for i in range(chats)]
+    started = time.perf_counter()
+    for i, (offset, usd, wallet) in enumerate(events):
+        delay = started + offset / speed - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await outbox.enqueue({
+            "signature": f"replay-{i}", "wallet": wallet, "sol_amount": usd / 150, "token_amount": 0,
+            "usd_value": usd, "timestamp": time.time(),
+            "price_usd": 0.0004, "market_cap": 400_000, "liquidity_usd": 250_000,
+        }, chat_ids)
+
+    while await asyncio.to_thread(outbox.housekeeping):
+        await asyncio.sleep(0.05)
+    dispatcher.stop()
+    await task
+
+    conn = sqlite3.connect(db_path)
+    delays = [(done - queued) * speed for done, queued in
+              conn.execute("SELECT done_at, enqueued_at FROM alert_outbox WHERE status='sent'")]
+    conn.close()
+    return {
+        "window": window,
+        "alerts": len(events) * chats,
+        "delivered": dispatcher.sent,
+        "messages": fake_bot.calls["sendPhoto"],
+        "api_calls": fake_bot.outbound_calls,
+        "upload_mb": fake_bot.upload_bytes / 1e6,
+        "delay_p50": percentile(delays, 50),
+        "delay_p99": percentile(delays, 99),
+    }
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    if args.from_history:
+        events = history_buys(args.from_history)
+    else:
+        events = synthetic_buys(rng, args.duration, args.pumps, args.pump_buys, args.pump_seconds,
+                                args.background_per_hour)
+    span = events[-1][0] if events else 0
+    print(f"Replaying {len(events)} buys over {span / 60:.1f} min to {args.chats} chat(s) at {args.speed}x")
+
+    baseline = await replay(events, args.chats, 0, args.speed, args.api_latency_ms / 1000)
+    coalesced = await replay(events, args.chats, args.window, args.speed, args.api_latency_ms / 1000)
+    for r in (baseline, coalesced):
+        label = "one message per buy" if not r["window"] else f"coalesce {r['window']:.0f}s"
+        print(f"\n== {label} ==")
+        print(f"  {r['delivered']}/{r['alerts']} alerts in {r['messages']} sendPhoto calls "
+              f"({r['api_calls']} API calls, {r['upload_mb']:.1f} MB uploaded)")
+        print(f"  alert delay (replay time): p50 {r['delay_p50']:.1f}s, p99 {r['delay_p99']:.1f}s")
+
+    if baseline["messages"]:
+        saved = 1 - coalesced["messages"] / baseline["messages"]
+        print(f"\nCoalescing cut outbound alert messages by {saved:.0%} "
+              f"({baseline['messages']} -> {coalesced['messages']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay buys through the alert outbox with and without coalescing")
+    parser.add_argument("--from-history", help="replay recorded buys from this SQLite DB")
+    parser.add_argument("--window", type=float, default=10, help="coalescing window in seconds")
+    parser.add_argument("--chats", type=int, default=3)
+    parser.add_argument("--speed", type=float, default=100, help="time compression factor")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0)
+    parser.add_argument("--duration", type=float, default=7200, help="synthetic: seconds of activity")
+    parser.add_argument("--pumps", type=int, default=3, help="synthetic: number of bursts")
+    parser.add_argument("--pump-buys", type=int, default=40, help="synthetic: buys per burst")
+    parser.add_argument("--pump-seconds", type=float, default=90, help="synthetic: burst length")
+    parser.add_argument("--background-per-hour", type=float, default=6, help="synthetic: quiet-time buys per hour")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,82 @@
+# CONCURRENCY BENCHMARK
+# Drives synthetic updates through the update processor with a mix of slow
+# (upstream-bound, like /translate or /randomnft) and fast handlers, and
+# compares sequential processing with PerChatUpdateProcessor.
+#
+#   python benchmarks/concurrency_bench.py --updates 500 --slow-ratio 0.1
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from collections import defaultdict
+
+from telegram import Update
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import text_update, percentile  # noqa: E402
+from update_processor import PerChatUpdateProcessor  # noqa: E402
+
+
+async def run_scenario(limit: int, updates: list, slow_ids: set, slow_s: float, fast_s: float) -> dict:
+    processor = PerChatUpdateProcessor(limit)
+    seen = defaultdict(list)
+    fast_latency = []
+
+    async def handler(update: Update, enqueued: float):
+        seen[update.effective_chat.id].append(update.update_id)
+        await asyncio.sleep(slow_s if update.update_id in slow_ids else fast_s)
+        if update.update_id not in slow_ids:
+            fast_latency.append(time.perf_counter() - enqueued)
+
+    started = time.perf_counter()
+    tasks = []
+    for update in updates:
+        # Same hand-off Application._update_fetcher does for concurrent processors
+        coroutine = handler(update, time.perf_counter())
+        tasks.append(asyncio.create_task(processor.process_update(update, coroutine)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    in_order = all(ids == sorted(ids) for ids in seen.values())
+    return {
+        "limit": limit,
+        "elapsed_s": elapsed,
+        "throughput": len(updates) / elapsed,
+        "fast_p50_ms": percentile(fast_latency, 50) * 1000,
+        "fast_p99_ms": percentile(fast_latency, 99) * 1000,
+        "per_chat_order_kept": in_order,
+    }
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    updates = [
+        Update.de_json(text_update(-1000 - rng.randrange(args.chats), rng.randrange(1, 200), "gm"), None)
+        for _ in range(args.updates)
+    ]
+    slow_ids = {u.update_id for u in updates if rng.random() < args.slow_ratio}
+
+    print(f"{args.updates} updates, {args.chats} chats, {len(slow_ids)} slow "
+          f"({args.slow_ms}ms) / fast ({args.fast_ms}ms)")
+    print(f"{'limit':>6} {'elapsed':>9} {'upd/s':>8} {'fast p50':>10} {'fast p99':>10}  order")
+    for limit in args.limits:
+        r = await run_scenario(limit, updates, slow_ids, args.slow_ms / 1000, args.fast_ms / 1000)
+        print(f"{r['limit']:>6} {r['elapsed_s']:>8.2f}s {r['throughput']:>8.1f} "
+              f"{r['fast_p50_ms']:>8.1f}ms {r['fast_p99_ms']:>8.1f}ms  {'ok' if r['per_chat_order_kept'] else 'BROKEN'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent update processing")
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--slow-ratio", type=float, default=0.05)
+    parser.add_argument("--slow-ms", type=float, default=1000)
+    parser.add_argument("--fast-ms", type=float, default=5)
+    parser.add_argument("--limits", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
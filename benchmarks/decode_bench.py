@@ -0,0 +1,161 @@
+# DECODE BENCHMARK
+# Time and memory to decode getTransaction (jsonParsed) responses: the old
+# path (stdlib json into dicts, kept whole) vs solana_tx views, with stdlib
+# json and with orjson when installed.
+#
+#   python benchmarks/decode_bench.py                         # fake pool swaps, padded to mainnet size
+#   python benchmarks/decode_bench.py --payloads recorded/    # *.json getTransaction responses
+#
+# Payloads are generated by fake_services.PoolSimulator and padded with the
+# bulk a routed mainnet swap carries (log messages, parsed inner instructions,
+# lookup-table accounts), so sizes are representative; record real responses
+# with `curl -d '{"jsonrpc":"2.0","id":1,"method":"getTransaction","params":
+# ["<sig>",{"encoding":"jsonParsed","maxSupportedTransactionVersion":0}]}'`.
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_services import PoolSimulator, fake_pubkey, TOKEN_PROGRAM  # noqa: E402
+from solana_tx import decode_transaction  # noqa: E402
+from http_client import orjson  # noqa: E402
+
+BATCH = 20  # transactions fetched per RPC batch, held until parsed
+
+
+def pad_like_mainnet(tx: dict, rng: random.Random) -> dict:
+    """Add the fields a Jupiter-routed mainnet swap carries but the monitor never reads"""
+    meta, message = tx["meta"], tx["transaction"]["message"]
+    for i in range(12):
+        message["accountKeys"].append({"pubkey": fake_pubkey(f"lut-{rng.random()}"), "signer": False,
+                                       "writable": i % 2 == 0, "source": "lookupTable"})
+    message["recentBlockhash"] = fake_pubkey(f"bh-{rng.random()}")
+    message["addressTableLookups"] = [{"accountKey": fake_pubkey(f"alt-{rng.random()}"),
+                                       "writableIndexes": list(range(6)), "readonlyIndexes": list(range(6))}]
+    message["instructions"] = [
+        {"programId": "ComputeBudget111111111111111111111111111111", "accounts": [], "data": "3DdGGhkhJbjm",
+         "stackHeight": None},
+        {"programId": "JUP6LkbZbjS1jKKwapdHNy74zcZ3tLUZoi5QNyVTaV4",
+         "accounts": [k["pubkey"] for k in message["accountKeys"][:14]],
+         "data": fake_pubkey(f"ixdata-{rng.random()}", 120), "stackHeight": None},
+    ] + message["instructions"]
+    transfer = {
+        "parsed": {"info": {"amount": "1000000", "authority": fake_pubkey("auth"),
+                            "destination": fake_pubkey(f"d-{rng.random()}"),
+                            "source": fake_pubkey(f"s-{rng.random()}")}, "type": "transfer"},
+        "program": "spl-token", "programId": TOKEN_PROGRAM, "stackHeight": 3,
+    }
+    meta["innerInstructions"] = [{"index": 1, "instructions": [dict(transfer) for _ in range(6)]},
+                                 {"index": 2, "instructions": [dict(transfer) for _ in range(3)]}]
+    meta["logMessages"] = [f"Program {fake_pubkey(f'p-{i % 5}')} invoke [{1 + i % 3}]" if i % 3 == 0 else
+                           f"Program log: Instruction: {rng.choice(['Swap', 'Transfer', 'Route'])} "
+                           f"consumed {rng.randrange(10**5)} of 1400000 compute units"
+                           for i in range(45)]
+    meta["loadedAddresses"] = {"writable": [fake_pubkey(f"w-{i}") for i in range(6)],
+                               "readonly": [fake_pubkey(f"r-{i}") for i in range(6)]}
+    meta["rewards"] = []
+    meta["computeUnitsConsumed"] = rng.randrange(80_000, 300_000)
+    meta["status"] = {"Ok": None}
+    return tx
+
+
+def generated_payloads(count: int, bare: bool):
+    rng = random.Random(5)
+    pool = PoolSimulator()
+    payloads = []
+    for _ in range(count):
+        swap = pool.swap(rng.choice(["buy", "sell"]), rng.uniform(0.5, 20))
+        tx = pool.transactions[swap["signature"]]
+        if not bare:
+            tx = pad_like_mainnet(tx, rng)
+        payloads.append(json.dumps({"jsonrpc": "2.0", "id": 1, "result": tx}).encode())
+    return payloads
+
+
+def recorded_payloads(directory: str):
+    payloads = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name), "rb") as f:
+                body = f.read()
+            if b'"result"' not in body[:200]:
+                body = b'{"jsonrpc":"2.0","id":1,"result":' + body + b"}"
+            payloads.append(body)
+    if not payloads:
+        raise SystemExit(f"No *.json payloads in {directory}")
+    return payloads
+
+
+def old_decode(body):
+    # what `await resp.json()` did: text first, then stdlib json, dict kept as is
+    return json.loads(body.decode("utf-8"))["result"]
+
+
+def view_decode(loads):
+    return lambda body: decode_transaction(loads(body)["result"])
+
+
+def time_per_tx(decode, payloads, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for body in payloads:
+            decode(body)
+        best = min(best, time.perf_counter() - started)
+    return best / len(payloads)
+
+
+def memory(decode, payloads):
+    """(peak bytes while decoding one tx, bytes retained per tx while a batch is held)"""
+    peak = 0
+    for body in payloads[:50]:
+        tracemalloc.start()
+        decode(body)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    batch = payloads[:BATCH]
+    tracemalloc.start()
+    held = [decode(body) for body in batch]
+    retained = tracemalloc.get_traced_memory()[0] / len(batch)
+    tracemalloc.stop()
+    del held
+    return peak, retained
+
+
+def main(args):
+    payloads = recorded_payloads(args.payloads) if args.payloads else generated_payloads(args.count, args.bare)
+    sizes = sorted(len(p) for p in payloads)
+    print(f"{len(payloads)} payloads, median {sizes[len(sizes) // 2] / 1024:.1f} KB\n")
+
+    decoders = [("json -> dict (old)", old_decode), ("json -> view", view_decode(json.loads))]
+    if orjson is not None:
+        decoders.append(("orjson -> view", view_decode(orjson.loads)))
+    else:
+        print("(orjson not installed, skipping)\n")
+
+    print(f"{'decoder':<20} {'us/tx':>8} {'peak KB/tx':>11} {'held KB/tx':>11}")
+    baseline = None
+    for label, decode in decoders:
+        per_tx = time_per_tx(decode, payloads, args.repeat)
+        peak, retained = memory(decode, payloads)
+        baseline = baseline or (per_tx, retained)
+        print(f"{label:<20} {per_tx * 1e6:>8.1f} {peak / 1024:>11.1f} {retained / 1024:>11.2f}"
+              f"   ({baseline[0] / per_tx:.1f}x speed, {baseline[1] / retained:.0f}x less held)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode time and memory of getTransaction payloads")
+    parser.add_argument("--payloads", help="directory of recorded getTransaction responses (*.json)")
+    parser.add_argument("--count", type=int, default=500, help="generated payloads")
+    parser.add_argument("--bare", action="store_true", help="do not pad generated payloads")
+    parser.add_argument("--repeat", type=int, default=15)
+    main(parser.parse_args())
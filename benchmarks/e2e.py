@@ -0,0 +1,166 @@
+# END-TO-END BENCHMARK
+# Runs the real bot (polling through the real Updater) and BuyAlertMonitor
+# against benchmarks/fake_services.py and measures, fully offline:
+#   - command round trip: update injected into getUpdates -> reply received
+#   - buy-to-alert: swap lands on the fake chain -> sendPhoto alert received
+#
+#   python benchmarks/e2e.py --commands 200 --buys 10
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic import command_update, percentile  # noqa: E402
+
+ALERT_CHATS = [-100900, -100901]
+
+
+def summarize(label, values, unit_scale=1000, unit="ms"):
+    print(f"  {label}: n={len(values)} p50={percentile(values, 50) * unit_scale:.1f}{unit} "
+          f"p99={percentile(values, 99) * unit_scale:.1f}{unit} max={max(values, default=0) * unit_scale:.1f}{unit}")
+
+
+async def wait_for(predicate, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if predicate():
+            return True
+        await asyncio.sleep(0.02)
+    return False
+
+
+async def command_round_trip(services, count, rate):
+    """Inject commands via getUpdates and time until each reply arrives"""
+    rng = random.Random(7)
+    injected = {}  # message_id -> inject time
+    started = time.perf_counter()
+    for i in range(count):
+        # Commands only: plain chatter gets no reply (keyword auto-replies are not enabled)
+        payload = command_update(-100800 - rng.randrange(5), 10 + rng.randrange(50),
+                                 rng.choice(["start", "rules", "motivate", "count", "pricecheck"]))
+        injected[payload["message"]["message_id"]] = time.perf_counter()
+        services.inject_update(payload)
+        if rate:
+            await asyncio.sleep(1 / rate)
+
+    def replies():
+        return {int(c["params"]["reply_to_message_id"]): c["t"]
+                for c in services.calls() if c["params"].get("reply_to_message_id")}
+
+    await wait_for(lambda: len(replies()) >= len(injected), 30)
+    elapsed = time.perf_counter() - started
+    done = replies()
+    latencies = [done[mid] - t for mid, t in injected.items() if mid in done]
+    print(f"\n== command round trip ({count} updates, {len(latencies)} answered, {elapsed:.2f}s) ==")
+    summarize("inject -> reply", latencies)
+
+
+async def buy_to_alert(services, buys, interval, timeout):
+    """Script buys on the fake chain and time until the alert photo arrives"""
+    rng = random.Random(11)
+    swaps = []
+    for _ in range(buys):
+        sol = rng.uniform(8, 40)  # $1.2k-$6k at the fake SOL price
+        swap = services.swap("buy", sol)
+        swap["t"] = time.perf_counter()
+        swaps.append(swap)
+        await asyncio.sleep(interval)
+
+    def alerts():
+        found = {}
+        for call in services.calls("sendPhoto"):
+            caption = call["params"].get("caption", "")
+            for swap in swaps:
+                short = f"{swap['wallet'][:4]}...{swap['wallet'][-4:]}"
+                if short in caption:
+                    found.setdefault(swap["signature"], []).append(call["t"])
+        return found
+
+    expected = len(swaps) * len(ALERT_CHATS)
+    await wait_for(lambda: sum(len(v) for v in alerts().values()) >= expected, timeout)
+    found = alerts()
+    first = [min(found[s["signature"]]) - s["t"] for s in swaps if s["signature"] in found]
+    last = [max(found[s["signature"]]) - s["t"] for s in swaps if s["signature"] in found]
+    print(f"\n== buy to alert ({len(swaps)} buys x {len(ALERT_CHATS)} chats, "
+          f"{sum(len(v) for v in found.values())}/{expected} alerts, {services.rpc_calls} RPC calls) ==")
+    summarize("swap -> first chat alert", first)
+    summarize("swap -> last chat alert", last)
+
+
+async def main(args):
+    # Module-level config in bot.py/buy_alert.py is read at import time,
+    # so the environment must be in place before anything imports them
+    base = f"http://127.0.0.1:{args.port}"
+    tmp = tempfile.mkdtemp(prefix="suolala-e2e-")
+    os.environ.update({
+        "TELEGRAM_API_BASE": base,
+        "SOLANA_RPC_HTTP": f"{base}/rpc",
+        "DEXSCREENER_BASE": base,
+        "MAGICEDEN_API_BASE": base,
+        "BOT_TOKEN": "123456:FAKE-TOKEN-FOR-E2E",
+        "STATS_DB": os.path.join(tmp, "weekly_stats.db"),
+        "KNOWN_CHATS_FILE": os.path.join(tmp, "known_chats.txt"),
+        "METRICS_PORT": "0",
+        "LATENCY_REPORT_EVERY": "0",
+        # Measure every buy on its own (alert_replay.py covers coalescing)
+        "ALERT_COALESCE_SECONDS": "0",
+    })
+    os.chdir(ROOT)
+
+    from fake_services import FakeServices
+    services = FakeServices(port=args.port, latency_ms={
+        "telegram": args.telegram_ms, "rpc": args.rpc_ms,
+        "dexscreener": args.http_ms, "magiceden": args.http_ms,
+    })
+    services.start()
+
+    import bot
+    from buy_alert import BuyAlertMonitor
+    from ratelimit import CommandRateLimiter
+
+    bot.command_limiter = CommandRateLimiter(user_limits=(1e9, 1e9), chat_limits=(1e9, 1e9),
+                                             global_limits=(1e9, 1e9))
+    application = bot.build_application()
+    await application.initialize()
+    await application.updater.start_polling(poll_interval=0, timeout=10)
+    await application.start()
+
+    monitor = BuyAlertMonitor(application.bot, ALERT_CHATS)
+    monitor_task = asyncio.create_task(monitor.start())
+    await asyncio.sleep(0.5)
+
+    try:
+        if args.commands:
+            await command_round_trip(services, args.commands, args.rate)
+        if args.buys:
+            await buy_to_alert(services, args.buys, args.buy_interval, args.timeout)
+    finally:
+        await monitor.stop()
+        monitor_task.cancel()
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        services.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end latency benchmark")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--commands", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=50, help="command injection rate (updates/s, 0 = burst)")
+    parser.add_argument("--buys", type=int, default=6)
+    parser.add_argument("--buy-interval", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--telegram-ms", type=float, default=0, help="simulated Bot API latency")
+    parser.add_argument("--rpc-ms", type=float, default=0, help="simulated Solana RPC latency")
+    parser.add_argument("--http-ms", type=float, default=0, help="simulated DexScreener/Magic Eden latency")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,105 @@
+# EXPORT BENCHMARK
+# Runs export.py (as its own process, like a manager would) over a seeded
+# weekly_stats.db while this process keeps committing message counts the
+# way track_messages does. Compares the old rollback journal with WAL:
+# how long the bot's commits wait while the export reads, and the export rate.
+#
+#   python benchmarks/export_bench.py
+#   python benchmarks/export_bench.py --rows 1000000 --writes-per-second 200
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import resource
+import threading
+import subprocess
+
+from synthetic import percentile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+
+def seed(path, rows, journal_mode):
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    conn.execute("CREATE TABLE stats (user_id INTEGER, chat_id INTEGER, year_week TEXT, count INTEGER, "
+                 "PRIMARY KEY (user_id, chat_id, year_week))")
+    conn.execute("CREATE TABLE users (user_id INTEGER PRIMARY KEY, username TEXT, first_name TEXT)")
+    rng = random.Random(3)
+    users = max(1, rows // 20)
+    with conn:
+        conn.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                         ((u, f"user{u}", f"Name {u}") for u in range(users)))
+        conn.executemany("INSERT OR IGNORE INTO stats VALUES (?, ?, ?, ?)",
+                         ((rng.randrange(users), -100 - rng.randrange(5), f"2024-W{rng.randrange(1, 53):02d}",
+                           rng.randrange(1, 500)) for _ in range(rows)))
+    conn.close()
+
+
+def writer(path, journal_mode, per_second, stop, waits, errors):
+    """track_messages: one upsert and commit per message"""
+    conn = sqlite3.connect(path, timeout=5)
+    if journal_mode == "wal":
+        conn.execute("PRAGMA synchronous=NORMAL")
+    rng = random.Random(5)
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            conn.execute("INSERT INTO stats VALUES (?, -100, '2099-W01', 1) "
+                         "ON CONFLICT(user_id, chat_id, year_week) DO UPDATE SET count = count + 1",
+                         (rng.randrange(1000),))
+            conn.commit()
+            waits.append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            conn.rollback()
+            errors.append(time.perf_counter() - started)
+        time.sleep(max(0.0, 1 / per_second - (time.perf_counter() - started)))
+    conn.close()
+
+
+def run(args, journal_mode):
+    tmp = tempfile.mkdtemp(prefix="suolala-export-")
+    path = os.path.join(tmp, "weekly_stats.db")
+    seed(path, args.rows, journal_mode)
+
+    stop, waits, errors = threading.Event(), [], []
+    thread = threading.Thread(target=writer, args=(path, journal_mode, args.writes_per_second, stop, waits, errors))
+    thread.start()
+    time.sleep(0.5)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "export.py"), "stats", "users", "--db", path,
+                             "--out", os.path.join(tmp, "out"), "--format", args.format],
+                            capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    time.sleep(0.5)
+    stop.set()
+    thread.join()
+
+    print(f"== {journal_mode} ==")
+    for line in result.stderr.strip().splitlines():
+        print("  " + line)
+    print(f"  export process {elapsed:.2f}s, peak RSS {resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024:.0f}MB")
+    if waits:
+        print(f"  bot commits: {len(waits)} ok, p50 {percentile(waits, 50) * 1000:.1f} ms  "
+              f"p99 {percentile(waits, 99) * 1000:.1f} ms  max {max(waits) * 1000:.0f} ms")
+    print(f"  bot commits failed with 'database is locked': {len(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export while the bot writes: rollback journal vs WAL")
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--writes-per-second", type=float, default=100)
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv")
+    args = parser.parse_args()
+    print(f"{args.rows:,} stats rows, bot committing {args.writes_per_second:g} messages/s during the export\n")
+    for mode in ("delete", "wal"):
+        run(args, mode)
+
+
+if __name__ == "__main__":
+    main()
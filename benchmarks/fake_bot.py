@@ -0,0 +1,88 @@
+# FAKE BOT
+# ExtBot that answers Bot API calls locally and records every outgoing call
+
+import time
+import asyncio
+import itertools
+from collections import Counter
+
+from telegram.ext import ExtBot
+
+FAKE_TOKEN = "123456:FAKE-TOKEN-FOR-BENCHMARKS"
+FAKE_BOT_USER = {
+    "id": 123456,
+    "is_bot": True,
+    "first_name": "Suolala",
+    "username": "FakeSuolalaBot",
+    "can_join_groups": True,
+    "can_read_all_group_messages": True,
+    "supports_inline_queries": False,
+}
+
+# Methods that return a Message object
+_MESSAGE_METHODS = {
+    "sendMessage", "sendPhoto", "sendAnimation", "sendDocument", "sendSticker",
+    "editMessageText", "editMessageCaption", "editMessageMedia",
+}
+
+
+class FakeBot(ExtBot):
+    """Bot whose API calls never leave the process"""
+
+    def __init__(self, api_latency: float = 0.0, **kwargs):
+        super().__init__(token=FAKE_TOKEN, **kwargs)
+        # Bot attributes are frozen after __init__
+        with self._unfrozen():
+            self.calls = Counter()
+            self.api_latency = api_latency
+            self.upload_bytes = 0
+            self._message_ids = itertools.count(100000)
+            self._file_ids = itertools.count(1)
+
+    def reset_calls(self):
+        self.calls.clear()
+        with self._unfrozen():
+            self.upload_bytes = 0
+
+    @property
+    def outbound_calls(self) -> int:
+        """Calls a real bot would have made to Telegram (getMe excluded)"""
+        return sum(n for method, n in self.calls.items() if method != "getMe")
+
+    async def _do_post(self, endpoint, data, **kwargs):
+        self.calls[endpoint] += 1
+        for value in data.values():
+            size = len(getattr(value, "input_file_content", b"") or b"")
+            if size:
+                with self._unfrozen():
+                    self.upload_bytes += size
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+        return self._fake_result(endpoint, data)
+
+    def _fake_result(self, endpoint, data):
+        if endpoint == "getMe":
+            return FAKE_BOT_USER
+        if endpoint not in _MESSAGE_METHODS:
+            return True
+
+        chat_id = int(data.get("chat_id", 0))
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"},
+            "from": FAKE_BOT_USER,
+        }
+        if "text" in data:
+            message["text"] = str(data["text"])
+        if "caption" in data:
+            message["caption"] = str(data["caption"])
+        if endpoint == "sendPhoto":
+            message["photo"] = [self._fake_file(width=1280, height=720)]
+        if endpoint == "sendAnimation":
+            message["animation"] = self._fake_file(width=480, height=480, duration=3)
+        return message
+
+    def _fake_file(self, **extra):
+        n = next(self._file_ids)
+        return {"file_id": f"fake-file-{n}", "file_unique_id": f"fake-unique-{n}", **extra}
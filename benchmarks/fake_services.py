@@ -0,0 +1,448 @@
+# FAKE SERVICES
+# Local stand-ins for the Telegram Bot API, Solana JSON-RPC, DexScreener and
+# Magic Eden, so the whole bot (commands and buy alerts) runs offline.
+#
+# Everything is served from one aiohttp server running in its own thread
+# (benchmarks make blocking calls into it, e.g. swap(), which would otherwise
+# deadlock against a server on the bot's event loop):
+#
+#   TELEGRAM_API_BASE   = http://HOST:PORT
+#   SOLANA_RPC_HTTP     = http://HOST:PORT/rpc
+#   DEXSCREENER_BASE    = http://HOST:PORT
+#   MAGICEDEN_API_BASE  = http://HOST:PORT
+#
+# Run standalone to poke at it manually:
+#   python benchmarks/fake_services.py --port 8700
+
+import os
+import sys
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import itertools
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from buy_alert import WSOL_MINT, SOL_USDC_PAIR, RAYDIUM_AMM_V4  # noqa: E402
+from pricing import RAYDIUM_AUTHORITY  # noqa: E402
+from token_registry import SUOLALA_MINT, DEXSCREENER_PAIR, TrackedToken  # noqa: E402
+
+TOKEN_PROGRAM = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+POOL_TOKEN_VAULT = "FakeTokenVau1t1111111111111111111111111111111"
+POOL_SOL_VAULT = "FakeSo1Vau1t11111111111111111111111111111111"
+TOKEN_DECIMALS = 6
+TOKEN_SUPPLY = 1_000_000_000
+LAMPORTS = 1_000_000_000
+
+_B58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def fake_pubkey(seed: str, length: int = 44) -> str:
+    """Deterministic base58-looking address"""
+    digest = hashlib.sha256(seed.encode()).digest() * 2
+    return "".join(_B58[b % 58] for b in digest[:length])
+
+
+def _ui_amount(raw: int, decimals: int) -> dict:
+    ui = raw / 10 ** decimals
+    return {"amount": str(raw), "decimals": decimals, "uiAmount": ui, "uiAmountString": repr(ui)}
+
+
+class PoolSimulator:
+    """Constant-product token/SOL pool (SUOLALA by default) that produces jsonParsed swap transactions"""
+
+    def __init__(self, sol_reserve: float = 800.0, token_reserve: float = 300_000_000.0,
+                 sol_usd: float = 150.0, mint: str = SUOLALA_MINT, pair: str = DEXSCREENER_PAIR,
+                 token_vault: str = POOL_TOKEN_VAULT, sol_vault: str = POOL_SOL_VAULT):
+        self.mint = mint
+        self.pair = pair
+        self.token_vault = token_vault
+        self.sol_vault = sol_vault
+        self.sol_reserve = sol_reserve
+        self.token_reserve = token_reserve
+        self.sol_usd = sol_usd
+        self.slot = 250_000_000
+        self.transactions: Dict[str, dict] = {}
+        self.signatures: deque = deque(maxlen=1000)  # newest first
+        self.created_at: Dict[str, float] = {}
+        self.wallet_balances: Dict[str, int] = {}
+        self._seq = itertools.count(1)
+
+    @property
+    def price_sol(self) -> float:
+        return self.sol_reserve / self.token_reserve
+
+    def swap(self, side: str, sol_amount: float, wallet: Optional[str] = None) -> dict:
+        """Apply a buy (SOL in) or sell (SOL out) and record the transaction"""
+        n = next(self._seq)
+        wallet = wallet or fake_pubkey(f"wallet-{self.mint}-{n}")
+        signature = fake_pubkey(f"sig-{self.mint}-{n}", 88)
+        self.slot += random.randint(1, 4)
+
+        pre_sol, pre_tok = self.sol_reserve, self.token_reserve
+        if side == "buy":
+            tokens = self.token_reserve * sol_amount / (self.sol_reserve + sol_amount)
+            self.sol_reserve += sol_amount
+            self.token_reserve -= tokens
+        else:
+            tokens = self.token_reserve * sol_amount / (self.sol_reserve - sol_amount)
+            self.sol_reserve -= sol_amount
+            self.token_reserve += tokens
+
+        raw_tokens = int(tokens * 10 ** TOKEN_DECIMALS)
+        wallet_pre = self.wallet_balances.get(wallet, raw_tokens if side == "sell" else 0)
+        wallet_post = wallet_pre + raw_tokens if side == "buy" else max(0, wallet_pre - raw_tokens)
+        self.wallet_balances[wallet] = wallet_post
+
+        fee = 5000
+        lamports_pre = 50 * LAMPORTS
+        lamport_delta = int(sol_amount * LAMPORTS)
+        lamports_post = lamports_pre - lamport_delta - fee if side == "buy" else lamports_pre + lamport_delta - fee
+
+        def balances(tok_reserve, sol_reserve, wallet_raw):
+            entries = [
+                {"accountIndex": 2, "mint": self.mint, "owner": RAYDIUM_AUTHORITY, "programId": TOKEN_PROGRAM,
+                 "uiTokenAmount": _ui_amount(int(tok_reserve * 10 ** TOKEN_DECIMALS), TOKEN_DECIMALS)},
+                {"accountIndex": 3, "mint": WSOL_MINT, "owner": RAYDIUM_AUTHORITY, "programId": TOKEN_PROGRAM,
+                 "uiTokenAmount": _ui_amount(int(sol_reserve * LAMPORTS), 9)},
+            ]
+            if wallet_raw is not None:
+                entries.append({"accountIndex": 1, "mint": self.mint, "owner": wallet, "programId": TOKEN_PROGRAM,
+                                "uiTokenAmount": _ui_amount(wallet_raw, TOKEN_DECIMALS)})
+            return entries
+
+        block_time = int(time.time())
+        tx = {
+            "slot": self.slot,
+            "blockTime": block_time,
+            "meta": {
+                "err": None,
+                "fee": fee,
+                "preBalances": [lamports_pre, 2039280, 2039280, int(pre_sol * LAMPORTS), 1],
+                "postBalances": [lamports_post, 2039280, 2039280, int(self.sol_reserve * LAMPORTS), 1],
+                "preTokenBalances": balances(pre_tok, pre_sol, wallet_pre or None),
+                "postTokenBalances": balances(self.token_reserve, self.sol_reserve, wallet_post),
+                "innerInstructions": [],
+                "logMessages": [],
+            },
+            "transaction": {
+                "signatures": [signature],
+                "message": {
+                    "accountKeys": [
+                        {"pubkey": wallet, "signer": True, "writable": True, "source": "transaction"},
+                        {"pubkey": fake_pubkey(f"ata-{wallet}"), "signer": False, "writable": True, "source": "transaction"},
+                        {"pubkey": self.token_vault, "signer": False, "writable": True, "source": "transaction"},
+                        {"pubkey": self.sol_vault, "signer": False, "writable": True, "source": "transaction"},
+                        {"pubkey": RAYDIUM_AMM_V4, "signer": False, "writable": False, "source": "transaction"},
+                    ],
+                    "instructions": [{"programId": RAYDIUM_AMM_V4, "accounts": [], "data": "swap"}],
+                },
+            },
+            "version": 0,
+        }
+        self.transactions[signature] = tx
+        self.signatures.appendleft({"signature": signature, "slot": self.slot, "blockTime": block_time,
+                                    "err": None, "memo": None, "confirmationStatus": "confirmed"})
+        self.created_at[signature] = time.perf_counter()
+        return {"signature": signature, "wallet": wallet, "side": side, "sol": sol_amount,
+                "tokens": tokens, "usd": sol_amount * self.sol_usd}
+
+    def dexscreener_pair(self) -> dict:
+        price_usd = self.price_sol * self.sol_usd
+        return {
+            "chainId": "solana",
+            "pairAddress": self.pair,
+            "priceNative": f"{self.price_sol:.12f}",
+            "priceUsd": f"{price_usd:.12f}",
+            "fdv": price_usd * TOKEN_SUPPLY,
+            "liquidity": {"usd": 2 * self.sol_reserve * self.sol_usd},
+            "priceChange": {"h24": 0},
+        }
+
+
+class FakeServices:
+    """Fake Bot API + Solana RPC + DexScreener + Magic Eden on one port"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8700, latency_ms: Optional[Dict[str, float]] = None,
+                 upload_mbps: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = {k: v / 1000 for k, v in (latency_ms or {}).items()}
+        self.upload_mbps = upload_mbps  # simulated uplink for Bot API requests (0 = unlimited)
+        self.pool = PoolSimulator()
+        self.pools: Dict[str, PoolSimulator] = {self.pool.mint: self.pool}  # by mint
+        self.bot_user = {"id": 123456, "is_bot": True, "first_name": "Suolala", "username": "FakeSuolalaBot",
+                         "can_join_groups": True, "can_read_all_group_messages": True,
+                         "supports_inline_queries": False}
+        self.telegram_calls: List[dict] = []
+        self.rpc_calls = 0
+        self.rpc_requests = 0  # HTTP requests; a JSON-RPC batch is one request
+        self.rpc_rejects = 0  # upcoming RPC requests to answer with 429 (see reject_rpc)
+        self.rpc_retry_after: Optional[float] = None
+        self.rpc_rejected = 0
+        self.connections = 0  # TCP connections accepted (latency_ms["connect"] delays their first request)
+        self._peers = set()
+        self._updates: List[dict] = []
+        self._updates_event: Optional[asyncio.Event] = None
+        self._message_ids = itertools.count(1_000_000)
+        self._file_ids = itertools.count(1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def env(self) -> Dict[str, str]:
+        """Environment variables that point the bot at this stack"""
+        return {
+            "TELEGRAM_API_BASE": self.base_url,
+            "SOLANA_RPC_HTTP": f"{self.base_url}/rpc",
+            "DEXSCREENER_BASE": self.base_url,
+            "MAGICEDEN_API_BASE": self.base_url,
+        }
+
+    # ===== TELEGRAM =====
+    async def _delay(self, service: str):
+        if self.latency.get(service):
+            await asyncio.sleep(self.latency[service])
+
+    async def _telegram(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = {}
+        if request.can_read_body:
+            if request.content_type == "application/json":
+                params = await request.json()
+            else:
+                form = await request.post()
+                params = {k: (v if isinstance(v, str) else f"<file {getattr(v, 'filename', '')}>")
+                          for k, v in form.items()}
+        if self.upload_mbps and request.content_length:
+            await asyncio.sleep(request.content_length * 8 / (self.upload_mbps * 1e6))
+        await self._delay("telegram")
+
+        if method == "getUpdates":
+            return self._ok(await self._get_updates(params))
+
+        self.telegram_calls.append({"t": time.perf_counter(), "method": method, "params": params})
+        if method == "getMe":
+            return self._ok(self.bot_user)
+        if method.startswith("send") or method.startswith("edit"):
+            return self._ok(self._message_result(method, params))
+        return self._ok(True)
+
+    async def _get_updates(self, params: dict) -> list:
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._updates_event.clear()
+            try:
+                await asyncio.wait_for(self._updates_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(self._updates[:100])
+
+    def _message_result(self, method: str, params: dict) -> dict:
+        chat_id = int(params.get("chat_id", 0))
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"},
+            "from": self.bot_user,
+        }
+        for key in ("text", "caption"):
+            if key in params:
+                message[key] = str(params[key])
+        n = next(self._file_ids)
+        if method == "sendPhoto":
+            message["photo"] = [{"file_id": f"photo-{n}", "file_unique_id": f"u-photo-{n}", "width": 1280, "height": 720}]
+        if method == "sendAnimation":
+            message["animation"] = {"file_id": f"anim-{n}", "file_unique_id": f"u-anim-{n}",
+                                    "width": 480, "height": 480, "duration": 3}
+        return message
+
+    @staticmethod
+    def _ok(result) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+    def inject_update(self, payload: dict):
+        """Queue an Update for the bot's next getUpdates (thread-safe)"""
+        def _add():
+            self._updates.append(payload)
+            self._updates_event.set()
+        self._loop.call_soon_threadsafe(_add)
+
+    def calls(self, method: Optional[str] = None) -> List[dict]:
+        return [c for c in list(self.telegram_calls) if method is None or c["method"] == method]
+
+    def reject_rpc(self, count: int, retry_after: Optional[float] = None):
+        """Answer the next `count` RPC requests with 429 (optionally with Retry-After)"""
+        self.rpc_rejects, self.rpc_retry_after = count, retry_after
+
+    def add_pool(self, symbol: str) -> TrackedToken:
+        """Another token/SOL pool; returns the token to pass to BuyAlertMonitor or TRACKED_TOKENS"""
+        token = TrackedToken(symbol, fake_pubkey(f"mint-{symbol}"), fake_pubkey(f"pair-{symbol}"),
+                             fake_pubkey(f"vault-{symbol}"), fake_pubkey(f"solvault-{symbol}"))
+        self.pools[token.mint] = PoolSimulator(mint=token.mint, pair=token.pair,
+                                               token_vault=token.token_vault, sol_vault=token.sol_vault)
+        return token
+
+    # ===== SOLANA RPC =====
+    async def _rpc(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        await self._delay("rpc")
+        self.rpc_requests += 1
+        if self.rpc_rejects > 0:
+            self.rpc_rejects -= 1
+            self.rpc_rejected += 1
+            headers = {"Retry-After": str(self.rpc_retry_after)} if self.rpc_retry_after is not None else None
+            return web.json_response({"jsonrpc": "2.0", "error": {"code": 429, "message": "Too many requests"}},
+                                     status=429, headers=headers)
+        if isinstance(body, list):
+            return web.json_response([self._rpc_one(item) for item in body])
+        return web.json_response(self._rpc_one(body))
+
+    def _rpc_one(self, body: dict) -> dict:
+        self.rpc_calls += 1
+        method = body.get("method")
+        params = body.get("params") or []
+        result = None
+        if method == "getSignaturesForAddress":
+            options = params[1] if len(params) > 1 else {}
+            pool = self.pools.get(params[0])
+            entries = list(pool.signatures) if pool else []
+            before, until = options.get("before"), options.get("until")
+            if before:
+                positions = [i for i, e in enumerate(entries) if e["signature"] == before]
+                entries = entries[positions[0] + 1:] if positions else entries
+            result = []
+            for entry in entries:
+                if until and entry["signature"] == until:
+                    break
+                result.append(entry)
+            result = result[:options.get("limit", 1000)]
+        elif method == "getTransaction":
+            result = next((p.transactions[params[0]] for p in self.pools.values()
+                           if params[0] in p.transactions), None)
+        elif method == "getSlot":
+            result = self.pool.slot
+        return {"jsonrpc": "2.0", "id": body.get("id"), "result": result}
+
+    # ===== DEXSCREENER =====
+    async def _dexscreener(self, request: web.Request) -> web.Response:
+        await self._delay("dexscreener")
+        pairs = []
+        by_pair = {pool.pair: pool for pool in self.pools.values()}
+        for address in request.match_info["pairs"].split(","):
+            if address in by_pair:
+                pairs.append(by_pair[address].dexscreener_pair())
+            elif address == SOL_USDC_PAIR:
+                pairs.append({"pairAddress": SOL_USDC_PAIR, "priceUsd": str(self.pool.sol_usd),
+                              "priceNative": str(self.pool.sol_usd)})
+        return web.json_response({"schemaVersion": "1.0.0", "pairs": pairs, "pair": pairs[0] if pairs else None})
+
+    # ===== MAGIC EDEN =====
+    async def _me_listings(self, request: web.Request) -> web.Response:
+        await self._delay("magiceden")
+        return web.json_response([
+            {"tokenMint": fake_pubkey(f"nft-{i}"), "title": f"Suolala #{i}", "price": round(1.5 + i * 0.05, 3)}
+            for i in range(20)
+        ])
+
+    async def _me_token(self, request: web.Request) -> web.Response:
+        await self._delay("magiceden")
+        return web.json_response({"mintAddress": request.match_info["mint"],
+                                  "image": f"{self.base_url}/static/{request.match_info['mint']}.png"})
+
+    async def _me_stats(self, request: web.Request) -> web.Response:
+        await self._delay("magiceden")
+        return web.json_response({"symbol": request.match_info["collection"], "floorPrice": 1_500_000_000})
+
+    # ===== LIFECYCLE =====
+    @web.middleware
+    async def _count_connections(self, request: web.Request, handler):
+        peer = request.transport.get_extra_info("peername") if request.transport else None
+        if peer not in self._peers:
+            # A new connection: stand in for the TCP + TLS handshake of a real API
+            self._peers.add(peer)
+            self.connections += 1
+            await self._delay("connect")
+        return await handler(request)
+
+    def _web_app(self) -> web.Application:
+        app = web.Application(client_max_size=50 * 1024 * 1024, middlewares=[self._count_connections])
+        app.router.add_post("/bot{token}/{method}", self._telegram)
+        app.router.add_get("/bot{token}/{method}", self._telegram)
+        app.router.add_post("/rpc", self._rpc)
+        app.router.add_get("/latest/dex/pairs/solana/{pairs}", self._dexscreener)
+        app.router.add_get("/v2/collections/{collection}/listings", self._me_listings)
+        app.router.add_get("/v2/collections/{collection}/stats", self._me_stats)
+        app.router.add_get("/v2/tokens/{mint}", self._me_token)
+        return app
+
+    async def _serve(self, ready: threading.Event):
+        self._updates_event = asyncio.Event()
+        self._runner = web.AppRunner(self._web_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        ready.set()
+
+    def start(self):
+        """Start serving in a background thread"""
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._serve(ready))
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="fake-services", daemon=True)
+        self._thread.start()
+        ready.wait(10)
+
+    def stop(self):
+        if not self._loop:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
+
+    def swap(self, side: str, sol_amount: float, wallet: Optional[str] = None, mint: Optional[str] = None) -> dict:
+        """Script a swap on the fake chain (thread-safe); SUOLALA unless another pool's mint is given"""
+        future = asyncio.run_coroutine_threadsafe(self._swap(side, sol_amount, wallet, mint), self._loop)
+        return future.result(10)
+
+    async def _swap(self, side, sol_amount, wallet, mint):
+        return self.pools[mint or self.pool.mint].swap(side, sol_amount, wallet)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the fake Telegram/Solana/DexScreener/Magic Eden stack")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--buy-every", type=float, default=0, help="script a random buy every N seconds")
+    args = parser.parse_args()
+
+    services = FakeServices(args.host, args.port)
+    services.start()
+    print("Fake services running. Point the bot at them with:")
+    for key, value in services.env().items():
+        print(f"  export {key}={value}")
+    try:
+        while True:
+            time.sleep(args.buy_every or 3600)
+            if args.buy_every:
+                swap = services.swap("buy", random.uniform(2, 30))
+                print(f"buy {swap['sol']:.2f} SOL (${swap['usd']:,.0f}) by {swap['wallet'][:6]}")
+    except KeyboardInterrupt:
+        services.stop()
@@ -0,0 +1,80 @@
+# HTTP POOL BENCHMARK
+# /pricecheck-style DexScreener fetches against benchmarks/fake_services.py:
+# the old blocking `requests.get` (a new connection per call, on the event
+# loop) vs the shared pooled client. Fake services delay the first request
+# on each new connection by --handshake-ms to stand in for TCP + TLS setup.
+#
+#   python benchmarks/http_pool.py
+#   python benchmarks/http_pool.py --calls 200 --burst 20 --handshake-ms 80 --api-ms 30
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic import percentile  # noqa: E402
+
+
+async def old_fetch(url):
+    import requests
+    response = requests.get(url, timeout=10)  # what /pricecheck did: blocking, new connection
+    response.raise_for_status()
+    return response.json()
+
+
+async def pooled_fetch(url):
+    from http_client import HTTP
+    return await HTTP.get_json(url)
+
+
+async def run(services, fetch, url, calls, burst):
+    """Latencies of `calls` fetches issued `burst` at a time, wall time and connections opened"""
+    latencies = []
+
+    async def one():
+        started = time.perf_counter()
+        await fetch(url)
+        latencies.append(time.perf_counter() - started)
+
+    connections = services.connections
+    started = time.perf_counter()
+    for i in range(0, calls, burst):
+        await asyncio.gather(*(one() for _ in range(min(burst, calls - i))))
+    return latencies, time.perf_counter() - started, services.connections - connections
+
+
+async def main(args):
+    from fake_services import FakeServices
+    from token_registry import DEXSCREENER_PAIR
+    from http_client import HTTP
+
+    services = FakeServices(port=args.port, latency_ms={"connect": args.handshake_ms, "dexscreener": args.api_ms})
+    services.start()
+    url = f"{services.base_url}/latest/dex/pairs/solana/{DEXSCREENER_PAIR}"
+    print(f"{args.calls} fetches, {args.burst} at a time, handshake {args.handshake_ms:g} ms, "
+          f"API {args.api_ms:g} ms\n")
+    try:
+        for label, fetch in (("requests (old)", old_fetch), ("pooled client", pooled_fetch)):
+            latencies, wall, connections = await run(services, fetch, url, args.calls, args.burst)
+            print(f"== {label} ==")
+            print(f"  p50 {percentile(latencies, 50) * 1000:.1f} ms  p99 {percentile(latencies, 99) * 1000:.1f} ms  "
+                  f"wall {wall:.2f}s  {connections} connection(s) opened")
+    finally:
+        await HTTP.close()
+        services.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-call connections vs the pooled HTTP client")
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--burst", type=int, default=10, help="fetches issued concurrently")
+    parser.add_argument("--handshake-ms", type=float, default=60.0, help="delay on each new connection")
+    parser.add_argument("--api-ms", type=float, default=20.0, help="delay of each DexScreener reply")
+    parser.add_argument("--port", type=int, default=8733)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,236 @@
+# LOAD TEST HARNESS
+# Drives synthetic Update streams through the real Application and handlers,
+# with a FakeBot standing in for the Bot API, and reports throughput, latency
+# percentiles, DB writes and outbound API calls per scenario.
+#
+#   python benchmarks/loadtest.py                         # all scenarios
+#   python benchmarks/loadtest.py chatter joins --updates 5000
+#   python benchmarks/loadtest.py --output bench_results.jsonl   # keep history
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+# Isolated state so a run never touches the real DB or chat list
+_tmp = tempfile.mkdtemp(prefix="suolala-bench-")
+os.environ.setdefault("STATS_DB", os.path.join(_tmp, "weekly_stats.db"))
+os.environ.setdefault("KNOWN_CHATS_FILE", os.path.join(_tmp, "known_chats.txt"))
+os.environ.setdefault("METRICS_PORT", "0")
+os.environ.setdefault("LATENCY_REPORT_EVERY", "0")
+# Stand-in welcome animation (the real welcome.gif is not in the repo), so uploads are counted
+_welcome_gif = os.path.join(_tmp, "welcome.gif")
+with open(_welcome_gif, "wb") as _f:
+    _f.write(b"GIF89a" + bytes(250_000))
+os.environ.setdefault("WELCOME_ANIMATION", _welcome_gif)
+os.chdir(ROOT)  # media paths in the handlers are relative
+
+from telegram import Update  # noqa: E402
+from telegram.ext import TypeHandler  # noqa: E402
+
+import bot  # noqa: E402
+from ratelimit import CommandRateLimiter  # noqa: E402
+from welcome import WELCOME_WAVES  # noqa: E402
+from fake_bot import FakeBot  # noqa: E402
+from synthetic import text_update, command_update, join_update, percentile  # noqa: E402
+
+CHAT_WORDS = ["gm", "wen moon", "suolala strong", "nice chart", "lfg", "hello fam",
+              "price?", "hold", "gn", "who is buying", "solana summer", "ok"]
+CHEAP_COMMANDS = ["start", "rules", "stickers", "count", "top", "motivate", "contract"]
+
+
+def _chat_ids(count, base):
+    return [base - i for i in range(count)]
+
+
+def scenario_chatter(rng, n, chats, users):
+    """Group chatter: every message goes through track_messages and automatic_messages"""
+    chat_ids = _chat_ids(chats, -100100)
+    return [text_update(rng.choice(chat_ids), rng.randrange(1, users + 1), rng.choice(CHAT_WORDS))
+            for _ in range(n)]
+
+
+def scenario_commands(rng, n, chats, users):
+    """Local-only commands (no upstream HTTP) from many users"""
+    chat_ids = _chat_ids(chats, -100200)
+    return [command_update(rng.choice(chat_ids), rng.randrange(1, users + 1), rng.choice(CHEAP_COMMANDS))
+            for _ in range(n)]
+
+
+def scenario_joins(rng, n, chats, users):
+    """Welcome burst: a raid of joins concentrated in a few chats"""
+    chat_ids = _chat_ids(max(1, chats // 5), -100300)
+    updates = []
+    next_user = 500000
+    for _ in range(n):
+        size = rng.choice([1, 1, 1, 2, 3])
+        updates.append(join_update(rng.choice(chat_ids), list(range(next_user, next_user + size))))
+        next_user += size
+    return updates
+
+
+def scenario_mixed(rng, n, chats, users):
+    """Realistic mix: 85% chatter, 10% commands, 5% joins"""
+    chatter = scenario_chatter(rng, n, chats, users)
+    commands = scenario_commands(rng, n // 10, chats, users)
+    joins = scenario_joins(rng, n // 20, chats, users)
+    for extra in commands + joins:
+        chatter[rng.randrange(len(chatter))] = extra
+    return chatter
+
+
+SCENARIOS = {
+    "chatter": scenario_chatter,
+    "commands": scenario_commands,
+    "joins": scenario_joins,
+    "mixed": scenario_mixed,
+}
+
+
+class DBWriteCounter:
+    """Counts write statements and commits on the bot's SQLite connection"""
+
+    def __init__(self, conn):
+        self.writes = 0
+        self.commits = 0
+        conn.set_trace_callback(self._trace)
+
+    def _trace(self, statement):
+        head = statement.lstrip()[:6].upper()
+        if head in ("INSERT", "UPDATE", "DELETE", "REPLAC"):
+            self.writes += 1
+        elif head == "COMMIT":
+            self.commits += 1
+
+
+async def run_scenario(name, payloads, api_latency, rate, rate_limit):
+    fake_bot = FakeBot(api_latency=api_latency)
+    # Fresh limiter per scenario; "unlimited" buckets when rate limiting is off
+    bot.command_limiter = CommandRateLimiter() if rate_limit else CommandRateLimiter(
+        user_limits=(1e9, 1e9), chat_limits=(1e9, 1e9), global_limits=(1e9, 1e9)
+    )
+    application = bot.build_application(bot=fake_bot)
+
+    enqueued = {}
+    latencies = []
+
+    async def record_done(update, context):
+        started = enqueued.pop(update.update_id, None)
+        if started is not None:
+            latencies.append(time.perf_counter() - started)
+
+    # Runs after every other group, i.e. once all handlers for the update are done
+    application.add_handler(TypeHandler(Update, record_done), group=99)
+
+    await application.initialize()
+    await application.start()
+    fake_bot.reset_calls()
+
+    updates = [Update.de_json(p, fake_bot) for p in payloads]
+    counter = DBWriteCounter(bot.db)
+
+    started = time.perf_counter()
+    for i, update in enumerate(updates):
+        if rate:
+            # Open-loop pacing at the offered rate
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        enqueued[update.update_id] = time.perf_counter()
+        await application.update_queue.put(update)
+    await application.update_queue.join()
+    elapsed = time.perf_counter() - started
+    # Send the join waves still open, so their messages are counted
+    await WELCOME_WAVES.flush()
+
+    bot.db.set_trace_callback(None)
+    await application.stop()
+    await application.shutdown()
+
+    n = len(updates)
+    return {
+        "scenario": name,
+        "updates": n,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_ups": round(n / elapsed, 1),
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "completed": len(latencies),
+        "shed_by_rate_limit": bot.command_limiter.shed,
+        "db_writes": counter.writes,
+        "db_commits": counter.commits,
+        "db_writes_per_update": round(counter.writes / n, 3),
+        "api_calls": fake_bot.outbound_calls,
+        "api_calls_per_update": round(fake_bot.outbound_calls / n, 3),
+        "api_calls_by_method": dict(sorted((m, c) for m, c in fake_bot.calls.items() if m != "getMe")),
+        "upload_mb": round(fake_bot.upload_bytes / 1e6, 2),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def print_result(r):
+    print(f"\n== {r['scenario']} ==")
+    print(f"  {r['updates']} updates in {r['elapsed_s']}s -> {r['throughput_ups']} upd/s "
+          f"(p50 {r['latency_p50_ms']}ms, p99 {r['latency_p99_ms']}ms, "
+          f"{r['completed']} completed, {r['shed_by_rate_limit']} shed)")
+    print(f"  DB: {r['db_writes']} writes ({r['db_writes_per_update']}/update), {r['db_commits']} commits")
+    print(f"  API: {r['api_calls']} calls ({r['api_calls_per_update']}/update), "
+          f"{r['upload_mb']} MB uploaded {r['api_calls_by_method']}")
+
+
+async def main(args):
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenario(s): {', '.join(unknown)}")
+    results = []
+    for name in names:
+        rng = random.Random(args.seed)
+        payloads = SCENARIOS[name](rng, args.updates, args.chats, args.users)
+        result = await run_scenario(name, payloads, args.api_latency_ms / 1000, args.rate, args.rate_limit)
+        print_result(result)
+        results.append(result)
+
+    if args.output:
+        record = {
+            "timestamp": int(time.time()),
+            "revision": _git_revision(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "scenarios")},
+            "results": results,
+        }
+        with open(args.output, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"\nAppended results to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic load test for bot.py handlers")
+    parser.add_argument("scenarios", nargs="*", help=f"subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--api-latency-ms", type=float, default=0.0,
+                        help="simulated Bot API round trip per call")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="offered load in updates/s (0 = enqueue everything at once)")
+    parser.add_argument("--no-rate-limit", dest="rate_limit", action="store_false",
+                        help="disable the command rate limiter")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="append JSON results to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,69 @@
+# MEDIA UPLOAD BENCHMARK
+# sendPhoto of every prepared asset, original file vs media.py derivative,
+# against benchmarks/fake_services.py with a simulated uplink, through the
+# real python-telegram-bot HTTP stack. Reports bytes and upload latency per asset.
+#
+#   python benchmarks/media_upload.py
+#   python benchmarks/media_upload.py --uplink-mbps 10 --repeat 5
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+os.chdir(ROOT)  # asset paths are relative
+os.environ.setdefault("MEDIA_CACHE_DIR", tempfile.mkdtemp(prefix="suolala-media-"))
+
+
+async def upload_seconds(bot, path, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with open(path, "rb") as photo:
+            await bot.send_photo(chat_id=-100500, photo=photo, read_timeout=60, write_timeout=60)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def main(args):
+    from telegram import Bot
+    from fake_services import FakeServices
+    from media import MEDIA
+
+    started = time.perf_counter()
+    derivatives = MEDIA.prepare()
+    print(f"Prepared {len(derivatives)} derivative(s) in {time.perf_counter() - started:.2f}s "
+          f"(uplink {args.uplink_mbps:g} Mbit/s, best of {args.repeat})\n")
+
+    services = FakeServices(port=args.port, upload_mbps=args.uplink_mbps)
+    services.start()
+    bot = Bot("123456:FAKE", base_url=f"{services.base_url}/bot")
+    total_before = total_after = 0.0
+    print(f"{'asset':<24} {'original':>15} {'derivative':>15} {'faster':>7}")
+    try:
+        async with bot:
+            for d in derivatives:
+                before = await upload_seconds(bot, d.source, args.repeat)
+                after = await upload_seconds(bot, d.path, args.repeat)
+                total_before += before
+                total_after += after
+                print(f"{d.source:<24} {d.source_bytes / 1024:>6.0f}KB {before * 1000:>5.0f}ms "
+                      f"{d.size_bytes / 1024:>6.0f}KB {after * 1000:>5.0f}ms {before / after:>6.1f}x")
+    finally:
+        services.stop()
+    print(f"{'total':<24} {'':>8}{total_before * 1000:>7.0f}ms {'':>8}{total_after * 1000:>7.0f}ms "
+          f"{total_before / total_after:>6.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upload latency of original photos vs media derivatives")
+    parser.add_argument("--uplink-mbps", type=float, default=20.0, help="simulated uplink to the Bot API")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8734)
+    asyncio.run(main(parser.parse_args()))
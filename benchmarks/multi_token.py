@@ -0,0 +1,85 @@
+# MULTI-TOKEN BENCHMARK
+# Polls N tracked tokens on benchmarks/fake_services.py and compares the RPC
+# load of one shared BuyAlertMonitor (batched signatures and transactions)
+# with one unbatched monitor per token (what running a process per token did).
+#
+#   python benchmarks/multi_token.py
+#   python benchmarks/multi_token.py --tokens 1 2 5 10 20 --cycles 30 --swap-chance 0.3
+
+import os
+import sys
+import random
+import asyncio
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+
+async def run(services, monitors, tokens, cycles, swap_chance, rng):
+    """Requests and calls per polling cycle for a set of monitors"""
+    for monitor in monitors:
+        await monitor._poll_once()  # catch up on earlier swaps, not counted
+    services.rpc_calls = services.rpc_requests = 0
+    swaps = 0
+    for _ in range(cycles):
+        for token in tokens:
+            if rng.random() < swap_chance:
+                services.swap(rng.choice(["buy", "sell"]), rng.uniform(0.5, 20), mint=token.mint)
+                swaps += 1
+        for monitor in monitors:
+            await monitor._poll_once()
+    return services.rpc_requests / cycles, services.rpc_calls / cycles, swaps
+
+
+async def main(args):
+    tmp = tempfile.mkdtemp(prefix="suolala-multitoken-")
+    base = f"http://127.0.0.1:{args.port}"
+    os.environ.update({
+        "SOLANA_RPC_HTTP": f"{base}/rpc",
+        "DEXSCREENER_BASE": base,
+        "STATS_DB": os.path.join(tmp, "weekly_stats.db"),
+        "METRICS_PORT": "0",
+    })
+
+    from fake_services import FakeServices
+    import buy_alert
+    from buy_alert import BuyAlertMonitor
+    from token_registry import PRIMARY_TOKEN
+    from http_client import HTTP
+
+    services = FakeServices(port=args.port, latency_ms={"rpc": args.rpc_ms})
+    services.start()
+    all_tokens = [PRIMARY_TOKEN] + [services.add_pool(f"TOK{i}") for i in range(1, max(args.tokens))]
+    batch_size = buy_alert.RPC_BATCH_SIZE
+
+    print(f"{args.cycles} polling cycles, each token swaps with p={args.swap_chance} per cycle\n")
+    print(f"{'tokens':>6} | {'shared: HTTP/cycle':>18} {'calls/cycle':>11} | "
+          f"{'per token: HTTP/cycle':>21} {'calls/cycle':>11}")
+    try:
+        for count in args.tokens:
+            tokens = all_tokens[:count]
+            buy_alert.RPC_BATCH_SIZE = batch_size
+            shared = await run(services, [BuyAlertMonitor(None, [], tokens)], tokens,
+                               args.cycles, args.swap_chance, random.Random(count))
+            buy_alert.RPC_BATCH_SIZE = 1
+            separate = await run(services, [BuyAlertMonitor(None, [], [t]) for t in tokens], tokens,
+                                 args.cycles, args.swap_chance, random.Random(count))
+            print(f"{count:>6} | {shared[0]:>18.2f} {shared[1]:>11.2f} | {separate[0]:>21.2f} {separate[1]:>11.2f}")
+    finally:
+        buy_alert.RPC_BATCH_SIZE = batch_size
+        await HTTP.close()
+        services.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RPC load of one shared monitor vs one monitor per token")
+    parser.add_argument("--tokens", type=int, nargs="+", default=[1, 2, 5, 10])
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--swap-chance", type=float, default=0.3, help="chance each token swaps per cycle")
+    parser.add_argument("--rpc-ms", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8731)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,127 @@
+# PRICE HISTORY / CHART BENCHMARK
+# Seeds price_history.py with a week of simulated monitor samples (one
+# DexScreener reading a minute plus swaps), then measures what /pricecheck
+# and /chart cost when answered from the store: stats query latency, chart
+# render time, and how many /chart requests the per-bucket cache absorbs.
+# Every one of those requests used to be a link or a DexScreener call.
+#
+#   python benchmarks/price_chart.py
+#   python benchmarks/price_chart.py --days 7 --swaps-per-day 5000 --chart-requests 600
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from unittest import mock
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="suolala-prices-"), "prices.db")
+os.environ["PRICE_DB"] = DB_PATH
+
+from synthetic import percentile  # noqa: E402
+
+
+async def seed(history, mint, days, swaps_per_day, flush_every):
+    """A random walk sampled every minute, swaps in between; flushed every `flush_every` seconds"""
+    rng = random.Random(7)
+    end = time.time()
+    now = end - days * 86400
+    price = 0.0004
+    samples = flushes = 0
+    next_flush = now + flush_every
+    swap_gap = 86400 / swaps_per_day
+    next_sample = now
+    while now < end:
+        now += rng.expovariate(1 / swap_gap)
+        while next_sample <= now:
+            history.record(mint, price, next_sample, market_cap=price * 1e9, liquidity_usd=250_000)
+            next_sample += 60
+            samples += 1
+        price *= 1 + rng.gauss(0, 0.004)
+        history.record(mint, price, now, rng.uniform(5, 2000))
+        samples += 1
+        if now >= next_flush:
+            await history.flush()
+            flushes += 1
+            next_flush = now + flush_every
+    await history.flush()
+    return samples, flushes + 1
+
+
+async def main(args):
+    from price_history import PRICE_HISTORY, _connect, tier_for
+    from charts import CHARTS, CHART_RANGES, render_chart
+    from token_registry import PRIMARY_TOKEN
+
+    mint, symbol = PRIMARY_TOKEN.mint, PRIMARY_TOKEN.symbol
+    started = time.perf_counter()
+    # Pruning is relative to the wall clock, keep it out of the seeding
+    PRICE_HISTORY.last_prune = float("inf")
+    samples, flushes = await seed(PRICE_HISTORY, mint, args.days, args.swaps_per_day, args.flush_seconds)
+    seed_seconds = time.perf_counter() - started
+    conn = _connect(DB_PATH)
+    rows = dict(conn.execute("SELECT tier, COUNT(*) FROM price_candles GROUP BY tier").fetchall())
+    conn.close()
+    print(f"== store ({args.days:g} days, {samples} samples) ==")
+    print(f"  {flushes} flush transaction(s) in {seed_seconds:.2f}s, candles per tier "
+          + ", ".join(f"{tier}s: {count}" for tier, count in sorted(rows.items()))
+          + f", {os.path.getsize(DB_PATH) / 1024:.0f}KB on disk")
+
+    latencies = []
+    for _ in range(200):
+        t0 = time.perf_counter()
+        stats = PRICE_HISTORY.stats(mint)
+        latencies.append(time.perf_counter() - t0)
+    print("\n== /pricecheck from the store ==")
+    print(f"  p50 {percentile(latencies, 50) * 1000:.2f} ms  p99 {percentile(latencies, 99) * 1000:.2f} ms  "
+          f"(1h {stats.change_1h:+.2f}%, 24h {stats.change_24h:+.2f}%, volume ${stats.volume_24h:,.0f}), "
+          f"0 DexScreener calls")
+
+    print("\n== /chart render ==")
+    for window, seconds in CHART_RANGES.items():
+        candles = PRICE_HISTORY.candles(time.time() - seconds, tier_for(seconds), mint)
+        t0 = time.perf_counter()
+        png = render_chart(candles, f"{symbol} / USD  {window}", seconds)
+        if args.save and png:
+            with open(f"chart_{window}.png", "wb") as f:
+                f.write(png)
+        if png is None:
+            print("  Pillow not installed, /chart falls back to the link")
+            return
+        print(f"  {window:>4}: {len(candles):>3} candles, render {(time.perf_counter() - t0) * 1000:.1f} ms, "
+              f"{len(png) / 1024:.0f}KB PNG")
+
+    # /chart requests spread evenly over the last hour of data, ranges picked at random
+    rng = random.Random(11)
+    renders = 0
+    hour_start = time.time() - 3600
+    served = []
+    with mock.patch("charts.time.time") as fake_time:
+        for i in range(args.chart_requests):
+            fake_time.return_value = hour_start + 3600 * i / args.chart_requests
+            window = rng.choice(list(CHART_RANGES))
+            t0 = time.perf_counter()
+            chart = await CHARTS.get(mint, symbol, window)
+            served.append(time.perf_counter() - t0)
+            if chart.file_id is None:
+                renders += 1
+                chart.file_id = "sent"  # as if Telegram returned a file_id after the upload
+    print(f"\n== /chart cache ({args.chart_requests} requests over one hour) ==")
+    print(f"  {renders} render(s)/upload(s), {args.chart_requests - renders} served by file_id "
+          f"({1 - renders / args.chart_requests:.0%} hit rate), p50 {percentile(served, 50) * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Price store size, stats latency and chart cache")
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--swaps-per-day", type=int, default=3000)
+    parser.add_argument("--flush-seconds", type=float, default=10)
+    parser.add_argument("--chart-requests", type=int, default=600)
+    parser.add_argument("--save", action="store_true", help="write chart_<range>.png to look at")
+    asyncio.run(main(parser.parse_args()))
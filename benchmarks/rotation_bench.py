@@ -0,0 +1,120 @@
+# ROTATION BENCHMARK
+# The old /motivate pick (rebuild the list of unused indexes on every call,
+# used sets kept in a dict forever) vs rotation.py's per-chat decks: cost per
+# pick, memory held for many chats, and repeats seen across a restart.
+#
+#   python benchmarks/rotation_bench.py
+#   python benchmarks/rotation_bench.py --chats 20000 --sizes 70 1000
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+
+def old_pick(used_by_chat, chat_id, size):
+    """bot.py's motivate before the rotation engine"""
+    used = used_by_chat.setdefault(chat_id, set())
+    if len(used) >= size:
+        used.clear()
+    idx = random.choice([i for i in range(size) if i not in used])
+    used.add(idx)
+    return idx
+
+
+async def per_pick_us(size, picks):
+    from rotation import RotationEngine
+    used = {}
+    started = time.perf_counter()
+    for _ in range(picks):
+        old_pick(used, 1, size)
+    old = (time.perf_counter() - started) / picks * 1e6
+
+    engine = RotationEngine(os.path.join(tempfile.mkdtemp(), "rotation.db"))
+    await engine.pick(1, "bench", size)  # first pick of a chat loads it from the table
+    started = time.perf_counter()
+    for _ in range(picks):
+        await engine.pick(1, "bench", size)
+    new = (time.perf_counter() - started) / picks * 1e6
+    return old, new
+
+
+async def memory_kb(chats, size, picks_per_chat, max_decks):
+    from rotation import RotationEngine
+    tracemalloc.start()
+    used = {}
+    for chat in range(chats):
+        for _ in range(picks_per_chat):
+            old_pick(used, chat, size)
+    old = tracemalloc.get_traced_memory()[0] / 1024
+    del used
+    tracemalloc.stop()
+
+    engine = RotationEngine(os.path.join(tempfile.mkdtemp(), "rotation.db"), max_decks=max_decks)
+    tracemalloc.start()
+    for chat in range(chats):
+        for _ in range(picks_per_chat):
+            await engine.pick(chat, "bench", size)
+        if chat % 1000 == 999:
+            await engine.flush()
+    await engine.flush()
+    new = tracemalloc.get_traced_memory()[0] / 1024
+    tracemalloc.stop()
+    return old, new, os.path.getsize(engine.db_path) / chats
+
+
+async def repeats_across_restart(size):
+    """Picks repeated within one full cycle that spans a restart"""
+    from rotation import RotationEngine
+    half = size // 2
+
+    used = {}
+    seen = [old_pick(used, 1, size) for _ in range(half)]
+    used = {}  # restart: the dict is gone
+    seen += [old_pick(used, 1, size) for _ in range(size - half)]
+    old = size - len(set(seen))
+
+    path = os.path.join(tempfile.mkdtemp(), "rotation.db")
+    engine = RotationEngine(path)
+    seen = [await engine.pick(1, "bench", size) for _ in range(half)]
+    await engine.stop()
+    engine = RotationEngine(path)
+    seen += [await engine.pick(1, "bench", size) for _ in range(size - half)]
+    new = size - len(set(seen))
+    return old, new
+
+
+async def main(args):
+    print("== cost per pick (one chat, warm) ==")
+    for size in args.sizes:
+        old, new = await per_pick_us(size, args.picks)
+        print(f"  {size:>5} items: old {old:7.2f} µs   deck {new:5.2f} µs   {old / new:5.1f}x")
+
+    print(f"\n== memory, {args.chats} chats x {args.picks_per_chat} picks ==")
+    for size in args.sizes:
+        old, new, per_chat = await memory_kb(args.chats, size, args.picks_per_chat, args.max_decks)
+        print(f"  {size:>5} items: old {old:8.0f}KB (never freed)   "
+              f"deck {new:8.0f}KB (at most {args.max_decks} in memory), {per_chat:.0f} B/chat on disk")
+
+    print("\n== repeats within one cycle that spans a restart ==")
+    for size in args.sizes:
+        old, new = await repeats_across_restart(size)
+        print(f"  {size:>5} items: old {old} repeat(s)   deck {new} repeat(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Old motivate pick vs rotation decks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[70, 1000])
+    parser.add_argument("--picks", type=int, default=20000)
+    parser.add_argument("--chats", type=int, default=5000)
+    parser.add_argument("--picks-per-chat", type=int, default=5)
+    parser.add_argument("--max-decks", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
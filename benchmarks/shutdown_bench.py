@@ -0,0 +1,205 @@
+# SHUTDOWN BENCHMARK
+# SIGTERM in the middle of activity, then a replacement process, against
+# benchmarks/fake_services.py. Compares dying with the background tasks
+# (the old exit path: nothing but the rotations and HTTP pool was closed)
+# with LIFECYCLE.shutdown(): swaps written, join waves greeted, scheduled
+# deletions carried out, flow stats the next leader reports, and how long
+# the shutdown takes. Each mode runs in its own process and database.
+#
+#   python benchmarks/shutdown_bench.py
+#   python benchmarks/shutdown_bench.py --buys 30 --deletions 50 --join-chats 20
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+ALERT_CHATS = [-100900, -100901]
+
+
+async def wait_for(predicate, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if predicate():
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+def buys(services, count, seed):
+    rng = random.Random(seed)
+    return [services.swap("buy", rng.uniform(8, 40)) for _ in range(count)]
+
+
+def process_exit():
+    """What the process takes with it: every in-memory buffer and timer"""
+    from buy_history import SWAP_HISTORY
+    from price_history import PRICE_HISTORY
+    from deletions import DELETIONS
+    from welcome import WELCOME_WAVES
+    from flow import FLOW_STATS, FLOW_HISTORY
+    from lifecycle import LIFECYCLE
+    lost = {"swap rows": len(SWAP_HISTORY.pending), "candles": len(PRICE_HISTORY.pending),
+            "deletions": len(DELETIONS.pending), "joins": sum(len(w.members) for w in WELCOME_WAVES.waves.values())}
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task():
+            task.cancel()
+    SWAP_HISTORY.pending, SWAP_HISTORY._flush_task = [], None
+    PRICE_HISTORY.pending, PRICE_HISTORY.latest, PRICE_HISTORY._flush_task = {}, {}, None
+    DELETIONS.pending.clear()
+    WELCOME_WAVES.waves.clear()
+    FLOW_STATS.clear()
+    FLOW_HISTORY._flush_task = None
+    LIFECYCLE.tasks.clear()
+    LIFECYCLE.hooks.clear()
+    LIFECYCLE.stopping = False
+    return lost
+
+
+async def child(args):
+    tmp = tempfile.mkdtemp(prefix="suolala-shutdown-")
+    base = f"http://127.0.0.1:{args.port}"
+    os.environ.update({
+        "SOLANA_RPC_HTTP": f"{base}/rpc",
+        "DEXSCREENER_BASE": base,
+        "STATS_DB": os.path.join(tmp, "weekly_stats.db"),
+        "METRICS_PORT": "0",
+        "ALERT_COALESCE_SECONDS": "0",
+        # Long enough that the waves are still open at SIGTERM
+        "WELCOME_WINDOW_SECONDS": "30",
+    })
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, BENCH_DIR)
+    os.chdir(ROOT)
+
+    from telegram import User
+    from fake_bot import FakeBot
+    from fake_services import FakeServices
+    from buy_alert import BuyAlertMonitor
+    from deletions import DELETIONS
+    from welcome import WELCOME_WAVES
+    from flow import flow_stats
+    from token_registry import PRIMARY_TOKEN
+    from lifecycle import LIFECYCLE, STOP_INTAKE, FLUSH, CHECKPOINT
+
+    services = FakeServices(port=args.port)
+    services.start()
+
+    # ===== first process =====
+    bot1 = FakeBot()
+    await bot1.initialize()
+    monitor = BuyAlertMonitor(bot1, ALERT_CHATS)
+    LIFECYCLE.spawn(monitor.start(), "buy alert monitor")
+    LIFECYCLE.on_shutdown(STOP_INTAKE, "buy monitor", monitor.stop)
+    LIFECYCLE.on_shutdown(FLUSH, "welcome waves", WELCOME_WAVES.flush)
+    LIFECYCLE.on_shutdown(CHECKPOINT, "scheduled deletions", DELETIONS.checkpoint)
+    await asyncio.sleep(1)
+
+    buys(services, args.buys, 1)
+    await wait_for(lambda: flow_stats(PRIMARY_TOKEN.mint).swaps_seen >= args.buys, 30)
+
+    for i in range(args.deletions):
+        message = await bot1.send_message(chat_id=-100800 - i % 5, text="auto reply")
+        DELETIONS.schedule(message, args.delete_after)
+    for chat in range(args.join_chats):
+        WELCOME_WAVES.add(bot1, -100700 - chat, [User(id=chat * 100 + n, first_name=f"M{n}", is_bot=False)
+                                                 for n in range(3)])
+    # The last few land just before SIGTERM
+    buys(services, args.late_buys, 2)
+    await asyncio.sleep(0.3)
+
+    started = time.perf_counter()
+    if args.mode == "graceful":
+        report = await LIFECYCLE.shutdown()
+    else:
+        report = {}
+    shutdown_ms = (time.perf_counter() - started) * 1000
+    lost = process_exit()
+    await asyncio.sleep(0.1)
+    welcomes = bot1.calls["sendAnimation"] + bot1.calls["sendMessage"] - args.deletions
+
+    # ===== replacement process (same database), after more buys in the gap =====
+    buys(services, args.gap_buys, 3)
+    bot2 = FakeBot()
+    await bot2.initialize()
+    restored = await DELETIONS.restore(bot2)
+    monitor = BuyAlertMonitor(bot2, ALERT_CHATS)
+    LIFECYCLE.spawn(monitor.start(), "buy alert monitor")
+    total = args.buys + args.late_buys + args.gap_buys
+    await wait_for(lambda: flow_stats(PRIMARY_TOKEN.mint).summary()["1h"]["buys"] >= total, 10)
+    await asyncio.sleep(max(0.0, args.delete_after - (time.perf_counter() - started)) + 0.5)
+    await monitor.stop()
+    conn = sqlite3.connect(os.environ["STATS_DB"])
+    rows = conn.execute("SELECT COUNT(*) FROM swaps").fetchone()[0]
+    conn.close()
+    services.stop()
+
+    print(json.dumps({
+        "shutdown_ms": shutdown_ms,
+        "report": report,
+        "lost": lost,
+        "swaps": total,
+        "swap_rows": rows,
+        "flow_buys": flow_stats(PRIMARY_TOKEN.mint).summary()["1h"]["buys"],
+        "welcomes": welcomes,
+        "join_chats": args.join_chats,
+        "deletions": args.deletions,
+        "restored": restored,
+        "deleted": bot1.calls["deleteMessage"] + bot2.calls["deleteMessage"],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SIGTERM mid-activity: old exit path vs graceful shutdown")
+    parser.add_argument("--port", type=int, default=8710)
+    parser.add_argument("--buys", type=int, default=12)
+    parser.add_argument("--late-buys", type=int, default=4)
+    parser.add_argument("--gap-buys", type=int, default=6)
+    parser.add_argument("--deletions", type=int, default=25)
+    parser.add_argument("--delete-after", type=float, default=3)
+    parser.add_argument("--join-chats", type=int, default=10)
+    parser.add_argument("--mode", choices=("old", "graceful"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        asyncio.run(child(args))
+        return
+
+    results = {}
+    for mode in ("old", "graceful"):
+        argv = [sys.executable, os.path.abspath(__file__), "--mode", mode] + sys.argv[1:]
+        out = subprocess.run(argv, capture_output=True, text=True)
+        lines = [line for line in out.stdout.splitlines() if line.startswith("{")]
+        if not lines:
+            print(out.stdout[-2000:], out.stderr[-2000:])
+            raise SystemExit(f"{mode} run failed")
+        results[mode] = json.loads(lines[-1])
+
+    print(f"{args.buys} buys, {args.late_buys} right before SIGTERM, {args.gap_buys} while no process runs; "
+          f"{args.deletions} scheduled deletions, {args.join_chats} open join waves\n")
+    print(f"  {'':34} {'old exit':>10} {'graceful':>10}")
+    rows = [
+        ("swap rows written / swaps", lambda r: f"{r['swap_rows']}/{r['swaps']}"),
+        ("1h buys reported after restart", lambda r: f"{r['flow_buys']}/{r['swaps']}"),
+        ("join waves greeted", lambda r: f"{r['welcomes']}/{r['join_chats']}"),
+        ("scheduled deletions carried out", lambda r: f"{r['deleted']}/{r['deletions']}"),
+        ("deletions handed to the next process", lambda r: str(r["restored"])),
+        ("in memory at exit (rows/deletes)", lambda r: f"{r['lost']['swap rows']}/{r['lost']['deletions']}"),
+        ("shutdown time", lambda r: f"{r['shutdown_ms']:.0f}ms"),
+    ]
+    for label, fmt in rows:
+        print(f"  {label:34} {fmt(results['old']):>10} {fmt(results['graceful']):>10}")
+    print("\n  graceful hooks: " + "; ".join(f"{k} {v}" for k, v in results["graceful"]["report"].items()))
+
+
+if __name__ == "__main__":
+    main()
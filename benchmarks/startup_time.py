@@ -0,0 +1,87 @@
+# STARTUP TIME BENCHMARK
+# Cold-starts fresh interpreters and reports how long `import bot` and
+# build_application() take, plus the slowest top-level imports.
+#
+#   python benchmarks/startup_time.py --runs 10
+#   python benchmarks/startup_time.py --top 15
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+# Runs inside the child interpreter; prints one JSON line with the timings
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+import bot
+t1 = time.perf_counter()
+app = bot.build_application()
+t2 = time.perf_counter()
+heavy = [m for m in ("aiohttp", "requests", "deep_translator", "buy_alert", "webhook_server") if m in __import__("sys").modules]
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "build_ms": (t2 - t1) * 1000, "phases": bot.STARTUP_TIMINGS, "heavy": heavy}))
+"""
+
+
+def _env(tmp):
+    env = dict(os.environ)
+    env.update({
+        "BOT_TOKEN": env.get("BOT_TOKEN", "123456:STARTUP-BENCH"),
+        "STATS_DB": os.path.join(tmp, "weekly_stats.db"),
+        "KNOWN_CHATS_FILE": os.path.join(tmp, "known_chats.txt"),
+        "METRICS_PORT": "0",
+    })
+    return env
+
+
+def probe(env):
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def top_imports(env, count):
+    """Cumulative -X importtime of the modules imported directly by bot"""
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import bot"], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:  # direct imports of bot.py
+            rows.append((int(cumulative_us) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main(args):
+    tmp = tempfile.mkdtemp(prefix="suolala-startup-")
+    env = _env(tmp)
+    probe(env)  # warm the bytecode cache so every measured run is comparable
+
+    runs = [probe(env) for _ in range(args.runs)]
+    imports = [r["import_ms"] for r in runs]
+    builds = [r["build_ms"] for r in runs]
+    print(f"== startup ({args.runs} cold interpreters) ==")
+    print(f"  import bot:          median {statistics.median(imports):.1f}ms  min {min(imports):.1f}ms")
+    print(f"  build_application(): median {statistics.median(builds):.1f}ms  min {min(builds):.1f}ms")
+    print(f"  phases (last run): {runs[-1]['phases']}")
+    print(f"  heavy modules loaded: {runs[-1]['heavy'] or 'none'}")
+
+    print("\n== slowest imports in bot.py (cumulative) ==")
+    for ms, name in top_imports(env, args.top):
+        print(f"  {ms:8.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure bot import and application build time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    main(parser.parse_args())
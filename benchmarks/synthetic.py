@@ -0,0 +1,65 @@
+# SYNTHETIC UPDATES
+# Builds Telegram Update JSON payloads for local testing and benchmarks
+
+import time
+import itertools
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+
+def _user(user_id: int, is_bot: bool = False) -> dict:
+    return {
+        "id": user_id,
+        "is_bot": is_bot,
+        "first_name": f"User{user_id}",
+        "username": f"user{user_id}",
+    }
+
+
+def _chat(chat_id: int) -> dict:
+    if chat_id > 0:
+        return {"id": chat_id, "type": "private", "first_name": f"User{chat_id}"}
+    return {"id": chat_id, "type": "supergroup", "title": f"Group {chat_id}"}
+
+
+def text_update(chat_id: int, user_id: int, text: str) -> dict:
+    """Plain text message (commands get a bot_command entity)"""
+    message = {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": _chat(chat_id),
+        "from": _user(user_id),
+        "text": text,
+    }
+    if text.startswith("/"):
+        command = text.split()[0]
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return {"update_id": next(_update_ids), "message": message}
+
+
+def command_update(chat_id: int, user_id: int, command: str) -> dict:
+    """Bot command message, e.g. command_update(-100, 1, "price")"""
+    return text_update(chat_id, user_id, f"/{command}")
+
+
+def join_update(chat_id: int, user_ids: list) -> dict:
+    """new_chat_members service message"""
+    return {
+        "update_id": next(_update_ids),
+        "message": {
+            "message_id": next(_message_ids),
+            "date": int(time.time()),
+            "chat": _chat(chat_id),
+            "from": _user(user_ids[0]),
+            "new_chat_members": [_user(uid) for uid in user_ids],
+        },
+    }
+
+
+def percentile(values, pct) -> float:
+    """Nearest-rank percentile (pct in 0-100); 0.0 for no values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
@@ -0,0 +1,63 @@
+# WEBHOOK LATENCY CHECK
+# POSTs synthetic updates to a locally running bot in webhook mode and prints
+# the update-to-handler latency it reports on /healthz.
+#
+#   BOT_MODE=webhook WEBHOOK_SECRET=dev python bot.py
+#   WEBHOOK_SECRET=dev python benchmarks/webhook_latency.py --count 500
+
+import os
+import sys
+import time
+import json
+import asyncio
+import argparse
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import text_update  # noqa: E402
+
+
+async def main(args):
+    url = f"{args.base_url.rstrip('/')}{args.path}"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": os.getenv("WEBHOOK_SECRET", "")}
+    post_times = []
+
+    async with aiohttp.ClientSession() as session:
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def post_one(i):
+            payload = text_update(args.chat_id - (i % args.chats), 1000 + i % 50, f"hello {i}")
+            async with sem:
+                start = time.perf_counter()
+                async with session.post(url, json=payload, headers=headers) as resp:
+                    if resp.status != 200:
+                        print(f"update {i}: HTTP {resp.status}")
+                post_times.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post_one(i) for i in range(args.count)))
+        elapsed = time.perf_counter() - started
+
+        # Give the handlers a moment to drain the queue
+        await asyncio.sleep(1)
+        async with session.get(f"{args.base_url.rstrip('/')}/healthz") as resp:
+            health = await resp.json()
+
+    post_times.sort()
+    print(f"Posted {args.count} updates in {elapsed:.2f}s ({args.count / elapsed:.0f} upd/s)")
+    print(f"POST round trip p50={post_times[len(post_times) // 2] * 1000:.2f}ms "
+          f"p99={post_times[int(len(post_times) * 0.99) - 1] * 1000:.2f}ms")
+    print("Bot-reported update latency:")
+    print(json.dumps(health.get("update_latency"), indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="POST synthetic updates to the webhook server")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8080")
+    parser.add_argument("--path", default=os.getenv("WEBHOOK_PATH", "/telegram"))
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--chats", type=int, default=5)
+    parser.add_argument("--chat-id", type=int, default=-1001)
+    asyncio.run(main(parser.parse_args()))
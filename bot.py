@@ -1,42 +1,100 @@
+import time
+
+# Measured from the first line of bot.py so the import phase can be reported
+_MODULE_T0 = time.perf_counter()
+
 import os
+import sys
 import random
 import asyncio
 import sqlite3
-import requests
+from contextlib import contextmanager
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from deep_translator import GoogleTranslator
 
 from telegram import Update
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
     MessageHandler,
+    TypeHandler,
     ContextTypes,
+    ApplicationHandlerStop,
     filters,
 )
 
-# NEW BUY ALERT FEATURE
-from buy_alert import start_buy_alert_monitor
+# buy_alert, webhook_server, http_client and deep_translator are imported where
+# they are used: they pull in aiohttp/requests and are not needed to serve updates
+from leader import LeaderElector, load_shared_state, save_shared_state
+from latency import TimedUpdateQueue, record_update_latency
+from update_processor import PerChatUpdateProcessor
+from flow import FLOW_HISTORY
+from buy_history import SWAP_HISTORY, WALLET_PREFIX_MIN, is_wallet_prefix
+from price_history import PRICE_HISTORY
+from charts import CHARTS, CHART_RANGES, CHART_DEFAULT_RANGE
+from user_profiles import USER_PROFILES
+from rotation import ROTATIONS
+from welcome import WELCOME_WAVES
+from deletions import DELETIONS
+from lifecycle import LIFECYCLE, STOP_INTAKE, FLUSH, CHECKPOINT, CLOSE
+from media import MEDIA, report as media_report
+from alert_subscriptions import MIN_THRESHOLD_USD, load_subscription, save_subscription
+from token_registry import TRACKED_TOKENS, PRIMARY_TOKEN, find_token
+from ratelimit import CommandRateLimiter, command_name
+from metrics import (
+    InstrumentedHTTPXRequest,
+    instrument_handlers,
+    start_metrics_server,
+    stop_metrics_server,
+    track_upstream,
+)
 
 MAGICEDEN_COLLECTION = "suolala_"
-MAGICEDEN_LIST_URL = "https://api-mainnet.magiceden.dev/v2/collections/{}/listings?offset=0&limit=100"
+MAGICEDEN_API_BASE = os.getenv("MAGICEDEN_API_BASE", "https://api-mainnet.magiceden.dev")
+MAGICEDEN_LIST_URL = MAGICEDEN_API_BASE + "/v2/collections/{}/listings?offset=0&limit=100"
 
 # ===== BOT TOKEN =====
 TOKEN = os.getenv("BOT_TOKEN")
 
+# Bot API server (override to run against a local Bot API or the offline test bed)
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+
+# ===== SERVING MODE =====
+# "polling" (default) or "webhook" (see webhook_server.py for its settings)
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+
+# Seconds to wait after deleteWebhook for an old polling session to time out
+POLLING_TAKEOVER_WAIT = float(os.getenv("POLLING_TAKEOVER_WAIT", "35"))
+
 # ===== TIMEZONE =====
 CHINA_TZ = ZoneInfo("Asia/Shanghai")
 
+# ===== STARTUP TIMING =====
+STARTUP_TIMINGS = {}  # phase -> milliseconds
+
+
+@contextmanager
+def startup_phase(name):
+    """Time one startup phase and log it"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_TIMINGS[name] = round((time.perf_counter() - started) * 1000, 1)
+        print(f"[STARTUP] {name}: {STARTUP_TIMINGS[name]}ms")
+
+
 # ===== MEMORY (FIXED GM/GN) =====
-KNOWN_CHATS_FILE = "known_chats.txt"
+KNOWN_CHATS_FILE = os.getenv("KNOWN_CHATS_FILE", "known_chats.txt")
 KNOWN_CHATS = set()
 LAST_GM_DATE = None
 LAST_GN_DATE = None
-USED_MOTIVATIONS = {}
 
-# Load chat IDs safely (handles empty lines)
-if os.path.exists(KNOWN_CHATS_FILE):
+
+def load_known_chats():
+    """Load chat IDs safely (handles empty lines)"""
+    if not os.path.exists(KNOWN_CHATS_FILE):
+        return
     try:
         with open(KNOWN_CHATS_FILE, "r") as f:
             for line in f:
@@ -50,43 +108,57 @@ if os.path.exists(KNOWN_CHATS_FILE):
     except Exception as e:
         print(f"[STARTUP] Error loading chat IDs: {e}")
 
+
 # ===== DATABASE =====
-db = sqlite3.connect("weekly_stats.db", check_same_thread=False)
-cur = db.cursor()
-
-cur.execute("""
-CREATE TABLE IF NOT EXISTS stats (
-    user_id INTEGER,
-    chat_id INTEGER,
-    year_week TEXT,
-    count INTEGER,
-    PRIMARY KEY (user_id, chat_id, year_week)
-)
-""")
+STATS_DB = os.getenv("STATS_DB", "weekly_stats.db")
+db = None
+cur = None
 
-cur.execute("""
-CREATE TABLE IF NOT EXISTS users (
-    user_id INTEGER PRIMARY KEY,
-    username TEXT,
-    first_name TEXT
-)
-""")
-db.commit()
+
+def init_db():
+    """Open the stats database and create the tables"""
+    global db, cur
+    db = sqlite3.connect(STATS_DB, check_same_thread=False)
+    # WAL (kept in the file, so every connection gets it): readers such as export.py,
+    # the history queries and other replicas never block these writes, nor they them
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    cur = db.cursor()
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS stats (
+        user_id INTEGER,
+        chat_id INTEGER,
+        year_week TEXT,
+        count INTEGER,
+        PRIMARY KEY (user_id, chat_id, year_week)
+    )
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        first_name TEXT
+    )
+    """)
+    db.commit()
+
+    cached = USER_PROFILES.warm(cur)
+    print(f"[STARTUP] Cached {cached} user profile(s)")
+
+
+def init_state():
+    """Load chat IDs and open the database once per process"""
+    if db is not None:
+        return
+    load_known_chats()
+    init_db()
 
 def current_week():
     y, w, _ = datetime.utcnow().isocalendar()
     return f"{y}-W{w:02d}"
 
-# ===== DELETE HELPER =====
-async def delete_after_delay(message, delay=300):
-    """Delete a message after specified delay in seconds"""
-    await asyncio.sleep(delay)
-    try:
-        await message.delete()
-    except Exception as e:
-        print(f"Failed to delete message: {e}")
-        pass  # Message might already be deleted or bot lacks permission
-
 # ===== SAVE CHAT (FIXED) =====
 def remember_chat(update: Update):
     if update and update.effective_chat:
@@ -100,9 +172,16 @@ def remember_chat(update: Update):
 async def send_qr_if_exists(update, name):
     path = f"qrcodes/{name}.jpg"
     if os.path.exists(path):
-        await update.message.reply_photo(photo=open(path, "rb"))
+        with open(await MEDIA.get(path), "rb") as photo:
+            await update.message.reply_photo(photo=photo)
 
 # ===== TRANSLATE =====
+def _translate(text, target):
+    # deep_translator is only needed for /translate, import it on first use
+    from deep_translator import GoogleTranslator
+    return GoogleTranslator(source="auto", target=target).translate(text)
+
+
 async def translate_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message.reply_to_message:
         await update.message.reply_text("❗ Reply to a message and type /translate")
@@ -114,16 +193,17 @@ async def translate_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     try:
-        translated = GoogleTranslator(source="auto", target="en").translate(original)
+        # deep_translator is blocking, keep it off the event loop
+        translated = await asyncio.to_thread(_translate, original, "en")
         flag = "🇬🇧"
 
         if translated.strip().lower() == original.strip().lower():
-            translated = GoogleTranslator(source="auto", target="zh-CN").translate(original)
+            translated = await asyncio.to_thread(_translate, original, "zh-CN")
             flag = "🇨🇳"
 
         sent = await update.message.reply_text(f"{flag} Translation:\n{translated}")
-        await asyncio.sleep(40)
-        await sent.delete()
+        # Delete in the background so this chat's next update is not held up
+        DELETIONS.schedule(sent, 40)
     except:
         await update.message.reply_text("❌ Translation failed")
 
@@ -136,12 +216,15 @@ async def track_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     user = update.effective_user
 
-    cur.execute("""
-    INSERT INTO users (user_id, username, first_name)
-    VALUES (?, ?, ?)
-    ON CONFLICT(user_id)
-    DO UPDATE SET username=excluded.username, first_name=excluded.first_name
-    """, (user.id, user.username, user.first_name))
+    # Profiles rarely change, only write when the cached copy differs
+    profile_changed = not USER_PROFILES.is_current(user.id, user.username, user.first_name)
+    if profile_changed:
+        cur.execute("""
+        INSERT INTO users (user_id, username, first_name)
+        VALUES (?, ?, ?)
+        ON CONFLICT(user_id)
+        DO UPDATE SET username=excluded.username, first_name=excluded.first_name
+        """, (user.id, user.username, user.first_name))
 
     cur.execute("""
     INSERT INTO stats (user_id, chat_id, year_week, count)
@@ -151,6 +234,8 @@ async def track_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """, (user.id, update.effective_chat.id, current_week()))
 
     db.commit()
+    if profile_changed:
+        USER_PROFILES.remember(user.id, user.username, user.first_name)
 
 # ===== BASIC COMMANDS =====
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -166,19 +251,42 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def price(update: Update, context: ContextTypes.DEFAULT_TYPE):
     remember_chat(update)
-    await update.message.reply_text(
-        "💰 SUOLALA Price\n"
-        "https://dexscreener.com/solana/79Qaq5b1JfC8bFuXkAvXTR67fRPmMjMVNkEA3bb8bLzi"
-    )
+    text = "💰 SUOLALA Price\n"
+    stats = await asyncio.to_thread(PRICE_HISTORY.stats)
+    if stats:
+        text += f"💵 ${stats.price_usd:.10f} ({format_change(stats.change_24h)} 24h)\n"
+    await update.message.reply_text(text + DEXSCREENER_CHART_URL)
     await send_qr_if_exists(update, "price")
 
 async def chart(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Chart rendered from the recorded prices, reused for the rest of its candle bucket"""
+    from telegram.error import BadRequest
     remember_chat(update)
-    await update.message.reply_text(
-        "📈 SUOLALA Chart\n"
-        "https://dexscreener.com/solana/79Qaq5b1JfC8bFuXkAvXTR67fRPmMjMVNkEA3bb8bLzi"
-    )
-    await send_qr_if_exists(update, "chart")
+    token, args = split_token_arg(context.args)
+    window = args[0].lower() if args else CHART_DEFAULT_RANGE
+    if window not in CHART_RANGES or len(args) > 1:
+        await update.message.reply_text(f"❗ Usage: /chart {TOKEN_USAGE}[{'|'.join(CHART_RANGES)}]")
+        return
+
+    link = f"https://dexscreener.com/solana/{token.pair}"
+    cached = await CHARTS.get(token.mint, token.symbol, window)
+    if cached is None:
+        # No recorded prices yet (or no Pillow): the link as before
+        await update.message.reply_text(f"📈 {token.symbol} Chart\n{link}")
+        await send_qr_if_exists(update, "chart")
+        return
+
+    caption = f"📈 {token.symbol} {window}: {format_change(cached.change)}\n{link}"
+    if cached.file_id:
+        try:
+            await update.message.reply_photo(photo=cached.file_id, caption=caption)
+            return
+        except BadRequest as e:
+            print(f"[CHART] Cached chart rejected, uploading again: {e}")
+            cached.file_id = None
+    sent = await update.message.reply_photo(photo=cached.png, caption=caption)
+    if sent.photo:
+        cached.file_id = sent.photo[-1].file_id
 
 async def buy(update: Update, context: ContextTypes.DEFAULT_TYPE):
     remember_chat(update)
@@ -254,7 +362,7 @@ async def nft(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "Built by builders. Alive by belief."
     )
 
-    with open("nft.jpg", "rb") as photo:
+    with open(await MEDIA.get("nft.jpg"), "rb") as photo:
         await update.message.reply_photo(
             photo=photo,
             caption=caption
@@ -272,7 +380,7 @@ async def website(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Check if newweb.png exists
     if os.path.exists("newweb.png"):
-        with open("newweb.png", "rb") as photo:
+        with open(await MEDIA.get("newweb.png"), "rb") as photo:
             await update.message.reply_photo(
                 photo=photo,
                 caption="🌐 SUOLALA NEW WEBSITE\nhttps://suolala.netlify.app/"
@@ -293,8 +401,11 @@ async def rules(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def suolala(update: Update, context: ContextTypes.DEFAULT_TYPE):
     remember_chat(update)
     IMAGE_DIR = "girls"
-    img = random.choice([f for f in os.listdir(IMAGE_DIR) if f.lower().endswith(("jpg","png","jpeg"))])
-    await update.message.reply_photo(open(f"{IMAGE_DIR}/{img}", "rb"))
+    # Sorted so a deck's indexes keep pointing at the same files
+    images = sorted(f for f in os.listdir(IMAGE_DIR) if f.lower().endswith(("jpg","png","jpeg")))
+    img = await ROTATIONS.choose(update.effective_chat.id, "suolala", images)
+    with open(await MEDIA.get(f"{IMAGE_DIR}/{img}"), "rb") as photo:
+        await update.message.reply_photo(photo)
 
 # ===== MOTIVATIONS (ALL 70) =====
 MOTIVATIONS = [
@@ -370,15 +481,9 @@ MOTIVATIONS = [
 
 async def motivate(update: Update, context: ContextTypes.DEFAULT_TYPE):
     remember_chat(update)
-    chat_id = update.effective_chat.id
-    used = USED_MOTIVATIONS.setdefault(chat_id, set())
-
-    if len(used) >= len(MOTIVATIONS):
-        used.clear()
-
-    idx = random.choice([i for i in range(len(MOTIVATIONS)) if i not in used])
-    used.add(idx)
-    await update.message.reply_text(MOTIVATIONS[idx])
+    # Every motivation once per chat before any repeats
+    text = await ROTATIONS.choose(update.effective_chat.id, "motivate", MOTIVATIONS)
+    await update.message.reply_text(text)
 
 # ===== /count =====
 async def count_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -411,6 +516,179 @@ async def top_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         text += f"{medals[i]} {name} — {count}\n"
     await update.message.reply_text(text)
 
+# ===== TRACKED TOKENS =====
+def split_token_arg(args):
+    """Pull a tracked token's symbol out of command args -> (token, other args); primary token if none"""
+    args = list(args or [])
+    for i, arg in enumerate(args):
+        token = find_token(arg)
+        if token:
+            return token, args[:i] + args[i + 1:]
+    return PRIMARY_TOKEN, args
+
+
+# "[token] " in usage lines, only when more than one token is tracked
+TOKEN_USAGE = "[token] " if len(TRACKED_TOKENS) > 1 else ""
+
+# ===== /flow =====
+async def flow_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Rolling buy/sell flow collected by the buy alert monitor"""
+    remember_chat(update)
+    token, _ = split_token_arg(context.args)
+    # Written by the leader's monitor, so every replica answers the same
+    stats = await asyncio.to_thread(FLOW_HISTORY.load, token.mint)
+
+    if not stats.swaps_seen:
+        await update.message.reply_text("📊 No swaps in the last 24h. Flow stats come from the buy alert monitor.")
+        return
+
+    text = f"📊 {token.symbol} Flow\n━━━━━━━━━━━━━━━━━━━━━━\n"
+    for window, f in stats.summary().items():
+        sign = "+" if f["net_usd"] >= 0 else "-"
+        text += (
+            f"\n⏱ {window}\n"
+            f"🟢 {f['buys']} buys ${f['buy_usd']:,.0f} | 🔴 {f['sells']} sells ${f['sell_usd']:,.0f}\n"
+            f"💱 Volume ${f['volume_usd']:,.0f} | Net {sign}${abs(f['net_usd']):,.0f} ({f['net_sol']:+,.2f} SOL)\n"
+        )
+    await update.message.reply_text(text + "\n━━━━━━━━━━━━━━━━━━━━━━")
+
+# ===== BUY HISTORY =====
+WHALE_WINDOWS = {"24h": 86400, "7d": 7 * 86400}
+
+
+def short_wallet(wallet):
+    return f"{wallet[:4]}...{wallet[-4:]}"
+
+
+async def whales_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Top buyers over 24h (default) or 7d"""
+    remember_chat(update)
+    token, args = split_token_arg(context.args)
+    window = args[0].lower() if args else "24h"
+    if window not in WHALE_WINDOWS or len(args) > 1:
+        await update.message.reply_text(f"❗ Usage: /whales {TOKEN_USAGE}[24h|7d]")
+        return
+
+    rows = await asyncio.to_thread(SWAP_HISTORY.top_buyers, time.time() - WHALE_WINDOWS[window], 10, token.mint)
+    if not rows:
+        await update.message.reply_text(f"🐋 No {token.symbol} buys recorded in the last {window}.")
+        return
+
+    text = f"🐋 Top {token.symbol} Buyers ({window}) 🐋\n\n"
+    for i, (wallet, usd, sol, count) in enumerate(rows, 1):
+        text += f"{i}. {short_wallet(wallet)} — ${usd:,.0f} / {sol:,.2f} SOL ({count} buys)\n"
+    await update.message.reply_text(text)
+
+
+async def lastbuys_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Latest recorded buys"""
+    remember_chat(update)
+    token, _ = split_token_arg(context.args)
+    rows = await asyncio.to_thread(SWAP_HISTORY.recent_buys, 10, 0, token.mint)
+    if not rows:
+        await update.message.reply_text(f"🟢 No {token.symbol} buys recorded yet.")
+        return
+
+    now = time.time()
+    text = f"🟢 Latest {token.symbol} Buys\n\n"
+    for wallet, usd, sol, ts in rows:
+        ago = max(0, int(now - ts))
+        age = f"{ago // 3600}h" if ago >= 3600 else f"{ago // 60}m" if ago >= 60 else f"{ago}s"
+        text += f"• ${usd:,.0f} / {sol:,.2f} SOL — {short_wallet(wallet)} ({age} ago)\n"
+    await update.message.reply_text(text)
+
+
+async def wallet_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Buy/sell history of one wallet (full address or its first characters)"""
+    remember_chat(update)
+    token, args = split_token_arg(context.args)
+    if len(args) != 1:
+        await update.message.reply_text(f"❗ Usage: /wallet {TOKEN_USAGE}<address>")
+        return
+
+    query = args[0].split("...")[0]
+    if not is_wallet_prefix(query):
+        await update.message.reply_text(f"❗ Give a wallet address or at least its first {WALLET_PREFIX_MIN} characters.")
+        return
+    wallet = await asyncio.to_thread(SWAP_HISTORY.find_wallet, query)
+    if not wallet:
+        await update.message.reply_text("👤 No swaps recorded for that wallet.")
+        return
+
+    summary = await asyncio.to_thread(SWAP_HISTORY.wallet_summary, wallet, 5, token.mint)
+    (buys, bought), (sells, sold) = summary["buys"], summary["sells"]
+    text = (
+        f"👤 {short_wallet(wallet)} ({token.symbol})\n\n"
+        f"🟢 {buys} buys — ${bought:,.0f}\n"
+        f"🔴 {sells} sells — ${sold:,.0f}\n"
+        f"💱 Net: {'+' if bought >= sold else '-'}${abs(bought - sold):,.0f}\n\n"
+    )
+    for side, usd, sol, ts in summary["recent"]:
+        day = datetime.utcfromtimestamp(ts).strftime("%m-%d %H:%M")
+        text += f"{'🟢' if side == 'buy' else '🔴'} {day} UTC ${usd:,.0f} / {sol:,.2f} SOL\n"
+    await update.message.reply_text(text)
+
+# ===== /alerts (BUY ALERT SETTINGS) =====
+ALERTS_USAGE = (
+    f"⚙️ /alerts {TOKEN_USAGE}on|off\n"
+    f"⚙️ /alerts {TOKEN_USAGE}min <usd>\n"
+    f"⚙️ /alerts {TOKEN_USAGE}delete <seconds> (0 = keep)\n"
+    f"⚙️ /alerts {TOKEN_USAGE}media on|off"
+)
+if TOKEN_USAGE:
+    ALERTS_USAGE += "\n\nTokens: " + ", ".join(t.symbol for t in TRACKED_TOKENS) + f" (default {PRIMARY_TOKEN.symbol})"
+
+
+async def is_chat_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    if update.effective_chat.type == "private":
+        return True
+    try:
+        member = await context.bot.get_chat_member(update.effective_chat.id, update.effective_user.id)
+        return member.status in ("administrator", "creator")
+    except Exception as e:
+        print(f"[ALERTS] Admin check failed: {e}")
+        return False
+
+
+async def alerts_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show or change this chat's buy alert settings for one token (admins only)"""
+    remember_chat(update)
+    chat_id = update.effective_chat.id
+    token, args = split_token_arg(context.args)
+    sub = await asyncio.to_thread(load_subscription, chat_id, token.mint)
+    args = [a.lower() for a in args]
+
+    if args:
+        if not await is_chat_admin(update, context):
+            await update.message.reply_text("⛔ Only admins can change alert settings.")
+            return
+        try:
+            if args[0] in ("on", "off") and len(args) == 1:
+                sub.enabled = args[0] == "on"
+            elif args[0] == "min" and len(args) == 2:
+                sub.min_usd = float(args[1].lstrip("$").replace(",", ""))
+                if not sub.min_usd >= MIN_THRESHOLD_USD:  # also rejects nan
+                    await update.message.reply_text(f"❗ Minimum threshold is ${MIN_THRESHOLD_USD:,.0f}")
+                    return
+            elif args[0] == "delete" and len(args) == 2:
+                sub.delete_delay = max(0, int(args[1]))
+            elif args[0] == "media" and len(args) == 2 and args[1] in ("on", "off"):
+                sub.media = args[1] == "on"
+            else:
+                raise ValueError(args)
+        except ValueError:
+            await update.message.reply_text(ALERTS_USAGE)
+            return
+        await asyncio.to_thread(save_subscription, sub)
+
+    await update.message.reply_text(
+        f"🔔 {token.symbol} Buy Alerts\n\n"
+        f"Status: {'✅ on' if sub.enabled else '❌ off'}\n"
+        f"Threshold: ${sub.min_usd:,.0f}\n"
+        f"Auto-delete: {f'{sub.delete_delay}s' if sub.delete_delay else 'off'}\n"
+        f"Media: {'photo' if sub.media else 'text only'}\n\n" + ALERTS_USAGE
+    )
+
 # ===== WELCOME (FIXED) =====
 async def welcome_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not update.message.new_chat_members:
@@ -418,54 +696,9 @@ async def welcome_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     # Remember this chat
     remember_chat(update)
-    
-    chat_id = update.effective_chat.id
-    
-    for user in update.message.new_chat_members:
-        if user.is_bot:  # Skip if the new member is a bot
-            continue
-            
-        name = user.first_name
-        mention = f"[{name}](tg://user?id={user.id})"
-        text = (
-            f"🎉 Welcome {mention}!\n\n"
-            "🐉 **Welcome to 索拉拉 SUOLALA CTO**\n"
-            "💎 Stay strong. Stay patient."
-        )
 
-        try:
-            # First try to send animation if welcome.gif exists
-            if os.path.exists("welcome.gif"):
-                with open("welcome.gif", "rb") as gif:
-                    welcome_msg = await context.bot.send_animation(
-                        chat_id=chat_id,
-                        animation=gif,
-                        caption=text,
-                        parse_mode="Markdown"
-                    )
-                    # Schedule deletion after 5 minutes (300 seconds)
-                    asyncio.create_task(delete_after_delay(welcome_msg, 300))
-            else:
-                # If no GIF, send text message
-                welcome_msg = await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=text,
-                    parse_mode="Markdown"
-                )
-                # Schedule deletion after 5 minutes
-                asyncio.create_task(delete_after_delay(welcome_msg, 300))
-                
-        except Exception as e:
-            print(f"Welcome message error: {e}")
-            try:
-                # Fallback to text only
-                welcome_msg = await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=f"🎉 Welcome {name}!\n\n🐉 Welcome to 索拉拉 SUOLALA CTO\n💎 Stay strong. Stay patient."
-                )
-                asyncio.create_task(delete_after_delay(welcome_msg, 300))
-            except Exception as e2:
-                print(f"Even fallback welcome failed: {e2}")
+    # Greeted together with everyone else joining in the next few seconds (see welcome.py)
+    WELCOME_WAVES.add(context.bot, update.effective_chat.id, update.message.new_chat_members)
 
 # ===== GM / GN TASK (FIXED) =====
 async def gm_gn_task(application):
@@ -481,6 +714,7 @@ async def gm_gn_task(application):
                 except Exception as e:
                     print(f"GM error in chat {cid}: {e}")
             LAST_GM_DATE = today
+            await asyncio.to_thread(save_shared_state, "last_gm_date", today.isoformat())
 
         if 23 <= now.hour < 24 and LAST_GN_DATE != today:
             for cid in KNOWN_CHATS:
@@ -489,25 +723,92 @@ async def gm_gn_task(application):
                 except Exception as e:
                     print(f"GN error in chat {cid}: {e}")
             LAST_GN_DATE = today
+            await asyncio.to_thread(save_shared_state, "last_gn_date", today.isoformat())
 
         await asyncio.sleep(60)
 
 # Flag to prevent duplicate background task startup
 _background_started = False
 
+# Leader election: only the lease holder runs GM/GN and the buy alert monitor
+_elector = None
+_gm_gn_task = None
+
 
 async def post_init(app):
-    # Delete any existing webhook and wait for old polling sessions to timeout
-    print("[STARTUP] Clearing webhook and waiting for old sessions to timeout...")
-    await app.bot.delete_webhook(drop_pending_updates=True)
-    
-    # Wait for any existing polling session to timeout (Telegram timeout is ~30s)
-    await asyncio.sleep(35)
-    print("[STARTUP] Ready for polling")
+    with startup_phase("metrics server"):
+        await start_metrics_server()
+
+    # Optimised copies of the photos we upload, built off the event loop
+    LIFECYCLE.spawn(prepare_media(), "prepare media")
+    ROTATIONS.start()
+    # Messages the previous run was due to delete
+    restored = await DELETIONS.restore(app.bot)
+    if restored:
+        print(f"[STARTUP] Restored {restored} scheduled deletion(s)")
+    register_shutdown_hooks()
+
+    if BOT_MODE != "webhook":
+        # Delete any existing webhook and wait for old polling sessions to timeout
+        print("[STARTUP] Clearing webhook and waiting for old sessions to timeout...")
+        with startup_phase("polling takeover"):
+            await app.bot.delete_webhook(drop_pending_updates=True)
+
+            # Wait for any existing polling session to timeout (Telegram timeout is ~30s)
+            await asyncio.sleep(POLLING_TAKEOVER_WAIT)
+        print("[STARTUP] Ready for polling")
+
+    STARTUP_TIMINGS["total"] = round((time.perf_counter() - _MODULE_T0) * 1000, 1)
+    print(f"[STARTUP] Ready after {STARTUP_TIMINGS['total']}ms {STARTUP_TIMINGS}")
     
     # Schedule background tasks using pure asyncio (no JobQueue required)
     # This task will wait for polling to stabilize, then start background work
-    asyncio.create_task(delayed_background_startup(app))
+    LIFECYCLE.spawn(delayed_background_startup(app), "background startup")
+
+
+async def prepare_media():
+    try:
+        derivatives = await asyncio.to_thread(MEDIA.prepare)
+        print(f"[MEDIA] Prepared {len(derivatives)} photo(s)\n{media_report(derivatives)}")
+    except Exception as e:
+        print(f"[MEDIA] Could not prepare photos: {e}")
+
+
+def register_shutdown_hooks():
+    """What SIGTERM has to stop, flush, checkpoint and close (see lifecycle.py)"""
+    LIFECYCLE.on_shutdown(STOP_INTAKE, "leader jobs", stop_background)
+    LIFECYCLE.on_shutdown(FLUSH, "welcome waves", WELCOME_WAVES.flush)
+    LIFECYCLE.on_shutdown(FLUSH, "rotations", ROTATIONS.stop)
+    LIFECYCLE.on_shutdown(CHECKPOINT, "scheduled deletions", DELETIONS.checkpoint)
+    LIFECYCLE.on_shutdown(CLOSE, "http sessions", close_http)
+    LIFECYCLE.on_shutdown(CLOSE, "metrics server", stop_metrics_server)
+    LIFECYCLE.on_shutdown(CLOSE, "stats db", close_db)
+
+
+async def stop_background():
+    """Leave the election: the buy monitor finishes its pass, flushes and checkpoints"""
+    if _elector is not None:
+        await _elector.stop()
+
+
+async def close_http():
+    # Close the pooled HTTP connections, if a command or the monitor opened any
+    http_client = sys.modules.get("http_client")
+    if http_client is not None:
+        await http_client.HTTP.close()
+
+
+async def close_db():
+    # Closing the last connection checkpoints the WAL into the database file
+    global db, cur
+    if db is not None:
+        db.close()
+        db, cur = None, None
+
+
+async def post_stop(app):
+    # Updates are no longer processed, but the bot can still reach Telegram
+    await LIFECYCLE.shutdown()
 
 
 async def delayed_background_startup(app):
@@ -522,15 +823,51 @@ async def delayed_background_startup(app):
     
     # Wait for polling to fully initialize
     await asyncio.sleep(5)
-    
+    if LIFECYCLE.stopping:
+        return
+
+    # Background jobs start once this replica wins the lease
+    global _elector
+    _elector = LeaderElector(
+        on_elected=lambda: start_leader_jobs(app),
+        on_demoted=stop_leader_jobs,
+    )
+    from webhook_server import register_health_provider
+    register_health_provider("leader", _elector.status)
+    LIFECYCLE.spawn(_elector.run(), "leader election")
+
+
+async def start_leader_jobs(app):
+    """Start the singleton background jobs on the elected leader"""
+    global _gm_gn_task, LAST_GM_DATE, LAST_GN_DATE
+
+    # Pick up where the previous leader left off so GM/GN is not sent twice
+    last_gm = await asyncio.to_thread(load_shared_state, "last_gm_date")
+    last_gn = await asyncio.to_thread(load_shared_state, "last_gn_date")
+    if last_gm:
+        LAST_GM_DATE = datetime.fromisoformat(last_gm).date()
+    if last_gn:
+        LAST_GN_DATE = datetime.fromisoformat(last_gn).date()
+
     # Start GM/GN task
-    asyncio.create_task(gm_gn_task(app))
+    _gm_gn_task = LIFECYCLE.spawn(gm_gn_task(app), "gm/gn")
     print("[BACKGROUND] GM/GN task started")
-    
+
     # Start buy alert monitor
     await start_buy_alert_monitor_safe(app)
 
 
+async def stop_leader_jobs():
+    """Stop the singleton background jobs after losing the lease"""
+    global _gm_gn_task
+    if _gm_gn_task:
+        _gm_gn_task.cancel()
+        _gm_gn_task = None
+        print("[BACKGROUND] GM/GN task stopped")
+    from buy_alert import stop_buy_alert_monitor
+    await stop_buy_alert_monitor()
+
+
 async def start_buy_alert_monitor_safe(app):
     """Start buy alert monitor only if chat IDs exist, prevent duplicate starts"""
     # Reload chat IDs from file
@@ -549,6 +886,7 @@ async def start_buy_alert_monitor_safe(app):
             print(f"[BUY ALERT] Error reading chat IDs: {e}")
     
     if chat_ids:
+        from buy_alert import start_buy_alert_monitor
         await start_buy_alert_monitor(app.bot, list(chat_ids))
         print(f"[BUY ALERT] Monitor started for {len(chat_ids)} chat(s)")
     else:
@@ -556,18 +894,42 @@ async def start_buy_alert_monitor_safe(app):
 
 
 # ===== DEXSCREENER API FOR PRICECHECK =====
-DEXSCREENER_API_URL = "https://api.dexscreener.com/latest/dex/pairs/solana/79Qaq5b1JfC8bFuXkAvXTR67fRPmMjMVNkEA3bb8bLzi"
+# Same settings as buy_alert.py, repeated so that importing bot does not load aiohttp
+DEXSCREENER_BASE = os.getenv("DEXSCREENER_BASE", "https://api.dexscreener.com")
+DEXSCREENER_PAIR = "79Qaq5b1JfC8bFuXkAvXTR67fRPmMjMVNkEA3bb8bLzi"
+DEXSCREENER_API_URL = f"{DEXSCREENER_BASE}/latest/dex/pairs/solana/{DEXSCREENER_PAIR}"
 DEXSCREENER_CHART_URL = "https://dexscreener.com/solana/79Qaq5b1JfC8bFuXkAvXTR67fRPmMjMVNkEA3bb8bLzi"
 
 
+def format_change(change):
+    return f"{change:+.2f}%" if change is not None else "N/A"
+
+
 async def pricecheck(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Fetch and display live SUOLALA price data from DexScreener API"""
+    """Display SUOLALA price data, from the recorded prices or else the DexScreener API"""
+    from http_client import HTTP, REQUEST_ERRORS  # imported on first use, see the note at the top
     remember_chat(update)
+
+    # The buy monitor records prices every minute; only ask DexScreener when it is not running
+    stats = await asyncio.to_thread(PRICE_HISTORY.stats)
+    if stats:
+        await update.message.reply_text(
+            "📊 SUOLALA Price Check\n"
+            "━━━━━━━━━━━━━━━━━━━━━━\n\n"
+            f"💵 Price: ${stats.price_usd:.10f}\n"
+            f"🏦 Market Cap: ${stats.market_cap:,.0f}\n"
+            f"💧 Liquidity: ${stats.liquidity_usd:,.0f}\n"
+            f"⏱ 1h Change: {format_change(stats.change_1h)}\n"
+            f"📈 24h Change: {format_change(stats.change_24h)}\n"
+            f"↕️ 24h Range: ${stats.low_24h:.10f} - ${stats.high_24h:.10f}\n"
+            f"💱 24h Volume: ${stats.volume_24h:,.0f}\n\n"
+            "━━━━━━━━━━━━━━━━━━━━━━"
+        )
+        return
     
     try:
-        response = requests.get(DEXSCREENER_API_URL, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        with track_upstream("dexscreener", "pricecheck"):
+            data = await HTTP.get_json(DEXSCREENER_API_URL)
         
         pair = data.get("pair")
         if not pair:
@@ -600,7 +962,7 @@ async def pricecheck(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         await update.message.reply_text(message)
         
-    except requests.exceptions.RequestException as e:
+    except REQUEST_ERRORS as e:
         print(f"[PRICECHECK] API error: {e}")
         await update.message.reply_text("❌ Failed to fetch price data. API may be temporarily unavailable.")
     except Exception as e:
@@ -608,14 +970,18 @@ async def pricecheck(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ An error occurred. Try again later.")
 
 
-def get_floor_price():
+MAGICEDEN_HEADERS = {
+    "accept": "application/json",
+    "user-agent": "Mozilla/5.0"
+}
+
+
+async def get_floor_price():
+    from http_client import HTTP
     try:
-        url = f"https://api-mainnet.magiceden.dev/v2/collections/{MAGICEDEN_COLLECTION}/stats"
-        headers = {
-            "accept": "application/json",
-            "user-agent": "Mozilla/5.0"
-        }
-        data = requests.get(url, headers=headers, timeout=10).json()
+        url = f"{MAGICEDEN_API_BASE}/v2/collections/{MAGICEDEN_COLLECTION}/stats"
+        with track_upstream("magiceden", "stats"):
+            data = await HTTP.get_json(url, headers=MAGICEDEN_HEADERS)
         floor_lamports = data.get("floorPrice", 0)
         if floor_lamports:
             return floor_lamports / 1_000_000_000
@@ -626,17 +992,14 @@ def get_floor_price():
 
 
 async def randomnft(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    from http_client import HTTP
     remember_chat(update)
 
     try:
-        headers = {
-            "accept": "application/json",
-            "user-agent": "Mozilla/5.0"
-        }
-
         # 1️⃣ Fetch listed NFTs (REAL LISTINGS)
-        list_url = f"https://api-mainnet.magiceden.dev/v2/collections/{MAGICEDEN_COLLECTION}/listings?offset=0&limit=100"
-        listings = requests.get(list_url, headers=headers, timeout=15).json()
+        list_url = MAGICEDEN_LIST_URL.format(MAGICEDEN_COLLECTION)
+        with track_upstream("magiceden", "listings"):
+            listings = await HTTP.get_json(list_url, headers=MAGICEDEN_HEADERS, timeout=15)
 
         if not listings or not isinstance(listings, list):
             await update.message.reply_text("❌ No Suolala NFTs listed right now.")
@@ -654,8 +1017,9 @@ async def randomnft(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         # 3️⃣ Fetch NFT metadata (image)
-        token_url = f"https://api-mainnet.magiceden.dev/v2/tokens/{mint}"
-        token_data = requests.get(token_url, headers=headers, timeout=15).json()
+        token_url = f"{MAGICEDEN_API_BASE}/v2/tokens/{mint}"
+        with track_upstream("magiceden", "token"):
+            token_data = await HTTP.get_json(token_url, headers=MAGICEDEN_HEADERS, timeout=15)
         image = token_data.get("image")
 
         if not image:
@@ -777,56 +1141,152 @@ async def automatic_messages(update: Update, context: ContextTypes.DEFAULT_TYPE)
     # Check for keywords and respond
     for keyword, responses in keyword_responses.items():
         if keyword in text:
-            response_text = random.choice(responses)
+            response_text = await ROTATIONS.choose(update.effective_chat.id, f"auto:{keyword}", responses)
             
             try:
                 # Send the response
                 sent_msg = await update.message.reply_text(response_text)
                 # Schedule deletion after 60 seconds
-                asyncio.create_task(delete_after_delay(sent_msg, 60))
+                DELETIONS.schedule(sent_msg, 60)
             except Exception as e:
                 print(f"Automatic message error: {e}")
             break  # Only respond to one keyword per message
 
+# ===== RATE LIMITING =====
+command_limiter = CommandRateLimiter()
+
+
+async def rate_limit_commands(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Shed commands over the user/chat/global budget before any handler runs"""
+    message = update.message
+    if not message or not message.from_user:
+        return
+
+    command = command_name(message.text, context.bot.username)
+    if command is None:
+        return
+
+    allowed, scope, retry_after = command_limiter.check(
+        message.from_user.id, update.effective_chat.id, command
+    )
+    if allowed:
+        return
+
+    # Global overload is shed silently; users get a single notice per cooldown
+    if scope != "global" and command_limiter.should_notify(message.from_user.id, retry_after):
+        try:
+            notice = await message.reply_text(f"⏳ Slow down! Try again in {int(retry_after) + 1}s")
+            DELETIONS.schedule(notice, 10)
+        except Exception as e:
+            print(f"[RATE LIMIT] Notice error: {e}")
+    raise ApplicationHandlerStop
+
 # ===== START BOT =====
-app = ApplicationBuilder().token(TOKEN).post_init(post_init).build()
-
-# MESSAGE TRACKER MUST BE FIRST
-app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, track_messages))
-
-# AUTOMATIC MESSAGES HANDLER
-app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, automatic_messages))
-
-# WELCOME - THIS MUST COME AFTER AUTOMATIC MESSAGES TO AVOID CONFLICT
-app.add_handler(MessageHandler(filters.StatusUpdate.NEW_CHAT_MEMBERS, welcome_new_member))
-
-# TRANSLATER
-app.add_handler(CommandHandler("translate", translate_cmd))
-
-# ALL COMMANDS REGISTERED
-app.add_handler(CommandHandler("start", start))
-app.add_handler(CommandHandler("price", price))
-app.add_handler(CommandHandler("chart", chart))
-app.add_handler(CommandHandler("buy", buy))
-app.add_handler(CommandHandler("memes", memes))
-app.add_handler(CommandHandler("stickers", stickers))
-app.add_handler(CommandHandler("x", x))
-app.add_handler(CommandHandler("community", community))
-app.add_handler(CommandHandler("nft", nft))
-app.add_handler(CommandHandler("contract", contract))
-app.add_handler(CommandHandler("website", website))
-app.add_handler(CommandHandler("rules", rules))
-app.add_handler(CommandHandler("suolala", suolala))
-app.add_handler(CommandHandler("motivate", motivate))
-app.add_handler(CommandHandler("count", count_cmd))
-app.add_handler(CommandHandler("top", top_cmd))
-app.add_handler(CommandHandler("randomnft", randomnft))
-app.add_handler(CommandHandler("pricecheck", pricecheck))
-
-print("✅ SUOLALA BOT RUNNING — ALL FEATURES ENABLED")
-print(f"📊 Total commands: 19")
-print(f"🤖 Automatic messages: Enabled for 15 keywords")
-print(f"👋 Welcome messages: Fixed and will send properly")
-print(f"🕒 Welcome messages: Auto-delete after 5 minutes")
-print(f"💬 Auto-responses: Delete after 1 minute")
-app.run_polling(drop_pending_updates=True)
+def register_handlers(application):
+    """Register every handler on the given application"""
+    # UPDATE LATENCY (runs before every other handler group)
+    application.add_handler(TypeHandler(Update, record_update_latency), group=-2)
+
+    # RATE LIMITING (stops over-budget commands before they reach a handler)
+    application.add_handler(MessageHandler(filters.COMMAND, rate_limit_commands), group=-1)
+
+    # MESSAGE TRACKER MUST BE FIRST
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, track_messages))
+
+    # AUTOMATIC MESSAGES HANDLER
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, automatic_messages))
+
+    # WELCOME - THIS MUST COME AFTER AUTOMATIC MESSAGES TO AVOID CONFLICT
+    application.add_handler(MessageHandler(filters.StatusUpdate.NEW_CHAT_MEMBERS, welcome_new_member))
+
+    # TRANSLATER
+    application.add_handler(CommandHandler("translate", translate_cmd))
+
+    # ALL COMMANDS REGISTERED
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("price", price))
+    application.add_handler(CommandHandler("chart", chart))
+    application.add_handler(CommandHandler("buy", buy))
+    application.add_handler(CommandHandler("memes", memes))
+    application.add_handler(CommandHandler("stickers", stickers))
+    application.add_handler(CommandHandler("x", x))
+    application.add_handler(CommandHandler("community", community))
+    application.add_handler(CommandHandler("nft", nft))
+    application.add_handler(CommandHandler("contract", contract))
+    application.add_handler(CommandHandler("website", website))
+    application.add_handler(CommandHandler("rules", rules))
+    application.add_handler(CommandHandler("suolala", suolala))
+    application.add_handler(CommandHandler("motivate", motivate))
+    application.add_handler(CommandHandler("count", count_cmd))
+    application.add_handler(CommandHandler("top", top_cmd))
+    application.add_handler(CommandHandler("randomnft", randomnft))
+    application.add_handler(CommandHandler("pricecheck", pricecheck))
+    application.add_handler(CommandHandler("flow", flow_cmd))
+    application.add_handler(CommandHandler("whales", whales_cmd))
+    application.add_handler(CommandHandler("lastbuys", lastbuys_cmd))
+    application.add_handler(CommandHandler("wallet", wallet_cmd))
+    application.add_handler(CommandHandler("alerts", alerts_cmd))
+
+    # METRICS: wrap every handler registered above
+    instrument_handlers(application)
+
+
+def build_application(bot=None):
+    """Build the Application; pass a bot to run against a fake Bot API (benchmarks)"""
+    with startup_phase("state"):
+        init_state()
+
+    with startup_phase("application"):
+        application = _build(bot)
+
+    with startup_phase("handlers"):
+        register_handlers(application)
+    return application
+
+
+def _build(bot):
+    builder = (
+        ApplicationBuilder()
+        .update_queue(TimedUpdateQueue())
+        .concurrent_updates(PerChatUpdateProcessor())
+        .post_init(post_init)
+        .post_stop(post_stop)
+    )
+    if bot is not None:
+        builder = builder.bot(bot)
+    else:
+        builder = (
+            builder
+            .token(TOKEN)
+            .base_url(f"{TELEGRAM_API_BASE}/bot")
+            .base_file_url(f"{TELEGRAM_API_BASE}/file/bot")
+            .request(InstrumentedHTTPXRequest(connection_pool_size=256))
+        )
+
+    return builder.build()
+
+
+def main():
+    STARTUP_TIMINGS["import"] = _IMPORT_MS
+    print(f"[STARTUP] import: {_IMPORT_MS}ms")
+    app = build_application()
+
+    print("✅ SUOLALA BOT RUNNING — ALL FEATURES ENABLED")
+    print(f"📊 Total commands: 24")
+    print(f"🤖 Automatic messages: Enabled for 15 keywords")
+    print(f"👋 Welcome messages: Fixed and will send properly")
+    print(f"🕒 Welcome messages: Auto-delete after 5 minutes")
+    print(f"💬 Auto-responses: Delete after 1 minute")
+    print(f"🔌 Serving mode: {BOT_MODE}")
+
+    if BOT_MODE == "webhook":
+        from webhook_server import run_webhook
+        asyncio.run(run_webhook(app))
+    else:
+        app.run_polling(drop_pending_updates=True)
+
+
+_IMPORT_MS = round((time.perf_counter() - _MODULE_T0) * 1000, 1)
+
+if __name__ == "__main__":
+    main()
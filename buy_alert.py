@@ -1,469 +1,663 @@
 # NEW BUY ALERT FEATURE
-# Monitors SUOLALA token buys on Solana and sends alerts to Telegram
+# Monitors buys of SUOLALA (and any other tracked token) on Solana and sends
+# alerts to Telegram
 
 import os
-import asyncio
-import aiohttp
 import json
+import asyncio
 import time
 from datetime import datetime
-from typing import Optional, Dict, Set
-from dataclasses import dataclass
+from typing import Optional, Dict, List, Set, Tuple
+from dataclasses import dataclass, field
+
+from metrics import track_upstream, BUY_MONITOR_CYCLE, BUY_MONITOR_SWAPS, BUY_MONITOR_POLL_INTERVAL
+from pricing import PoolPriceEngine, PoolReserves, RAYDIUM_AUTHORITY
+from flow import FLOW_HISTORY, FLOW_STATS, flow_stats
+from buy_history import SWAP_HISTORY
+from price_history import PRICE_HISTORY, PRICE_SAMPLE_SECONDS
+from alert_outbox import AlertOutbox, AlertDispatcher
+from alert_subscriptions import SUBSCRIPTIONS, DEFAULT_MIN_USD
+from token_registry import TRACKED_TOKENS, TrackedToken
+from rpc_budget import RPC_BUDGET, AdaptiveInterval, parse_retry_after
+from solana_tx import ParsedTransaction, decode_transaction
+from http_client import HTTP
+from leader import load_shared_state, save_shared_state
+from lifecycle import LIFECYCLE
 
 # ===== CONFIGURATION =====
-SUOLALA_MINT = "CY1P83KnKwFYostvjQcoR2HJLyEJWRBRaVQmYyyD3cR8"
 WSOL_MINT = "So11111111111111111111111111111111111111112"
 
-# DexScreener pair address for SUOLALA/SOL
-DEXSCREENER_PAIR = "79Qaq5b1JfC8bFuXkAvXTR67fRPmMjMVNkEA3bb8bLzi"
-DEXSCREENER_API = f"https://api.dexscreener.com/latest/dex/pairs/solana/{DEXSCREENER_PAIR}"
+DEXSCREENER_BASE = os.getenv("DEXSCREENER_BASE", "https://api.dexscreener.com")
+DEXSCREENER_PAIRS_API = f"{DEXSCREENER_BASE}/latest/dex/pairs/solana/"
+
+# DexScreener accepts up to 30 comma-separated pair addresses per request
+DEXSCREENER_MAX_PAIRS = 30
+
+# DexScreener SOL/USDC pair, used when no tracked pair gives a SOL price
+SOL_USDC_PAIR = "8sLbNZoA1cfnvMJLPfp98ZLAnFSYCFApfJKMbiXNLwxj"
 
 # Solana RPC endpoints
 SOLANA_RPC_HTTP = os.getenv("SOLANA_RPC_HTTP", "https://api.mainnet-beta.solana.com")
 SOLANA_RPC_WS = os.getenv("SOLANA_RPC_WS", "wss://api.mainnet-beta.solana.com")
 
-# Alert threshold in USD
-MIN_BUY_USD = 1000.0
+# JSON-RPC calls sent per HTTP request (1 = no batching, for providers that reject batches)
+RPC_BATCH_SIZE = max(1, int(os.getenv("RPC_BATCH_SIZE", "20")))
 
-# Auto-delete alert after 3 minutes (180 seconds)
-ALERT_DELETE_DELAY = int(os.getenv("ALERT_DELETE_DELAY", "120"))
+# Signatures fetched per token per request (a full page makes that token poll at the minimum interval).
+# A full page is followed back to the last signature seen, up to MAX_SIGNATURE_PAGES
+SIGNATURE_PAGE = 20
+MAX_SIGNATURE_PAGES = 5
+
+# JSON-RPC error codes providers use for "too many requests"
+RPC_RATE_LIMIT_CODES = (429, -32005)
+
+# Default alert threshold in USD; admins set one per chat with /alerts
+MIN_BUY_USD = DEFAULT_MIN_USD
 
 # Anti-spam: ignore repeated buys from same wallet within this window (seconds)
 WALLET_COOLDOWN_SECONDS = 60
 
+# Shared state key of the monitor checkpoint (cursors, cooldowns, flow stats) the next leader resumes from
+MONITOR_CHECKPOINT_KEY = "buy_monitor"
+
+# How long stop() lets a polling pass finish before cancelling it
+MONITOR_STOP_TIMEOUT = float(os.getenv("MONITOR_STOP_TIMEOUT", "5"))
+
 # Known DEX program IDs
 RAYDIUM_AMM_V4 = "675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8"
 JUPITER_AGGREGATOR_V6 = "JUP6LkbZbjS1jKKwapdHNy74zcZ3tLUZoi5QNyVTaV4"
+DEX_PROGRAMS = frozenset((RAYDIUM_AMM_V4, JUPITER_AGGREGATOR_V6))
 
 
-@dataclass
+@dataclass(slots=True)
 class TokenData:
-    """Live token data from DexScreener"""
+    """Token figures used for alerts (pool price, DexScreener SOL/USD and supply)"""
     price_usd: float
     market_cap: float
     liquidity_usd: float
     sol_price_usd: float
 
 
-@dataclass
-class BuyTransaction:
-    """Parsed buy transaction data"""
+@dataclass(slots=True)
+class SwapTransaction:
+    """Parsed swap (buy or sell) transaction data"""
     signature: str
-    buyer_wallet: str
+    mint: str
+    side: str  # "buy" or "sell"
+    wallet: str
     sol_amount: float
     token_amount: float
     usd_value: float
     timestamp: int
+    price_usd: float = 0.0  # pool price right after the swap
+
+
+@dataclass
+class TokenState:
+    """Polling and pricing state of one tracked token"""
+    token: TrackedToken
+    pricing: PoolPriceEngine
+    last_signature: Optional[str] = None
+    interval: AdaptiveInterval = field(default_factory=AdaptiveInterval)
+    next_poll_at: float = 0.0  # monotonic
+    new_signatures: Optional[int] = None  # seen by the last poll, None if it failed
 
 
 class BuyAlertMonitor:
     """
-    Monitors Solana blockchain for SUOLALA buy transactions.
-    Sends alerts to Telegram when buy value exceeds threshold.
+    Monitors Solana blockchain for buys of every tracked token.
+    All tokens share one polling loop (batched RPC), one DexScreener call
+    and one alert outbox; chats subscribe per token with /alerts.
     """
 
-    def __init__(self, telegram_bot, chat_ids: list):
+    def __init__(self, telegram_bot, chat_ids: list, tokens: Optional[List[TrackedToken]] = None):
         self.bot = telegram_bot
         self.chat_ids = chat_ids
-        self.processed_txs: Set[str] = set()
-        self.wallet_last_buy: Dict[str, float] = {}
+        self.tokens: Dict[str, TokenState] = {
+            token.mint: TokenState(token, PoolPriceEngine(token.mint, WSOL_MINT, token.token_vault,
+                                                          token.sol_vault, symbol=token.symbol))
+            for token in tokens or TRACKED_TOKENS
+        }
+        self.processed_txs: Set[Tuple[str, str]] = set()  # (mint, signature)
+        self.wallet_last_buy: Dict[Tuple[str, str], float] = {}  # (mint, wallet) -> time
         self.running = False
-        self._session: Optional[aiohttp.ClientSession] = None
-        self._cached_token_data: Optional[TokenData] = None
-        self._token_data_timestamp: float = 0
-        self._token_data_cache_ttl = 10  # Cache token data for 10 seconds
+        self._rpc_id = 0
+        self.calls_per_poll = 2.0  # moving average of RPC calls one token poll costs
+        self.outbox = AlertOutbox()
+        self.dispatcher = AlertDispatcher(telegram_bot, self.outbox)
+        self._dispatch_task: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()  # cuts the sleep between passes short on stop()
+        self.market_sampled_at: float = 0
 
     async def start(self):
         """Start the buy alert monitor"""
         self.running = True
-        self._session = aiohttp.ClientSession()
-        print(f"[BUY ALERT] Starting monitor for SUOLALA: {SUOLALA_MINT}")
-        print(f"[BUY ALERT] Minimum buy threshold: ${MIN_BUY_USD} USD")
+        self._loop_task = asyncio.current_task()
+        await self._restore_checkpoint()
+        # Known chats start with the default settings
+        await asyncio.to_thread(SUBSCRIPTIONS.ensure, self.chat_ids)
+        await SUBSCRIPTIONS.refresh(force=True)
+        await self._load_flow()
+        SWAP_HISTORY.start()
+        PRICE_HISTORY.start()
+        FLOW_HISTORY.start()
+        # Delivery runs on its own so a slow Bot API never holds up detection;
+        # it also picks up alerts left pending by a previous run
+        self._dispatch_task = asyncio.create_task(self.dispatcher.run())
+        for state in self.tokens.values():
+            print(f"[BUY ALERT] Starting monitor for {state.token.symbol}: {state.token.mint} "
+                  f"(lowest chat threshold: ${SUBSCRIPTIONS.min_threshold(state.token.mint):,.0f} USD)")
         
         # Run monitoring loop
         await self._monitor_loop()
 
     async def stop(self):
-        """Stop the buy alert monitor"""
+        """Stop the buy alert monitor: finish the current pass, flush and save a checkpoint"""
         self.running = False
-        if self._session:
-            await self._session.close()
-            self._session = None
+        self._wakeup.set()
+        finished = True
+        task = self._loop_task
+        if task and task is not asyncio.current_task() and not task.done():
+            done, _ = await asyncio.wait({task}, timeout=MONITOR_STOP_TIMEOUT)
+            if not done:
+                print(f"[BUY ALERT] Polling pass still running after {MONITOR_STOP_TIMEOUT:g}s, cancelling it")
+                finished = False
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        if self._dispatch_task:
+            self.dispatcher.stop()
+            await asyncio.gather(self._dispatch_task, return_exceptions=True)
+            self._dispatch_task = None
+        await SWAP_HISTORY.stop()
+        await PRICE_HISTORY.stop()
+        await FLOW_HISTORY.stop()
+        # A cancelled pass may have advanced a cursor past swaps it never processed: keep the old cursors then
+        await self._save_checkpoint(cursors=finished)
         print("[BUY ALERT] Monitor stopped")
 
+    def checkpoint(self, cursors: bool = True) -> dict:
+        """State the next leader resumes from, as plain data"""
+        now = time.time()
+        return {
+            "saved_at": now,
+            "cursors": {mint: state.last_signature for mint, state in self.tokens.items()
+                        if cursors and state.last_signature},
+            "cooldowns": [[mint, wallet, at] for (mint, wallet), at in self.wallet_last_buy.items()
+                          if now - at < WALLET_COOLDOWN_SECONDS],
+        }
+
+    async def _save_checkpoint(self, cursors: bool = True):
+        try:
+            data = self.checkpoint(cursors)
+            if not cursors:
+                previous = await self._load_checkpoint()
+                data["cursors"] = (previous or {}).get("cursors", {})
+            await asyncio.to_thread(save_shared_state, MONITOR_CHECKPOINT_KEY, json.dumps(data))
+            print(f"[BUY ALERT] Checkpoint saved: {len(data['cursors'])} cursor(s), "
+                  f"{len(data['cooldowns'])} cooldown(s)")
+        except Exception as e:
+            print(f"[BUY ALERT] Failed to save checkpoint: {e}")
+
+    async def _load_checkpoint(self) -> Optional[dict]:
+        try:
+            raw = await asyncio.to_thread(load_shared_state, MONITOR_CHECKPOINT_KEY)
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            print(f"[BUY ALERT] Failed to load checkpoint: {e}")
+            return None
+
+    async def _restore_checkpoint(self):
+        """Resume from the previous leader: no missed or double-counted swaps across a handover"""
+        data = await self._load_checkpoint()
+        if not data:
+            return
+        for mint, signature in data.get("cursors", {}).items():
+            state = self.tokens.get(mint)
+            if state and state.last_signature is None:
+                state.last_signature = signature
+        now = time.time()
+        for mint, wallet, at in data.get("cooldowns", []):
+            if now - at < WALLET_COOLDOWN_SECONDS:
+                self.wallet_last_buy.setdefault((mint, wallet), at)
+        print(f"[BUY ALERT] Resuming from checkpoint saved {now - data.get('saved_at', now):.0f}s ago: "
+              f"{len(data.get('cursors', {}))} cursor(s)")
+
+    async def _load_flow(self):
+        """Carry on the flow windows as last written (by the previous leader or this process)"""
+        for mint in self.tokens:
+            try:
+                FLOW_STATS[mint] = await asyncio.to_thread(FLOW_HISTORY.load, mint)
+            except Exception as e:
+                print(f"[BUY ALERT] Failed to load flow stats: {e}")
+
     async def _monitor_loop(self):
-        """Main monitoring loop using transaction polling"""
-        last_signature = None
-        
+        """Main monitoring loop: polls each token when its adaptive interval is up"""
         while self.running:
+            now = time.monotonic()
+            due = [state for state in self.tokens.values() if state.next_poll_at <= now]
+            if due:
+                cycle_started = time.perf_counter()
+                calls_before = RPC_BUDGET.used_today
+                try:
+                    await self._poll_once(due)
+                except Exception as e:
+                    print(f"[BUY ALERT] Monitor error: {e}")
+                BUY_MONITOR_CYCLE.observe(time.perf_counter() - cycle_started)
+                spent = max(0, RPC_BUDGET.used_today - calls_before)  # 0 if the UTC day rolled over
+                self.calls_per_poll = 0.8 * self.calls_per_poll + 0.2 * spent / len(due)
+                self._schedule(due)
+
+            # Quiet tokens still get a price sample (one DexScreener call for all of them)
+            if time.time() - self.market_sampled_at >= PRICE_SAMPLE_SECONDS:
+                await self._refresh_market_data()
+
+            # Sleep until the next token is due (or the 429 backoff ends)
+            next_poll = min(state.next_poll_at for state in self.tokens.values())
             try:
-                # Fetch recent transactions for the token
-                transactions = await self._get_recent_transactions(last_signature)
-                
-                for tx in transactions:
-                    sig = tx.get("signature")
-                    if not sig or sig in self.processed_txs:
-                        continue
-                    
-                    # Parse and check if it's a buy
-                    buy_data = await self._parse_transaction(sig)
-                    if buy_data and buy_data.usd_value >= MIN_BUY_USD:
-                        # Anti-spam check
-                        if self._is_wallet_on_cooldown(buy_data.buyer_wallet):
-                            print(f"[BUY ALERT] Skipping (wallet cooldown): {buy_data.buyer_wallet}")
-                            self.processed_txs.add(sig)
-                            continue
-                        
+                await asyncio.wait_for(self._wakeup.wait(),
+                                       max(0.05, next_poll - time.monotonic(), RPC_BUDGET.held_for()))
+            except asyncio.TimeoutError:
+                pass
+
+    def _schedule(self, polled: List[TokenState]):
+        """Set the next poll of each token from its activity and the RPC budget"""
+        # With a daily budget, all tokens together must not outspend the rest of the day
+        floor = RPC_BUDGET.pace_interval(self.calls_per_poll * len(self.tokens))
+        now = time.monotonic()
+        for state in polled:
+            if state.new_signatures is not None:
+                state.interval.update(state.new_signatures, state.new_signatures >= SIGNATURE_PAGE)
+            seconds = max(state.interval.seconds, floor)
+            state.next_poll_at = now + seconds
+            BUY_MONITOR_POLL_INTERVAL.set(state.token.symbol, value=seconds)
+
+    async def _poll_once(self, states: Optional[List[TokenState]] = None):
+        """One pass over the given tokens (all by default): one signatures batch, then batched transaction fetches"""
+        # Pick up /alerts changes (possibly made on another replica)
+        await SUBSCRIPTIONS.refresh()
+
+        states = list(self.tokens.values()) if states is None else states
+        signature_lists = await self._get_recent_signatures(states)
+        for state, entries in zip(states, signature_lists):
+            state.new_signatures = None if entries is None else len(entries)
+
+        # A swap between two tracked tokens shows up in both lists but is fetched once
+        touched: Dict[str, List[TokenState]] = {}
+        for state, entries in zip(states, signature_lists):
+            for entry in entries or ():
+                sig = entry.get("signature")
+                if sig and (state.token.mint, sig) not in self.processed_txs:
+                    touched.setdefault(sig, []).append(state)
+
+        transactions = await self._get_transactions(list(touched))
+        if transactions is None:
+            return  # nothing marked seen, the same signatures are fetched again next pass
+        for state, entries in zip(states, signature_lists):
+            if entries:
+                state.last_signature = entries[0].get("signature")
+
+        for sig, sig_states in touched.items():
+            for state in sig_states:
+                mint = state.token.mint
+                # Parse the swap; every swap feeds the flow stats, buys may alert
+                swap = await self._parse_transaction(state, sig, transactions.get(sig))
+                if swap:
+                    flow_stats(mint).record(swap.side, swap.sol_amount, swap.usd_value, swap.timestamp)
+                    SWAP_HISTORY.add(swap)
+                    market = state.pricing.market
+                    PRICE_HISTORY.record(mint, swap.price_usd, swap.timestamp, swap.usd_value,
+                                         market_cap=swap.price_usd * market.token_supply if market else None)
+                    BUY_MONITOR_SWAPS.inc(state.token.symbol, swap.side)
+                if swap and swap.side == "buy" and swap.usd_value >= SUBSCRIPTIONS.min_threshold(mint):
+                    # Anti-spam check
+                    if self._is_wallet_on_cooldown(mint, swap.wallet):
+                        print(f"[BUY ALERT] Skipping {state.token.symbol} (wallet cooldown): {swap.wallet}")
+                    else:
                         # Send alert
-                        await self._send_alert(buy_data)
-                        self.wallet_last_buy[buy_data.buyer_wallet] = time.time()
-                    
-                    self.processed_txs.add(sig)
-                    
-                    # Keep processed set bounded
-                    if len(self.processed_txs) > 10000:
-                        self.processed_txs = set(list(self.processed_txs)[-5000:])
-                
-                if transactions:
-                    last_signature = transactions[0].get("signature")
-                
-            except Exception as e:
-                print(f"[BUY ALERT] Monitor error: {e}")
-            
-            # Poll interval
-            await asyncio.sleep(5)
-
-    async def _get_recent_transactions(self, before_signature: Optional[str] = None) -> list:
-        """Fetch recent transactions for the SUOLALA token"""
-        if not self._session:
+                        await self._send_alert(state, swap)
+                        self.wallet_last_buy[(mint, swap.wallet)] = time.time()
+
+                self.processed_txs.add((mint, sig))
+
+        # Keep processed set bounded
+        if len(self.processed_txs) > 10000:
+            self.processed_txs = set(list(self.processed_txs)[-5000:])
+
+    async def _rpc_batch(self, method: str, params_list: List[list]) -> Optional[List[Optional[dict]]]:
+        """
+        Results of one RPC method called with each params, in order.
+        Calls go out as JSON-RPC batches of RPC_BATCH_SIZE (in parallel);
+        None if any batch failed.
+        """
+        if not params_list:
             return []
-        
-        payload = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "getSignaturesForAddress",
-            "params": [
-                SUOLALA_MINT,
-                {
-                    "limit": 20,
-                    "commitment": "confirmed"
-                }
-            ]
-        }
-        
-        if before_signature:
-            payload["params"][1]["before"] = before_signature
-        
-        try:
-            async with self._session.post(
-                SOLANA_RPC_HTTP,
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    return data.get("result", [])
-        except Exception as e:
-            print(f"[BUY ALERT] Failed to fetch transactions: {e}")
-        
-        return []
 
-    async def _parse_transaction(self, signature: str) -> Optional[BuyTransaction]:
-        """Parse a transaction to check if it's a SUOLALA buy"""
-        if not self._session:
+        calls = []
+        for params in params_list:
+            self._rpc_id += 1
+            calls.append({"jsonrpc": "2.0", "id": self._rpc_id, "method": method, "params": params})
+        chunks = [calls[i:i + RPC_BATCH_SIZE] for i in range(0, len(calls), RPC_BATCH_SIZE)]
+        replies = await asyncio.gather(*(self._post_rpc(method, chunk) for chunk in chunks))
+        if any(reply is None for reply in replies):
+            return None
+
+        results = {}
+        for reply in replies:
+            for item in reply:
+                if isinstance(item, dict):
+                    results[item.get("id")] = item.get("result")
+        return [results.get(call["id"]) for call in calls]
+
+    async def _post_rpc(self, method: str, calls: List[dict]) -> Optional[List[dict]]:
+        """POST one batch (a single call is sent unbatched, so RPC_BATCH_SIZE=1 disables batching)"""
+        # Waits for the rate limit and any 429 backoff
+        if not await RPC_BUDGET.acquire(len(calls), method):
+            print(f"[BUY ALERT] Daily RPC budget spent, skipping {method}")
             return None
-        
-        payload = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "getTransaction",
-            "params": [
-                signature,
-                {
-                    "encoding": "jsonParsed",
-                    "maxSupportedTransactionVersion": 0,
-                    "commitment": "confirmed"
-                }
-            ]
-        }
-        
         try:
-            async with self._session.post(
-                SOLANA_RPC_HTTP,
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as resp:
-                if resp.status != 200:
-                    return None
-                
-                data = await resp.json()
-                result = data.get("result")
-                if not result:
+            with track_upstream("solana_rpc", method) as call:
+                # Not retried here: every attempt has to pass RPC_BUDGET, and a failed
+                # poll is simply repeated (last_signature is not advanced)
+                resp = await HTTP.post(SOLANA_RPC_HTTP, json=calls if len(calls) > 1 else calls[0],
+                                       retries=0, timeout=30)
+                if resp.status == 429:
+                    call.fail()
+                    self._rate_limited(method, parse_retry_after(resp.headers.get("Retry-After")))
                     return None
-                
-                # Check if transaction was successful
-                meta = result.get("meta", {})
-                if meta.get("err") is not None:
+                if resp.status != 200:
+                    call.fail()
                     return None
-                
-                # Check if it involves a DEX swap
-                if not self._is_dex_swap(result):
+                data = resp.json()
+                items = data if isinstance(data, list) else [data]
+                # Some providers answer 200 with a rate-limit error per call
+                if any(isinstance(item, dict) and (item.get("error") or {}).get("code") in RPC_RATE_LIMIT_CODES
+                       for item in items):
+                    call.fail()
+                    self._rate_limited(method, None)
                     return None
-                
-                # Parse the swap details
-                return await self._extract_buy_details(result, signature)
-                
+            RPC_BUDGET.succeeded()
+            return items
         except Exception as e:
-            print(f"[BUY ALERT] Failed to parse transaction {signature}: {e}")
-        
+            print(f"[BUY ALERT] RPC {method} failed: {e}")
         return None
 
-    def _is_dex_swap(self, tx_data: dict) -> bool:
-        """Check if transaction is a DEX swap (Raydium or Jupiter)"""
+    def _rate_limited(self, method: str, retry_after: Optional[float]):
+        delay = RPC_BUDGET.rate_limited(retry_after)
+        print(f"[BUY ALERT] RPC rate limited on {method}, holding RPC calls for {delay:.1f}s")
+
+    async def _get_recent_signatures(self, states: List[TokenState]) -> List[Optional[list]]:
+        """New signatures for every token's mint, newest first (None where the fetch failed)"""
+        lists: List[Optional[list]] = [[] for _ in states]
+        paging = list(range(len(states)))
+        before: Dict[int, str] = {}
+        for _ in range(MAX_SIGNATURE_PAGES):
+            params_list = []
+            for i in paging:
+                options = {"limit": SIGNATURE_PAGE, "commitment": "confirmed"}
+                # Only signatures newer than the last one we saw
+                if states[i].last_signature:
+                    options["until"] = states[i].last_signature
+                if i in before:
+                    options["before"] = before[i]
+                params_list.append([states[i].token.mint, options])
+
+            results = await self._rpc_batch("getSignaturesForAddress", params_list)
+            if results is None:
+                print("[BUY ALERT] Failed to fetch signatures")
+                for i in paging:
+                    lists[i] = None
+                return lists
+
+            full = []
+            for i, result in zip(paging, results):
+                if not isinstance(result, list):
+                    lists[i] = None
+                    continue
+                lists[i].extend(result)
+                # More arrived than one page holds; the first poll only takes the newest page
+                if len(result) >= SIGNATURE_PAGE and states[i].last_signature:
+                    before[i] = result[-1].get("signature")
+                    full.append(i)
+            paging = full
+            if not paging:
+                break
+        for i in paging:
+            print(f"[BUY ALERT] {states[i].token.symbol}: over {MAX_SIGNATURE_PAGES * SIGNATURE_PAGE} "
+                  f"new signatures, older ones skipped")
+        return lists
+
+    async def _get_transactions(self, signatures: List[str]) -> Optional[Dict[str, ParsedTransaction]]:
+        """Decoded transactions by signature (missing ones are left out); None if the fetch failed"""
+        options = {"encoding": "jsonParsed", "maxSupportedTransactionVersion": 0, "commitment": "confirmed"}
+        results = await self._rpc_batch("getTransaction", [[sig, options] for sig in signatures])
+        if results is None:
+            return None
+        # Only the compact views are kept; the jsonParsed dicts are freed here
+        decoded = {}
+        for sig, result in zip(signatures, results):
+            try:
+                tx = decode_transaction(result, sig)
+            except Exception as e:
+                print(f"[BUY ALERT] Failed to decode transaction {sig}: {e}")
+                continue
+            if tx:
+                decoded[sig] = tx
+        return decoded
+
+    async def _parse_transaction(self, state: TokenState, signature: str,
+                                 tx: Optional[ParsedTransaction]) -> Optional[SwapTransaction]:
+        """Parse a transaction into a buy or sell of the state's token"""
+        # Missing, or failed on chain
+        if not tx or tx.failed:
+            return None
+        
         try:
-            message = tx_data.get("transaction", {}).get("message", {})
-            account_keys = message.get("accountKeys", [])
-            
-            # Check for DEX program IDs
-            for account in account_keys:
-                pubkey = account.get("pubkey") if isinstance(account, dict) else account
-                if pubkey in [RAYDIUM_AMM_V4, JUPITER_AGGREGATOR_V6]:
-                    return True
-            
-            # Also check inner instructions for Jupiter aggregated swaps
-            meta = tx_data.get("meta", {})
-            inner_instructions = meta.get("innerInstructions", [])
-            for inner in inner_instructions:
-                for ix in inner.get("instructions", []):
-                    program_id = ix.get("programId")
-                    if program_id in [RAYDIUM_AMM_V4, JUPITER_AGGREGATOR_V6]:
-                        return True
-            
-        except Exception:
-            pass
+            # Every swap through the pool (buy or sell) moves the price
+            reserves = state.pricing.observe(tx)
+
+            # Check if it involves a DEX swap (Raydium, or Jupiter routing through one)
+            if not tx.invokes(DEX_PROGRAMS):
+                return None
+
+            # Parse the swap details
+            return await self._extract_swap_details(state, tx, signature, reserves)
+
+        except Exception as e:
+            print(f"[BUY ALERT] Failed to parse transaction {signature}: {e}")
         
-        return False
+        return None
 
-    async def _extract_buy_details(self, tx_data: dict, signature: str) -> Optional[BuyTransaction]:
-        """Extract buy details from a swap transaction"""
+    async def _extract_swap_details(self, state: TokenState, tx: ParsedTransaction, signature: str,
+                                    reserves: Optional[PoolReserves] = None) -> Optional[SwapTransaction]:
+        """Extract side, trader and amounts from a swap transaction"""
         try:
-            meta = tx_data.get("meta", {})
-            
-            # Get pre and post token balances
-            pre_balances = meta.get("preTokenBalances", [])
-            post_balances = meta.get("postTokenBalances", [])
-            
-            # Find SUOLALA token balance changes
-            suolala_received = 0.0
-            buyer_wallet = None
+            mint = state.token.mint
             
-            for post in post_balances:
-                if post.get("mint") == SUOLALA_MINT:
-                    post_amount = float(post.get("uiTokenAmount", {}).get("uiAmount") or 0)
-                    owner = post.get("owner")
-                    
-                    # Find corresponding pre-balance
-                    pre_amount = 0.0
-                    for pre in pre_balances:
-                        if pre.get("mint") == SUOLALA_MINT and pre.get("owner") == owner:
-                            pre_amount = float(pre.get("uiTokenAmount", {}).get("uiAmount") or 0)
-                            break
-                    
-                    change = post_amount - pre_amount
-                    if change > suolala_received:
-                        suolala_received = change
-                        buyer_wallet = owner
+            # Token balance change per owner. Accounts closed by a full sell only
+            # appear in the pre-balances; the pool's own vault is not a trader.
+            changes: Dict[str, float] = {}
+            for balances, sign in ((tx.pre_token_balances, -1), (tx.post_token_balances, 1)):
+                for balance in balances:
+                    owner = balance.owner
+                    if balance.mint != mint or not owner or owner == RAYDIUM_AUTHORITY:
+                        continue
+                    changes[owner] = changes.get(owner, 0.0) + sign * balance.amount
             
-            # If no SUOLALA received, not a buy
-            if suolala_received <= 0 or not buyer_wallet:
+            if not changes:
                 return None
+            wallet = max(changes, key=lambda owner: abs(changes[owner]))
+            token_change = changes[wallet]
             
-            # Calculate SOL spent from lamport balance changes
-            pre_sol = meta.get("preBalances", [])
-            post_sol = meta.get("postBalances", [])
-            
-            message = tx_data.get("transaction", {}).get("message", {})
-            account_keys = message.get("accountKeys", [])
-            
-            sol_spent = 0.0
-            for i, account in enumerate(account_keys):
-                pubkey = account.get("pubkey") if isinstance(account, dict) else account
-                if pubkey == buyer_wallet and i < len(pre_sol) and i < len(post_sol):
-                    # Convert lamports to SOL
-                    sol_change = (pre_sol[i] - post_sol[i]) / 1e9
-                    if sol_change > 0:
-                        sol_spent = sol_change
-                    break
-            
-            # If we couldn't determine SOL spent, try to estimate from token data
-            if sol_spent <= 0:
-                token_data = await self._get_token_data()
-                if token_data and token_data.price_usd > 0:
-                    # Estimate SOL from token amount and price
-                    usd_value = suolala_received * token_data.price_usd
-                    sol_spent = usd_value / token_data.sol_price_usd if token_data.sol_price_usd > 0 else 0
+            if reserves and reserves.token_delta:
+                # The pool's vaults give the exact side and SOL amount, even for routed swaps
+                side = "buy" if reserves.token_delta < 0 else "sell"
+                sol_amount = abs(reserves.sol_delta)
+                token_amount = abs(reserves.token_delta)
+            elif token_change:
+                side = "buy" if token_change > 0 else "sell"
+                token_amount = abs(token_change)
+                sol_amount = self._wallet_sol_change(tx, wallet, side)
+            else:
+                return None
             
-            # Get current token data for USD calculation
-            token_data = await self._get_token_data()
+            token_data = await self._get_token_data(state)
             if not token_data:
                 return None
             
-            usd_value = sol_spent * token_data.sol_price_usd
-            
-            # Sanity check - if USD value seems wrong, recalculate from token amount
-            if usd_value <= 0:
-                usd_value = suolala_received * token_data.price_usd
+            # If we couldn't determine the SOL amount, estimate it from the token price
+            if sol_amount <= 0 and token_data.sol_price_usd > 0:
+                sol_amount = token_amount * token_data.price_usd / token_data.sol_price_usd
             
+            usd_value = sol_amount * token_data.sol_price_usd
             if usd_value <= 0:
                 return None
             
-            block_time = tx_data.get("blockTime", int(time.time()))
+            block_time = tx.block_time or int(time.time())
+            # Price at this swap, not the latest one (a poll can cover many swaps)
+            if reserves and reserves.price_sol > 0:
+                price_usd = reserves.price_sol * token_data.sol_price_usd
+            else:
+                price_usd = token_data.price_usd
             
-            return BuyTransaction(
+            return SwapTransaction(
                 signature=signature,
-                buyer_wallet=buyer_wallet,
-                sol_amount=sol_spent,
-                token_amount=suolala_received,
+                mint=mint,
+                side=side,
+                wallet=wallet,
+                sol_amount=sol_amount,
+                token_amount=token_amount,
                 usd_value=usd_value,
-                timestamp=block_time
+                timestamp=block_time,
+                price_usd=price_usd
             )
             
         except Exception as e:
-            print(f"[BUY ALERT] Failed to extract buy details: {e}")
+            print(f"[BUY ALERT] Failed to extract swap details: {e}")
         
         return None
 
-    async def _get_token_data(self) -> Optional[TokenData]:
-        """Fetch live token data from DexScreener API"""
-        # Return cached data if fresh
-        if self._cached_token_data and (time.time() - self._token_data_timestamp) < self._token_data_cache_ttl:
-            return self._cached_token_data
-        
-        if not self._session:
+    def _wallet_sol_change(self, tx: ParsedTransaction, wallet: str, side: str) -> float:
+        """SOL spent (buy) or received (sell) by the wallet, from lamport balances"""
+        change = tx.lamport_change(wallet)
+        if change is None:
+            return 0.0
+        # Convert lamports to SOL
+        return max(0.0, (-change if side == "buy" else change) / 1e9)
+
+    async def _get_token_data(self, state: TokenState) -> Optional[TokenData]:
+        """Token data priced from the latest pool reserves"""
+        # DexScreener is only needed for SOL/USD and supply, which move slowly
+        if state.pricing.market_stale():
+            await self._refresh_market_data()
+
+        quote = state.pricing.quote()
+        if not quote:
             return None
-        
+        price_usd, market_cap, liquidity_usd, _ = quote
+        return TokenData(
+            price_usd=price_usd,
+            market_cap=market_cap,
+            liquidity_usd=liquidity_usd,
+            sol_price_usd=state.pricing.sol_price_usd
+        )
+
+    async def _refresh_market_data(self):
+        """Fetch SOL/USD and supply of every tracked token from DexScreener and record a price sample of each"""
+        # Set before the call, so a failing DexScreener is retried on the next sample, not every loop
+        self.market_sampled_at = time.time()
+        addresses = [state.token.pair for state in self.tokens.values()]
+        pairs: Dict[str, dict] = {}
         try:
-            async with self._session.get(
-                DEXSCREENER_API,
-                timeout=aiohttp.ClientTimeout(total=10)
-            ) as resp:
-                if resp.status != 200:
-                    return self._cached_token_data
-                
-                data = await resp.json()
-                pair = data.get("pair")
-                if not pair:
-                    return self._cached_token_data
-                
+            for i in range(0, len(addresses), DEXSCREENER_MAX_PAIRS):
+                with track_upstream("dexscreener", "pair") as call:
+                    resp = await HTTP.get(DEXSCREENER_PAIRS_API + ",".join(addresses[i:i + DEXSCREENER_MAX_PAIRS]))
+                    if resp.status != 200:
+                        call.fail()
+                        return
+                    data = resp.json()
+
+                for pair in data.get("pairs") or [data.get("pair")]:
+                    if pair:
+                        pairs[pair.get("pairAddress")] = pair
+            if not pairs:
+                return
+
+            # Get SOL price from the first pair's quote token (every tracked pair is quoted in SOL)
+            sol_price_usd = 0
+            for pair in pairs.values():
                 price_usd = float(pair.get("priceUsd", 0))
-                
-                # Get market cap (FDV)
-                fdv = pair.get("fdv")
-                market_cap = float(fdv) if fdv else 0
-                
-                # Get liquidity
-                liquidity = pair.get("liquidity", {})
-                liquidity_usd = float(liquidity.get("usd", 0)) if liquidity else 0
-                
-                # Get SOL price from the pair's quote token
                 price_native = float(pair.get("priceNative", 0))
                 sol_price_usd = price_usd / price_native if price_native > 0 else 0
-                
-                # If SOL price seems wrong, fetch it separately
-                if sol_price_usd <= 0 or sol_price_usd > 1000:
-                    sol_price_usd = await self._get_sol_price()
-                
-                self._cached_token_data = TokenData(
-                    price_usd=price_usd,
-                    market_cap=market_cap,
-                    liquidity_usd=liquidity_usd,
-                    sol_price_usd=sol_price_usd
-                )
-                self._token_data_timestamp = time.time()
-                
-                return self._cached_token_data
-                
+                if sol_price_usd > 0:
+                    break
+
+            # If SOL price seems wrong, fetch it separately
+            if sol_price_usd <= 0 or sol_price_usd > 1000:
+                sol_price_usd = await self._get_sol_price()
+
+            for state in self.tokens.values():
+                pair = pairs.get(state.token.pair)
+                if pair:
+                    state.pricing.set_market(pair, sol_price_usd)
+                    quote = state.pricing.quote()
+                    if quote:
+                        price_usd, market_cap, liquidity_usd, _ = quote
+                        PRICE_HISTORY.record(state.token.mint, price_usd, time.time(),
+                                             market_cap=market_cap, liquidity_usd=liquidity_usd)
+
         except Exception as e:
             print(f"[BUY ALERT] Failed to fetch token data: {e}")
-        
-        return self._cached_token_data
 
     async def _get_sol_price(self) -> float:
         """Fetch SOL price in USD"""
-        if not self._session:
-            return 0
-        
         try:
             # Use DexScreener SOL/USDC pair
-            async with self._session.get(
-                "https://api.dexscreener.com/latest/dex/pairs/solana/8sLbNZoA1cfnvMJLPfp98ZLAnFSYCFApfJKMbiXNLwxj",
-                timeout=aiohttp.ClientTimeout(total=10)
-            ) as resp:
+            with track_upstream("dexscreener", "sol_price") as call:
+                resp = await HTTP.get(f"{DEXSCREENER_BASE}/latest/dex/pairs/solana/{SOL_USDC_PAIR}")
                 if resp.status == 200:
-                    data = await resp.json()
-                    pair = data.get("pair")
+                    pair = resp.json().get("pair")
                     if pair:
                         return float(pair.get("priceUsd", 0))
+                call.fail()
         except Exception:
             pass
         
         return 0
 
-    def _is_wallet_on_cooldown(self, wallet: str) -> bool:
-        """Check if wallet is on cooldown to prevent spam"""
-        last_buy = self.wallet_last_buy.get(wallet, 0)
+    def _is_wallet_on_cooldown(self, mint: str, wallet: str) -> bool:
+        """Check if wallet is on cooldown (per token) to prevent spam"""
+        last_buy = self.wallet_last_buy.get((mint, wallet), 0)
         return (time.time() - last_buy) < WALLET_COOLDOWN_SECONDS
 
-    async def _send_alert(self, buy: BuyTransaction):
-        """Send buy alert to Telegram"""
-        token_data = await self._get_token_data()
+    async def _send_alert(self, state: TokenState, buy: SwapTransaction):
+        """Queue a buy alert for every chat subscribed to the token whose threshold it meets"""
+        chat_ids = SUBSCRIPTIONS.route(buy.mint, buy.usd_value)
+        if not chat_ids:
+            return
+
+        token_data = await self._get_token_data(state)
         if not token_data:
             print(f"[BUY ALERT] Skipping alert - no token data available")
             return
         
-        # Format the alert message (clean, no links, no web preview)
-        short_wallet = f"{buy.buyer_wallet[:4]}...{buy.buyer_wallet[-4:]}"
-        
-        message = (
-            f"🟢 SUOLALA BUY\n\n"
-            f"💰 Buy Size: ${buy.usd_value:,.2f} USD / {buy.sol_amount:.4f} SOL\n"
-            f"👤 Buyer: {short_wallet}\n"
-            f"📈 Price: ${token_data.price_usd:.10f}\n"
-            f"🏦 MCap: ${token_data.market_cap:,.0f}\n"
-            f"💧 Liquidity: ${token_data.liquidity_usd:,.0f}\n\n"
-            f"Don't miss the chance 🚀"
-        )
-        
-        # Send to all configured chat IDs
-        for chat_id in self.chat_ids:
-            try:
-                # Send photo with caption
-                with open("buy.png", "rb") as photo:
-                    sent_msg = await self.bot.send_photo(
-                        chat_id=chat_id,
-                        photo=photo,
-                        caption=message
-                    )
-                
-                print(f"[BUY ALERT] Sent alert for ${buy.usd_value:.2f} buy to chat {chat_id}")
-                
-                # Schedule auto-delete
-                if ALERT_DELETE_DELAY > 0:
-                    asyncio.create_task(self._delete_after_delay(sent_msg, ALERT_DELETE_DELAY))
-                
-            except Exception as e:
-                print(f"[BUY ALERT] Failed to send alert to {chat_id}: {e}")
-
-    async def _delete_after_delay(self, message, delay: int):
-        """Delete message after specified delay"""
-        await asyncio.sleep(delay)
+        alert = {
+            "signature": buy.signature,
+            "mint": buy.mint,
+            "symbol": state.token.symbol,
+            "wallet": buy.wallet,
+            "sol_amount": buy.sol_amount,
+            "token_amount": buy.token_amount,
+            "usd_value": buy.usd_value,
+            "timestamp": buy.timestamp,
+            "price_usd": token_data.price_usd,
+            "market_cap": token_data.market_cap,
+            "liquidity_usd": token_data.liquidity_usd,
+        }
         try:
-            await message.delete()
-            print(f"[BUY ALERT] Auto-deleted alert message")
+            await self.outbox.enqueue(alert, chat_ids)
         except Exception as e:
-            print(f"[BUY ALERT] Failed to delete message: {e}")
+            print(f"[BUY ALERT] Failed to queue alert: {e}")
 
 
 # Global monitor instance
@@ -479,7 +673,7 @@ async def start_buy_alert_monitor(bot, chat_ids: list):
         return
     
     _monitor = BuyAlertMonitor(bot, chat_ids)
-    asyncio.create_task(_monitor.start())
+    LIFECYCLE.spawn(_monitor.start(), "buy alert monitor")
 
 
 async def stop_buy_alert_monitor():
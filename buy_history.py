@@ -0,0 +1,256 @@
+# BUY HISTORY
+# Every swap the buy monitor parses, for every tracked token, is kept in an
+# indexed SQLite table so /whales, /lastbuys and /wallet can be answered
+# without touching the chain.
+# Writes are buffered and committed in batches; old rows are pruned.
+
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import List, Optional, Set
+
+from token_registry import PRIMARY_TOKEN
+
+# ===== CONFIGURATION =====
+HISTORY_DB = os.getenv("HISTORY_DB", os.getenv("STATS_DB", "weekly_stats.db"))
+
+# Pending swaps are written when this many are buffered, or every FLUSH seconds
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "100"))
+HISTORY_FLUSH_SECONDS = float(os.getenv("HISTORY_FLUSH_SECONDS", "5"))
+
+# Retention: rows older than this are deleted, and the table never exceeds MAX_ROWS
+HISTORY_RETENTION_DAYS = float(os.getenv("HISTORY_RETENTION_DAYS", "30"))
+HISTORY_MAX_ROWS = int(os.getenv("HISTORY_MAX_ROWS", "500000"))
+HISTORY_PRUNE_SECONDS = 3600
+
+# Swaps smaller than this (USD) are not worth keeping
+HISTORY_MIN_USD = float(os.getenv("HISTORY_MIN_USD", "1"))
+
+# /wallet lookups: base58 only (so no GLOB wildcards) and at least this many characters
+BASE58_ALPHABET = frozenset("123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz")
+WALLET_PREFIX_MIN = 4
+WALLET_ADDRESS_MAX = 44
+
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS swaps (
+    signature TEXT,
+    mint TEXT,
+    side TEXT,
+    wallet TEXT,
+    sol_amount REAL,
+    token_amount REAL,
+    usd_value REAL,
+    timestamp INTEGER,
+    PRIMARY KEY (signature, mint)
+)
+"""
+
+
+# Database files whose schema is set up (once per process, on first use)
+_schema_ready: Set[str] = set()
+_schema_lock = threading.Lock()
+
+
+def _setup_schema(conn: sqlite3.Connection):
+    conn.execute(_CREATE_TABLE)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(swaps)")]
+    if "mint" not in columns:
+        _migrate_to_per_token(conn)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_swaps_wallet ON swaps (wallet, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_swaps_time ON swaps (timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_swaps_mint_time ON swaps (mint, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_swaps_usd ON swaps (usd_value)")
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=10)
+    if db_path not in _schema_ready:
+        # Queries and flushes run in worker threads; only the first one sets up the table
+        with _schema_lock:
+            if db_path not in _schema_ready:
+                _setup_schema(conn)
+                _schema_ready.add(db_path)
+    return conn
+
+
+def _migrate_to_per_token(conn: sqlite3.Connection):
+    """Swaps recorded before multi-token support are the primary token's"""
+    with conn:
+        conn.execute("ALTER TABLE swaps RENAME TO swaps_old")
+        conn.execute(_CREATE_TABLE)
+        conn.execute("""
+        INSERT INTO swaps (signature, mint, side, wallet, sol_amount, token_amount, usd_value, timestamp)
+        SELECT signature, ?, side, wallet, sol_amount, token_amount, usd_value, timestamp FROM swaps_old
+        """, (PRIMARY_TOKEN.mint,))
+        # Drops the old indexes too; _setup_schema recreates them on the new table
+        conn.execute("DROP TABLE swaps_old")
+    print(f"[HISTORY] Migrated swap history to per-token ({PRIMARY_TOKEN.symbol})")
+
+
+class SwapHistory:
+    """Batched writer and query helpers for the swaps table"""
+
+    def __init__(self, db_path: str = HISTORY_DB, batch_size: int = HISTORY_BATCH_SIZE,
+                 flush_interval: float = HISTORY_FLUSH_SECONDS):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending: List[tuple] = []
+        self.written = 0
+        self.batches = 0
+        self.last_prune: float = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._batch_task: Optional[asyncio.Task] = None  # flush started by a full batch
+        self._lock = asyncio.Lock()
+
+    def add(self, swap):
+        """Buffer one SwapTransaction; flushes in the background when the batch is full"""
+        if swap.usd_value < HISTORY_MIN_USD:
+            return
+        self.pending.append((swap.signature, swap.mint, swap.side, swap.wallet, swap.sol_amount,
+                             swap.token_amount, swap.usd_value, int(swap.timestamp)))
+        if len(self.pending) >= self.batch_size and (self._batch_task is None or self._batch_task.done()):
+            # Referenced so it is not garbage-collected mid-flush; stop() waits for it
+            self._batch_task = asyncio.create_task(self.flush())
+            self._batch_task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[HISTORY] Batch flush failed: {task.exception()!r}")
+
+    def _write(self, rows: List[tuple], prune: bool) -> int:
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                # (signature, mint) is the key, so a swap seen again after a restart is skipped
+                conn.executemany("INSERT OR IGNORE INTO swaps VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            return self._prune(conn) if prune else 0
+        finally:
+            conn.close()
+
+    def _prune(self, conn: sqlite3.Connection) -> int:
+        cutoff = int(time.time() - HISTORY_RETENTION_DAYS * 86400)
+        with conn:
+            removed = conn.execute("DELETE FROM swaps WHERE timestamp < ?", (cutoff,)).rowcount
+            # Row cap: drop the oldest beyond HISTORY_MAX_ROWS
+            removed += conn.execute("""
+            DELETE FROM swaps WHERE timestamp <= (
+                SELECT timestamp FROM swaps ORDER BY timestamp DESC LIMIT 1 OFFSET ?
+            )
+            """, (HISTORY_MAX_ROWS,)).rowcount
+        # Pages freed here go on SQLite's freelist and are reused by the next inserts,
+        # so with retention and the row cap the file stays bounded without a VACUUM
+        return removed
+
+    async def flush(self):
+        """Write all buffered swaps in one transaction"""
+        async with self._lock:
+            if not self.pending:
+                return
+            rows, self.pending = self.pending, []
+            prune = time.time() - self.last_prune >= HISTORY_PRUNE_SECONDS
+            try:
+                removed = await asyncio.to_thread(self._write, rows, prune)
+            except Exception as e:
+                print(f"[HISTORY] Failed to write {len(rows)} swap(s): {e}")
+                self.pending = rows + self.pending
+                return
+            self.written += len(rows)
+            self.batches += 1
+            if prune:
+                self.last_prune = time.time()
+                if removed:
+                    print(f"[HISTORY] Pruned {removed} old swap(s)")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Start the periodic flush task"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush task and write whatever is still buffered"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self._batch_task is not None:
+            await asyncio.gather(self._batch_task, return_exceptions=True)
+            self._batch_task = None
+        await self.flush()
+
+    # ===== QUERIES (blocking, run them with asyncio.to_thread) =====
+    def top_buyers(self, since: float, limit: int = 10, mint: str = PRIMARY_TOKEN.mint) -> List[tuple]:
+        """(wallet, total_usd, total_sol, buys) of the biggest buyers of a token since a timestamp"""
+        conn = _connect(self.db_path)
+        try:
+            return conn.execute("""
+            SELECT wallet, SUM(usd_value) AS total_usd, SUM(sol_amount), COUNT(*)
+            FROM swaps
+            WHERE mint = ? AND timestamp >= ? AND side = 'buy'
+            GROUP BY wallet
+            ORDER BY total_usd DESC
+            LIMIT ?
+            """, (mint, int(since), limit)).fetchall()
+        finally:
+            conn.close()
+
+    def recent_buys(self, limit: int = 10, min_usd: float = 0, mint: str = PRIMARY_TOKEN.mint) -> List[tuple]:
+        """(wallet, usd_value, sol_amount, timestamp) of the latest buys of a token"""
+        conn = _connect(self.db_path)
+        try:
+            return conn.execute("""
+            SELECT wallet, usd_value, sol_amount, timestamp
+            FROM swaps
+            WHERE mint = ? AND side = 'buy' AND usd_value >= ?
+            ORDER BY timestamp DESC
+            LIMIT ?
+            """, (mint, min_usd, limit)).fetchall()
+        finally:
+            conn.close()
+
+    def wallet_summary(self, wallet: str, limit: int = 5, mint: str = PRIMARY_TOKEN.mint) -> dict:
+        """Totals and latest swaps of one token for one wallet"""
+        conn = _connect(self.db_path)
+        try:
+            totals = {side: (count, usd or 0.0) for side, count, usd in conn.execute("""
+            SELECT side, COUNT(*), SUM(usd_value) FROM swaps WHERE wallet = ? AND mint = ? GROUP BY side
+            """, (wallet, mint))}
+            recent = conn.execute("""
+            SELECT side, usd_value, sol_amount, timestamp
+            FROM swaps WHERE wallet = ? AND mint = ?
+            ORDER BY timestamp DESC
+            LIMIT ?
+            """, (wallet, mint, limit)).fetchall()
+            return {"buys": totals.get("buy", (0, 0.0)), "sells": totals.get("sell", (0, 0.0)), "recent": recent}
+        finally:
+            conn.close()
+
+    def find_wallet(self, prefix: str) -> Optional[str]:
+        """Full address for a wallet prefix (alerts only show the first characters); None if not valid"""
+        if not is_wallet_prefix(prefix):
+            return None
+        conn = _connect(self.db_path)
+        try:
+            row = conn.execute(
+                # GLOB is case-sensitive (base58) and can use the wallet index for a prefix
+                "SELECT wallet FROM swaps WHERE wallet GLOB ? LIMIT 1", (prefix + "*",)
+            ).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+
+def is_wallet_prefix(text: str) -> bool:
+    """Whether text can be (the start of) a Solana address"""
+    return WALLET_PREFIX_MIN <= len(text) <= WALLET_ADDRESS_MAX and set(text) <= BASE58_ALPHABET
+
+
+# Shared by the monitor (writer) and the history commands (readers)
+SWAP_HISTORY = SwapHistory()
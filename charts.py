@@ -0,0 +1,144 @@
+# PRICE CHARTS
+# /chart images drawn locally from the candles in price_history.py and cached
+# per candle bucket: every /chart for the same token and range within one
+# bucket reuses the image, and once it has been sent only Telegram's file_id
+# goes out again (no query, no render, no upload). Pillow is optional:
+# without it /chart falls back to the DexScreener link.
+
+import io
+import time
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from metrics import CHART_REQUESTS
+from price_history import PRICE_HISTORY, Candle, tier_for
+
+# ===== CONFIGURATION =====
+CHART_RANGES = {"1h": 3600, "24h": 86400, "7d": 7 * 86400}
+CHART_DEFAULT_RANGE = "24h"
+CHART_SIZE = (800, 400)
+
+BACKGROUND = (15, 17, 21)
+GRID = (40, 44, 52)
+TEXT = (200, 204, 212)
+UP = (38, 194, 129)
+DOWN = (234, 57, 67)
+MARGIN_LEFT, MARGIN_RIGHT, MARGIN_TOP, MARGIN_BOTTOM = 12, 110, 40, 28
+
+
+@dataclass(slots=True)
+class CachedChart:
+    """Rendered chart of one bucket, and its file_id once Telegram has it"""
+    bucket: int
+    png: bytes
+    first: float  # opening price of the range
+    last: float
+    file_id: Optional[str] = None
+
+    @property
+    def change(self) -> float:
+        return (self.last / self.first - 1) * 100 if self.first > 0 else 0.0
+
+
+def _price(value: float, digits: int = 4) -> str:
+    """Price with a few significant digits (meme coin prices have many leading zeros)"""
+    return f"${value:.{digits}g}" if value < 1 else f"${value:,.{digits}f}"
+
+
+def render_chart(candles: List[Candle], title: str, seconds: int) -> Optional[bytes]:
+    """PNG of the close price with the high/low range shaded; None without Pillow"""
+    try:
+        from PIL import Image, ImageDraw  # optional, and only needed here
+    except ImportError:
+        return None
+
+    width, height = CHART_SIZE
+    img = Image.new("RGB", CHART_SIZE, BACKGROUND)
+    draw = ImageDraw.Draw(img)
+
+    low = min(c.low for c in candles)
+    high = max(c.high for c in candles)
+    span = (high - low) or high or 1.0
+    low, high = low - span * 0.05, high + span * 0.05
+    start = candles[-1].bucket - seconds + tier_for(seconds)
+    end = candles[-1].bucket
+    plot_w = width - MARGIN_LEFT - MARGIN_RIGHT
+    plot_h = height - MARGIN_TOP - MARGIN_BOTTOM
+
+    def x(bucket: float) -> float:
+        return MARGIN_LEFT + plot_w * (bucket - start) / max(1, end - start)
+
+    def y(price: float) -> float:
+        return MARGIN_TOP + plot_h * (high - price) / (high - low)
+
+    # Horizontal grid with price labels on the right
+    for i in range(5):
+        level = low + (high - low) * i / 4
+        draw.line([(MARGIN_LEFT, y(level)), (width - MARGIN_RIGHT, y(level))], fill=GRID)
+        draw.text((width - MARGIN_RIGHT + 6, y(level) - 6), _price(level), fill=TEXT)
+
+    color = UP if candles[-1].close >= candles[0].open else DOWN
+    shade = tuple(c // 3 for c in color)
+    band = [(x(c.bucket), y(c.high)) for c in candles] + [(x(c.bucket), y(c.low)) for c in reversed(candles)]
+    if len(band) >= 4:
+        draw.polygon(band, fill=shade)
+    draw.line([(x(c.bucket), y(c.close)) for c in candles], fill=color, width=2)
+
+    time_format = "%H:%M" if seconds <= 86400 else "%d %b"
+    for bucket in (start, (start + end) / 2, end):
+        label = datetime.fromtimestamp(bucket, timezone.utc).strftime(time_format)
+        left = min(max(x(bucket) - 14, MARGIN_LEFT), width - MARGIN_RIGHT - 40)
+        draw.text((left, height - MARGIN_BOTTOM + 8), label, fill=TEXT)
+    draw.text((MARGIN_LEFT, 12), f"{title}   {_price(candles[-1].close, 6)}   (UTC)", fill=TEXT)
+
+    out = io.BytesIO()
+    img.save(out, "PNG", optimize=True)
+    return out.getvalue()
+
+
+class ChartCache:
+    """(mint, range) -> chart of the current bucket; older buckets are replaced"""
+
+    def __init__(self):
+        self._charts: Dict[Tuple[str, str], CachedChart] = {}
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def bucket(window: str, now: Optional[float] = None) -> int:
+        tier = tier_for(CHART_RANGES[window])
+        return int((time.time() if now is None else now) // tier)
+
+    async def get(self, mint: str, symbol: str, window: str) -> Optional[CachedChart]:
+        """Chart for the current bucket, rendered if needed; None without data or Pillow"""
+        key = (mint, window)
+        bucket = self.bucket(window)
+        cached = self._charts.get(key)
+        if cached and cached.bucket == bucket:
+            CHART_REQUESTS.inc("cached")
+            return cached
+
+        # One render per bucket even when several /chart arrive together
+        async with self._lock:
+            cached = self._charts.get(key)
+            if cached and cached.bucket == bucket:
+                CHART_REQUESTS.inc("cached")
+                return cached
+            seconds = CHART_RANGES[window]
+            candles = await asyncio.to_thread(PRICE_HISTORY.candles, time.time() - seconds,
+                                              tier_for(seconds), mint)
+            if len(candles) < 2:
+                CHART_REQUESTS.inc("no_data")
+                return None
+            png = await asyncio.to_thread(render_chart, candles, f"{symbol} / USD  {window}", seconds)
+            if png is None:
+                CHART_REQUESTS.inc("no_pillow")
+                return None
+            CHART_REQUESTS.inc("rendered")
+            cached = self._charts[key] = CachedChart(bucket, png, candles[0].open, candles[-1].close)
+            return cached
+
+
+# One cache per process
+CHARTS = ChartCache()
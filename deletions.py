@@ -0,0 +1,135 @@
+# SCHEDULED DELETIONS
+# Auto-replies, translations, welcome messages and buy alerts delete
+# themselves after a delay. The pending deletions are kept here rather than
+# in loose sleeping tasks, so a shutdown can write them to SQLite and the
+# next start (on any replica) deletes them on time instead of leaving the
+# messages in the chat forever.
+
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import Dict, Set, Tuple
+
+# ===== CONFIGURATION =====
+DELETIONS_DB = os.getenv("DELETIONS_DB", os.getenv("STATS_DB", "weekly_stats.db"))
+
+# Telegram only lets bots delete messages younger than 48 hours
+DELETIONS_MAX_AGE = 48 * 3600
+
+MessageKey = Tuple[int, int]  # (chat_id, message_id)
+
+
+# Database files already set up by this process
+_schema_ready: Set[str] = set()
+_schema_lock = threading.Lock()
+
+
+def _setup_schema(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS pending_deletions (
+        chat_id INTEGER,
+        message_id INTEGER,
+        delete_at REAL,
+        PRIMARY KEY (chat_id, message_id)
+    ) WITHOUT ROWID
+    """)
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=10, isolation_level=None)
+    if db_path not in _schema_ready:
+        with _schema_lock:
+            if db_path not in _schema_ready:
+                _setup_schema(conn)
+                _schema_ready.add(db_path)
+    return conn
+
+
+class DeletionScheduler:
+    """Deletes messages after a delay; pending ones survive restarts via checkpoint/restore"""
+
+    def __init__(self, db_path: str = DELETIONS_DB):
+        self.db_path = db_path
+        self.bot = None
+        self.pending: Dict[MessageKey, float] = {}  # -> wall time of the deletion
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def schedule(self, message, delay: float):
+        """Delete a sent message after `delay` seconds"""
+        self.bot = self.bot or message.get_bot()
+        self._schedule((message.chat_id, message.message_id), time.time() + delay)
+
+    def _schedule(self, key: MessageKey, delete_at: float):
+        self.pending[key] = delete_at
+        task = asyncio.create_task(self._delete_at(key, delete_at))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _delete_at(self, key: MessageKey, delete_at: float):
+        await asyncio.sleep(max(0.0, delete_at - time.time()))
+        if self.pending.get(key) != delete_at:
+            return  # rescheduled or checkpointed meanwhile
+        del self.pending[key]
+        try:
+            await self.bot.delete_message(chat_id=key[0], message_id=key[1])
+        except Exception as e:
+            # Already deleted, or the bot lacks permission
+            print(f"[DELETE] Failed to delete message {key[1]} in chat {key[0]}: {e}")
+
+    def _save(self, rows):
+        conn = _connect(self.db_path)
+        try:
+            # One transaction for the whole checkpoint (autocommit would sync every row)
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT OR REPLACE INTO pending_deletions (chat_id, message_id, delete_at) "
+                             "VALUES (?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _take(self) -> list:
+        conn = _connect(self.db_path)
+        try:
+            # Claim the rows in one write transaction, so two replicas starting together do not both take them
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT chat_id, message_id, delete_at FROM pending_deletions").fetchall()
+            conn.execute("DELETE FROM pending_deletions")
+            conn.execute("COMMIT")
+            return rows
+        finally:
+            conn.close()
+
+    async def checkpoint(self) -> int:
+        """Stop the timers and store every pending deletion (shutdown); returns how many"""
+        for task in list(self._tasks):
+            task.cancel()
+        rows = [(chat_id, message_id, delete_at) for (chat_id, message_id), delete_at in self.pending.items()]
+        self.pending.clear()
+        if rows:
+            await asyncio.to_thread(self._save, rows)
+        return len(rows)
+
+    async def restore(self, bot) -> int:
+        """Reschedule deletions stored by the previous run; overdue ones are deleted now"""
+        self.bot = bot
+        rows = await asyncio.to_thread(self._take)
+        now = time.time()
+        restored = 0
+        for chat_id, message_id, delete_at in rows:
+            if now - delete_at < DELETIONS_MAX_AGE:
+                self._schedule((chat_id, message_id), delete_at)
+                restored += 1
+        return restored
+
+
+# One scheduler per process
+DELETIONS = DeletionScheduler()
@@ -0,0 +1,174 @@
+# DATA EXPORT
+# Streams the activity tables of weekly_stats.db (and the buy history, if the
+# monitor has written one) to CSV or JSONL for community managers, without
+# ad-hoc SQL against the live database. The database is opened read-only
+# and every dataset is read inside one transaction: with the bot running in
+# WAL mode that is a consistent snapshot that never blocks its writes.
+# Rows are fetched and written in chunks, so memory stays flat for any size.
+#
+#   python export.py stats > stats.csv
+#   python export.py stats users swaps --format jsonl --out exports/
+#   python export.py weekly --since-week 2024-W01
+
+import os
+import sys
+import csv
+import json
+import time
+import sqlite3
+import argparse
+from dataclasses import dataclass
+from typing import List, Optional, TextIO, Tuple
+
+# ===== CONFIGURATION =====
+EXPORT_DB = os.getenv("STATS_DB", "weekly_stats.db")
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """One exportable query; `since` filters on a column when --since-week/--since-days is given"""
+    table: str  # must exist for the dataset to be exported
+    sql: str
+    week_column: Optional[str] = None
+    time_column: Optional[str] = None
+    group_by: Optional[str] = None
+
+
+DATASETS = {
+    "stats": Dataset("stats", """
+        SELECT s.year_week, s.chat_id, s.user_id, u.username, u.first_name, s.count
+        FROM stats s LEFT JOIN users u ON u.user_id = s.user_id
+    """, week_column="s.year_week"),
+    "users": Dataset("users", "SELECT user_id, username, first_name FROM users"),
+    # Messages and active members per chat and week
+    "weekly": Dataset("stats", """
+        SELECT year_week, chat_id, SUM(count) AS messages, COUNT(*) AS active_users
+        FROM stats
+    """, week_column="year_week", group_by="year_week, chat_id"),
+    "swaps": Dataset("swaps", """
+        SELECT timestamp, mint, side, wallet, sol_amount, token_amount, usd_value, signature
+        FROM swaps
+    """, time_column="timestamp"),
+}
+
+
+def open_snapshot(db_path: str) -> Tuple[sqlite3.Connection, str]:
+    """Read-only connection inside a read transaction; returns it and the journal mode"""
+    if not os.path.exists(db_path):
+        raise FileNotFoundError("no such file")
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=10, isolation_level=None)
+    mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    # Every dataset below reads the same snapshot until the export is done
+    conn.execute("BEGIN")
+    return conn, mode
+
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    return row is not None
+
+
+def build_query(dataset: Dataset, since_week: Optional[str], since_time: Optional[float]) -> Tuple[str, list]:
+    sql, params, where = dataset.sql.strip(), [], []
+    if since_week and dataset.week_column:
+        where.append(f"{dataset.week_column} >= ?")
+        params.append(since_week)
+    if since_time is not None and dataset.time_column:
+        where.append(f"{dataset.time_column} >= ?")
+        params.append(int(since_time))
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if dataset.group_by:
+        sql += " GROUP BY " + dataset.group_by
+    return sql, params
+
+
+def write_rows(cursor: sqlite3.Cursor, out: TextIO, fmt: str, chunk_rows: int = EXPORT_CHUNK_ROWS) -> int:
+    """Stream a query's rows to `out`, one chunk at a time; returns the row count"""
+    columns = [d[0] for d in cursor.description]
+    rows = 0
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        while True:
+            chunk = cursor.fetchmany(chunk_rows)
+            if not chunk:
+                break
+            writer.writerows(chunk)
+            rows += len(chunk)
+    else:
+        while True:
+            chunk = cursor.fetchmany(chunk_rows)
+            if not chunk:
+                break
+            out.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in chunk)
+            rows += len(chunk)
+    return rows
+
+
+def export(names: List[str], db_path: str = EXPORT_DB, fmt: str = "csv", out_dir: Optional[str] = None,
+           since_week: Optional[str] = None, since_time: Optional[float] = None,
+           chunk_rows: int = EXPORT_CHUNK_ROWS) -> List[Tuple[str, int, int, float]]:
+    """Export datasets to stdout (one dataset) or files in out_dir; returns (name, rows, bytes, seconds) each"""
+    conn, mode = open_snapshot(db_path)
+    if mode.lower() != "wal":
+        print(f"[EXPORT] {db_path} is in {mode} mode, not WAL: the bot's writes wait while this export reads",
+              file=sys.stderr)
+    results = []
+    try:
+        for name in names:
+            dataset = DATASETS[name]
+            if not table_exists(conn, dataset.table):
+                print(f"[EXPORT] {name}: no {dataset.table} table in {db_path}, skipped", file=sys.stderr)
+                continue
+            sql, params = build_query(dataset, since_week, since_time)
+            started = time.perf_counter()
+            if out_dir:
+                os.makedirs(out_dir, exist_ok=True)
+                path = os.path.join(out_dir, f"{name}.{fmt}")
+                with open(path, "w", newline="", encoding="utf-8") as out:
+                    rows = write_rows(conn.execute(sql, params), out, fmt, chunk_rows)
+                size = os.path.getsize(path)
+            else:
+                rows = write_rows(conn.execute(sql, params), sys.stdout, fmt, chunk_rows)
+                sys.stdout.flush()
+                size = 0
+            seconds = time.perf_counter() - started
+            results.append((name, rows, size, seconds))
+            rate = rows / seconds if seconds > 0 else float(rows)
+            written = f", {size / 1e6:.1f}MB" if size else ""
+            print(f"[EXPORT] {name}: {rows:,} rows{written} in {seconds:.2f}s ({rate:,.0f} rows/s)",
+                  file=sys.stderr)
+    finally:
+        conn.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export bot activity data to CSV or JSONL")
+    parser.add_argument("datasets", nargs="+", choices=sorted(DATASETS))
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv")
+    parser.add_argument("--db", default=EXPORT_DB, help="database file (default: $STATS_DB or weekly_stats.db)")
+    parser.add_argument("--out", help="directory for <dataset>.<format> files (default: stdout, one dataset)")
+    parser.add_argument("--since-week", help="stats/weekly from this ISO week on, e.g. 2024-W01")
+    parser.add_argument("--since-days", type=float, help="swaps from the last N days")
+    parser.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+    if not args.out and len(args.datasets) > 1:
+        parser.error("exporting several datasets needs --out DIR")
+
+    since_time = time.time() - args.since_days * 86400 if args.since_days is not None else None
+    try:
+        export(args.datasets, args.db, args.format, args.out, args.since_week, since_time, args.chunk_rows)
+    except (FileNotFoundError, sqlite3.Error) as e:
+        print(f"[EXPORT] Cannot read {args.db}: {e}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # e.g. piped into head
+        sys.stderr.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+# SWAP FLOW STATS
+# Rolling 5m/1h/24h buy/sell counts, volume and net flow, fed by the buy
+# monitor from the swaps it already parses, one set per tracked token.
+# Kept in fixed-size ring buffers so memory does not grow with trading activity.
+# The leader writes the buckets it changed to SQLite every FLOW_FLUSH_SECONDS,
+# so /flow answers on every replica and a new leader carries on the windows.
+
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from array import array
+from typing import Dict, List, Optional, Set
+
+from token_registry import PRIMARY_TOKEN
+
+# ===== CONFIGURATION =====
+FLOW_DB = os.getenv("FLOW_DB", os.getenv("STATS_DB", "weekly_stats.db"))
+
+# Changed buckets are written this often (and on stop)
+FLOW_FLUSH_SECONDS = float(os.getenv("FLOW_FLUSH_SECONDS", "10"))
+FLOW_PRUNE_SECONDS = 3600
+
+# Values kept per bucket
+BUYS, SELLS, BUY_SOL, SELL_SOL, BUY_USD, SELL_USD = range(6)
+_FIELDS = 6
+
+# name -> (span seconds, bucket count); a window is accurate to one bucket
+FLOW_WINDOWS = {
+    "5m": (300, 30),
+    "1h": (3600, 60),
+    "24h": (86400, 96),
+}
+
+
+class RollingWindow:
+    """Ring of time buckets covering the last `span` seconds"""
+
+    __slots__ = ("span", "size", "width", "epochs", "values", "dirty")
+
+    def __init__(self, span: int, buckets: int):
+        self.span = span
+        self.size = buckets
+        self.width = span / buckets
+        self.epochs = array("q", [-1]) * buckets
+        self.values = array("d", [0.0]) * (buckets * _FIELDS)
+        self.dirty: Set[int] = set()  # slots changed since the last flush
+
+    def add(self, timestamp: float, side: str, sol: float, usd: float):
+        epoch = int(timestamp // self.width)
+        slot = epoch % self.size
+        if self.epochs[slot] != epoch:
+            if self.epochs[slot] > epoch:
+                return  # older than the window, its bucket was already reused
+            self.epochs[slot] = epoch
+            base = slot * _FIELDS
+            for i in range(_FIELDS):
+                self.values[base + i] = 0.0
+        base = slot * _FIELDS
+        self.dirty.add(slot)
+        if side == "buy":
+            self.values[base + BUYS] += 1
+            self.values[base + BUY_SOL] += sol
+            self.values[base + BUY_USD] += usd
+        else:
+            self.values[base + SELLS] += 1
+            self.values[base + SELL_SOL] += sol
+            self.values[base + SELL_USD] += usd
+
+    def totals(self, now: float) -> list:
+        current = int(now // self.width)
+        out = [0.0] * _FIELDS
+        for slot in range(self.size):
+            if current - self.size < self.epochs[slot] <= current:
+                base = slot * _FIELDS
+                for i in range(_FIELDS):
+                    out[i] += self.values[base + i]
+        return out
+
+    def take_dirty(self) -> List[list]:
+        """[epoch, *values] of the buckets changed since the last call"""
+        rows = []
+        for slot in self.dirty:
+            base = slot * _FIELDS
+            rows.append([self.epochs[slot], *self.values[base:base + _FIELDS]])
+        self.dirty = set()
+        return rows
+
+    def restore(self, snapshot: dict):
+        """Load stored buckets ({"width", "buckets": [[epoch, *values]]})"""
+        if snapshot.get("width") != self.width:
+            return  # FLOW_WINDOWS changed since they were stored
+        for epoch, *values in snapshot["buckets"]:
+            slot = epoch % self.size
+            if epoch > self.epochs[slot]:
+                self.epochs[slot] = epoch
+                self.values[slot * _FIELDS:(slot + 1) * _FIELDS] = array("d", values)
+
+
+class FlowStats:
+    """Buy/sell flow over every window in FLOW_WINDOWS"""
+
+    def __init__(self, windows: Dict[str, tuple] = FLOW_WINDOWS):
+        self.windows = {name: RollingWindow(span, buckets) for name, (span, buckets) in windows.items()}
+        self.swaps_seen = 0
+        self.last_swap_at: Optional[float] = None
+
+    def record(self, side: str, sol_amount: float, usd_value: float, timestamp: Optional[float] = None):
+        """Add one swap ("buy" or "sell")"""
+        timestamp = timestamp or time.time()
+        for window in self.windows.values():
+            window.add(timestamp, side, sol_amount, usd_value)
+        self.swaps_seen += 1
+        self.last_swap_at = max(self.last_swap_at or 0, timestamp)
+
+    def summary(self, now: Optional[float] = None) -> Dict[str, dict]:
+        """Per-window counts, volume and net flow (buys minus sells)"""
+        now = now or time.time()
+        result = {}
+        for name, window in self.windows.items():
+            t = window.totals(now)
+            result[name] = {
+                "buys": int(t[BUYS]),
+                "sells": int(t[SELLS]),
+                "buy_sol": t[BUY_SOL],
+                "sell_sol": t[SELL_SOL],
+                "buy_usd": t[BUY_USD],
+                "sell_usd": t[SELL_USD],
+                "volume_usd": t[BUY_USD] + t[SELL_USD],
+                "net_sol": t[BUY_SOL] - t[SELL_SOL],
+                "net_usd": t[BUY_USD] - t[SELL_USD],
+            }
+        return result
+
+    def restore(self, snapshot: dict):
+        """Load windows stored by the leader (see FlowHistory.load)"""
+        for name, window_snapshot in snapshot.get("windows", {}).items():
+            if name in self.windows:
+                self.windows[name].restore(window_snapshot)
+
+
+# Database files already set up by this process
+_schema_ready: Set[str] = set()
+_schema_lock = threading.Lock()
+
+
+def _setup_schema(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS flow_buckets (
+        mint TEXT,
+        window TEXT,
+        epoch INTEGER,
+        width REAL,
+        buys REAL,
+        sells REAL,
+        buy_sol REAL,
+        sell_sol REAL,
+        buy_usd REAL,
+        sell_usd REAL,
+        PRIMARY KEY (mint, window, epoch)
+    ) WITHOUT ROWID
+    """)
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=10)
+    if db_path not in _schema_ready:
+        with _schema_lock:
+            if db_path not in _schema_ready:
+                _setup_schema(conn)
+                _schema_ready.add(db_path)
+    return conn
+
+
+class FlowHistory:
+    """Writes the leader's flow buckets to SQLite and loads them on any replica"""
+
+    def __init__(self, db_path: str = FLOW_DB, flush_interval: float = FLOW_FLUSH_SECONDS):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.last_prune: float = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def _write(self, rows: List[tuple], prune: bool):
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                # Buckets hold their full totals in memory, so the stored row is simply replaced
+                conn.executemany("INSERT OR REPLACE INTO flow_buckets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                if prune:
+                    now = time.time()
+                    for name, (span, buckets) in FLOW_WINDOWS.items():
+                        conn.execute("DELETE FROM flow_buckets WHERE window = ? AND epoch < ?",
+                                     (name, int((now - span) // (span / buckets))))
+        finally:
+            conn.close()
+
+    async def flush(self):
+        """Write every bucket changed since the last flush in one transaction"""
+        async with self._lock:
+            rows = [(mint, name, epoch, window.width, *values)
+                    for mint, stats in FLOW_STATS.items()
+                    for name, window in stats.windows.items()
+                    for epoch, *values in window.take_dirty()]
+            prune = time.time() - self.last_prune >= FLOW_PRUNE_SECONDS
+            if not rows and not prune:
+                return
+            try:
+                await asyncio.to_thread(self._write, rows, prune)
+            except Exception as e:
+                print(f"[FLOW] Failed to write {len(rows)} bucket(s): {e}")
+                # Mark them again; the next flush writes their totals as they are then
+                for mint, name, epoch, *_ in rows:
+                    window = FLOW_STATS[mint].windows[name]
+                    window.dirty.add(epoch % window.size)
+                return
+            if prune:
+                self.last_prune = time.time()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Start the periodic flush task"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush task and write whatever changed since"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    # ===== QUERIES (blocking, run them with asyncio.to_thread) =====
+    def load(self, mint: str = PRIMARY_TOKEN.mint) -> FlowStats:
+        """Flow stats of a token as last written by the leader"""
+        conn = _connect(self.db_path)
+        try:
+            rows = conn.execute("""
+            SELECT window, epoch, width, buys, sells, buy_sol, sell_sol, buy_usd, sell_usd
+            FROM flow_buckets WHERE mint = ?
+            """, (mint,)).fetchall()
+        finally:
+            conn.close()
+        windows: Dict[str, dict] = {}
+        for name, epoch, width, *values in rows:
+            windows.setdefault(name, {"width": width, "buckets": []})["buckets"].append([epoch, *values])
+        stats = FlowStats()
+        stats.restore({"windows": windows})
+        # Counters only cover what is still inside the longest window
+        longest = max(stats.windows.values(), key=lambda window: window.span)
+        totals = longest.totals(time.time())
+        stats.swaps_seen = int(totals[BUYS] + totals[SELLS])
+        return stats
+
+
+# Written by the monitor on the leader and flushed to flow_buckets; /flow reads FLOW_HISTORY
+FLOW_STATS: Dict[str, FlowStats] = {}
+
+
+def flow_stats(mint: str = PRIMARY_TOKEN.mint) -> FlowStats:
+    """Flow stats of one token (created on first use)"""
+    stats = FLOW_STATS.get(mint)
+    if stats is None:
+        stats = FLOW_STATS[mint] = FlowStats()
+    return stats
+
+
+# One writer per process (only the leader's monitor starts it)
+FLOW_HISTORY = FlowHistory()
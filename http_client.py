@@ -0,0 +1,189 @@
+# SHARED HTTP CLIENT
+# One pooled aiohttp session for every outbound API call (Solana RPC,
+# DexScreener, Magic Eden): keep-alive connections and cached DNS, so
+# commands stop paying a TCP+TLS handshake per call. Each host gets a
+# concurrency limit, and idempotent requests are retried with jittered
+# exponential backoff on connection errors and 429/5xx replies.
+
+import os
+import json
+import random
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from metrics import HTTP_CLIENT_RETRIES
+from rpc_budget import parse_retry_after
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ===== CONFIGURATION =====
+# Open connections in total and per host (kept alive for reuse)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+HTTP_PER_HOST = int(os.getenv("HTTP_PER_HOST", "10"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+HTTP_DNS_TTL = int(os.getenv("HTTP_DNS_TTL", "300"))
+
+# Default timeout of one attempt, in seconds
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+
+# Retries after the first attempt; waits are random between 0 and base * 2^attempt (capped)
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_RETRY_BASE = 0.25
+HTTP_RETRY_MAX = 5.0
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+# Requests in flight per host, e.g. "api.dexscreener.com:4,api-mainnet.magiceden.dev:4"
+# (hosts not listed get HTTP_PER_HOST)
+HTTP_HOST_LIMITS = os.getenv("HTTP_HOST_LIMITS", "api.dexscreener.com:4,api-mainnet.magiceden.dev:4")
+
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+
+class HttpError(aiohttp.ClientError):
+    """Non-2xx reply to get_json"""
+
+    def __init__(self, status: int, url: str):
+        super().__init__(f"HTTP {status} from {url}")
+        self.status = status
+
+
+# What a failed call can raise: connection errors, HttpError and timeouts
+REQUEST_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+def loads(data: bytes):
+    """Decode a JSON body (orjson when it is installed)"""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def parse_host_limits(spec: str) -> Dict[str, int]:
+    """Parse HTTP_HOST_LIMITS into {host: limit}"""
+    limits = {}
+    for item in spec.split(","):
+        host, _, limit = item.strip().rpartition(":")
+        if host and limit.isdigit() and int(limit) > 0:
+            limits[host.lower()] = int(limit)
+    return limits
+
+
+@dataclass(slots=True)
+class HttpResponse:
+    """A fully read response (the connection is already back in the pool)"""
+    status: int
+    headers: Mapping[str, str]  # case-insensitive
+    body: bytes
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    def json(self):
+        return loads(self.body)
+
+
+class HttpClient:
+    """Pooled session, per-host concurrency limits and retries shared by all outbound calls"""
+
+    def __init__(self, host_limits: Optional[Dict[str, int]] = None):
+        self.host_limits = parse_host_limits(HTTP_HOST_LIMITS) if host_limits is None else host_limits
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        # A session belongs to one event loop (tests and benchmarks run several)
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_POOL_SIZE,
+                limit_per_host=HTTP_PER_HOST,
+                keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+                use_dns_cache=True,
+                ttl_dns_cache=HTTP_DNS_TTL,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+                headers={"User-Agent": "suolala-bot"},
+            )
+            self._loop = loop
+            self._host_slots = {}
+        return self._session
+
+    def _slot(self, host: str) -> asyncio.Semaphore:
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.host_limits.get(host, HTTP_PER_HOST))
+        return slot
+
+    async def request(self, method: str, url: str, *, retries: Optional[int] = None,
+                      retry_statuses: frozenset = RETRY_STATUSES, timeout: Optional[float] = None,
+                      **kwargs) -> HttpResponse:
+        """
+        Send a request and read the body. GET/HEAD are retried `retries` times
+        (default HTTP_RETRIES), other methods only when `retries` is passed.
+        The last response is returned whatever its status; connection errors
+        and timeouts are raised once the retries are used up.
+        """
+        method = method.upper()
+        if retries is None:
+            retries = HTTP_RETRIES if method in IDEMPOTENT_METHODS else 0
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        host = (urlsplit(url).hostname or "").lower()
+
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                async with self._slot(host):
+                    async with self._get_session().request(method, url, **kwargs) as resp:
+                        body = await resp.read()
+                        response = HttpResponse(resp.status, resp.headers, body)
+                if attempt >= retries or response.status not in retry_statuses:
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt >= retries:
+                    raise
+            attempt += 1
+            HTTP_CLIENT_RETRIES.inc(host)
+            await asyncio.sleep(_backoff(attempt, retry_after))
+
+    async def get(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request("POST", url, **kwargs)
+
+    async def get_json(self, url: str, **kwargs):
+        """GET and decode JSON; raises HttpError on a non-2xx reply"""
+        response = await self.get(url, **kwargs)
+        if not response.ok:
+            raise HttpError(response.status, url)
+        return response.json()
+
+    async def close(self):
+        """Close the pooled connections (a later request opens a new session)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+def _backoff(attempt: int, retry_after: Optional[float]) -> float:
+    """Full-jitter exponential backoff; a Retry-After header sets the minimum (capped)"""
+    wait = random.uniform(0, min(HTTP_RETRY_MAX, HTTP_RETRY_BASE * 2 ** attempt))
+    if retry_after is not None:
+        wait = max(wait, min(retry_after, HTTP_RETRY_MAX))
+    return wait
+
+
+# One client per process, shared by the bot commands and the buy monitor
+HTTP = HttpClient()
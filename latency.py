@@ -0,0 +1,98 @@
+# UPDATE LATENCY TRACKING
+# Measures how long each update waits between arriving and reaching the handlers
+
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Dict
+
+from metrics import UPDATE_QUEUE_SECONDS
+
+# Number of recent samples kept for percentile reports
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "1000"))
+
+# Print a latency summary every N updates (0 disables)
+LATENCY_REPORT_EVERY = int(os.getenv("LATENCY_REPORT_EVERY", "500"))
+
+# Upper bound for arrival stamps that were never picked up by a handler
+MAX_PENDING_ARRIVALS = 10000
+
+
+class LatencyTracker:
+    """Rolling window of latency samples with percentile summaries"""
+
+    def __init__(self, name: str, window: int = LATENCY_WINDOW):
+        self.name = name
+        self.samples = deque(maxlen=window)
+        self.total = 0
+
+    def add(self, seconds: float):
+        """Record one latency sample in seconds"""
+        self.samples.append(seconds)
+        self.total += 1
+
+    def percentile(self, pct: float) -> float:
+        """Return the given percentile (0-100) of the current window in seconds"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def summary(self) -> dict:
+        """Return count and p50/p99/max in milliseconds"""
+        return {
+            "count": self.total,
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p99_ms": round(self.percentile(99) * 1000, 2),
+            "max_ms": round(max(self.samples, default=0.0) * 1000, 2),
+        }
+
+
+class TimedUpdateQueue(asyncio.Queue):
+    """Update queue that remembers when each update was enqueued"""
+
+    def __init__(self):
+        super().__init__()
+        self.arrivals: Dict[int, float] = {}
+
+    def put_nowait(self, item):
+        update_id = getattr(item, "update_id", None)
+        if update_id is not None:
+            if len(self.arrivals) >= MAX_PENDING_ARRIVALS:
+                self.arrivals.pop(next(iter(self.arrivals)))
+            self.arrivals[update_id] = time.perf_counter()
+        super().put_nowait(item)
+
+
+# Enqueue -> handler (exact, covers both polling and webhook mode)
+QUEUE_LATENCY = LatencyTracker("queue")
+
+# Telegram message date -> handler (1s resolution, includes long-poll delay)
+DELIVERY_LATENCY = LatencyTracker("delivery")
+
+
+def latency_report() -> dict:
+    """Snapshot of all update latency trackers"""
+    return {
+        QUEUE_LATENCY.name: QUEUE_LATENCY.summary(),
+        DELIVERY_LATENCY.name: DELIVERY_LATENCY.summary(),
+    }
+
+
+async def record_update_latency(update, context):
+    """Handler (group -2) that records update-to-handler latency"""
+    queue = context.application.update_queue
+    if isinstance(queue, TimedUpdateQueue):
+        arrived = queue.arrivals.pop(update.update_id, None)
+        if arrived is not None:
+            elapsed = time.perf_counter() - arrived
+            QUEUE_LATENCY.add(elapsed)
+            UPDATE_QUEUE_SECONDS.observe(elapsed)
+            if LATENCY_REPORT_EVERY and QUEUE_LATENCY.total % LATENCY_REPORT_EVERY == 0:
+                print(f"[LATENCY] {latency_report()}")
+
+    message = update.effective_message
+    if message and message.date:
+        DELIVERY_LATENCY.add(max(0.0, time.time() - message.date.timestamp()))
@@ -0,0 +1,252 @@
+# LEADER ELECTION
+# SQLite lease so that only one replica runs the background jobs
+# (GM/GN broadcasts, buy alerts). Every replica keeps serving commands.
+# All replicas must point LEADER_DB at the same file (shared volume).
+
+import os
+import time
+import socket
+import sqlite3
+import asyncio
+import threading
+from typing import Awaitable, Callable, Optional, Set
+
+from metrics import LEADER, LEADER_TERM, LEADER_LAST_FAILOVER
+
+# ===== CONFIGURATION =====
+LEADER_DB = os.getenv("LEADER_DB", os.getenv("STATS_DB", "weekly_stats.db"))
+LEASE_NAME = "background"
+
+# A lease not renewed within this many seconds can be taken over
+LEASE_TTL = float(os.getenv("LEADER_LEASE_TTL", "15"))
+
+# How often the holder renews (and followers retry). Must be well below LEASE_TTL.
+HEARTBEAT_INTERVAL = float(os.getenv("LEADER_HEARTBEAT", "5"))
+
+REPLICA_ID = os.getenv("REPLICA_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+# SQLite busy timeout; a renewal can block this long on a locked database
+DB_TIMEOUT = 5.0
+
+
+# Database files with the lease tables in place (this process)
+_schema_ready: Set[str] = set()
+_schema_lock = threading.Lock()
+
+
+def _setup_schema(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS leader_lease (
+        name TEXT PRIMARY KEY,
+        holder TEXT,
+        term INTEGER,
+        acquired_at REAL,
+        expires_at REAL
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS leader_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """)
+
+
+def _connect(db_path: str, timeout: float = DB_TIMEOUT) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+    if db_path not in _schema_ready:
+        with _schema_lock:
+            if db_path not in _schema_ready:
+                _setup_schema(conn)
+                _schema_ready.add(db_path)
+    return conn
+
+
+def load_shared_state(key: str, db_path: str = LEADER_DB) -> Optional[str]:
+    """Read a value shared by all replicas (e.g. last GM date)"""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT value FROM leader_state WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+def save_shared_state(key: str, value: str, db_path: str = LEADER_DB):
+    """Write a value shared by all replicas"""
+    conn = _connect(db_path)
+    try:
+        conn.execute("""
+        INSERT INTO leader_state (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value=excluded.value
+        """, (key, value))
+    finally:
+        conn.close()
+
+
+class LeaderElector:
+    """
+    Lease-based leader election with heartbeats.
+    Failover is bounded by LEASE_TTL + HEARTBEAT_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        on_elected: Callable[[], Awaitable[None]],
+        on_demoted: Callable[[], Awaitable[None]],
+        db_path: str = LEADER_DB,
+        replica_id: str = REPLICA_ID,
+        lease_ttl: float = LEASE_TTL,
+        heartbeat_interval: float = HEARTBEAT_INTERVAL,
+    ):
+        if heartbeat_interval * 2 > lease_ttl:
+            raise ValueError("LEADER_HEARTBEAT must be at most half of LEADER_LEASE_TTL")
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.db_path = db_path
+        self.replica_id = replica_id
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = heartbeat_interval
+        # Longest a renewal may block, kept short enough that a healthy leader never hits the margin below
+        self.renew_timeout = max(0.5, min(DB_TIMEOUT, lease_ttl - 2 * heartbeat_interval))
+        self.is_leader = False
+        self.running = False
+        self.term = 0
+        self.holder: Optional[str] = None
+        self.lease_expires_at: float = 0
+        self.last_heartbeat: float = 0
+        self.last_failover_seconds: Optional[float] = None
+        self.elections_won = 0
+        LEADER.set(self.replica_id, value=0)
+
+    def _try_acquire(self) -> dict:
+        """Acquire or renew the lease; returns the lease row after the attempt"""
+        conn = _connect(self.db_path, self.renew_timeout)
+        try:
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT holder, term, expires_at FROM leader_lease WHERE name=?",
+                (LEASE_NAME,)
+            ).fetchone()
+
+            vacancy = None
+            if row is None:
+                holder, term, expires_at = self.replica_id, 1, now + self.lease_ttl
+                conn.execute(
+                    "INSERT INTO leader_lease (name, holder, term, acquired_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (LEASE_NAME, holder, term, now, expires_at)
+                )
+            elif row[0] == self.replica_id and row[2] > now:
+                holder, term, expires_at = self.replica_id, row[1], now + self.lease_ttl
+                conn.execute(
+                    "UPDATE leader_lease SET expires_at=? WHERE name=?",
+                    (expires_at, LEASE_NAME)
+                )
+            elif row[2] <= now:
+                # Previous holder stopped renewing: take over with a new term
+                vacancy = now - row[2]
+                holder, term, expires_at = self.replica_id, row[1] + 1, now + self.lease_ttl
+                conn.execute(
+                    "UPDATE leader_lease SET holder=?, term=?, acquired_at=?, expires_at=? WHERE name=?",
+                    (holder, term, now, expires_at, LEASE_NAME)
+                )
+            else:
+                holder, term, expires_at = row
+            conn.execute("COMMIT")
+            return {"holder": holder, "term": term, "expires_at": expires_at, "vacancy": vacancy}
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _release(self):
+        """Expire our lease immediately so a follower can take over without waiting"""
+        conn = _connect(self.db_path)
+        try:
+            conn.execute(
+                "UPDATE leader_lease SET expires_at=0 WHERE name=? AND holder=?",
+                (LEASE_NAME, self.replica_id)
+            )
+        finally:
+            conn.close()
+
+    async def run(self):
+        """Heartbeat loop: renew while leader, retry while follower"""
+        self.running = True
+        print(f"[LEADER] Replica {self.replica_id} joining election (ttl={self.lease_ttl}s)")
+
+        while self.running:
+            try:
+                lease = await asyncio.to_thread(self._try_acquire)
+                self.holder = lease["holder"]
+                self.term = lease["term"]
+                LEADER_TERM.set(value=self.term)
+                if lease["holder"] == self.replica_id:
+                    self.lease_expires_at = lease["expires_at"]
+                    self.last_heartbeat = time.time()
+                    if not self.is_leader:
+                        await self._become_leader(lease["vacancy"])
+                elif self.is_leader:
+                    print(f"[LEADER] Lease taken by {lease['holder']} (term {lease['term']})")
+                    await self._step_down()
+            except Exception as e:
+                print(f"[LEADER] Heartbeat error: {e}")
+
+            # Never act as leader on an expired lease (e.g. DB unreachable): step down now if the
+            # lease could lapse before the next renewal (one heartbeat plus a renewal that blocks)
+            if self.is_leader and time.time() + self.heartbeat_interval + self.renew_timeout >= self.lease_expires_at:
+                print(f"[LEADER] Lease expires in {self.lease_expires_at - time.time():.1f}s and was not renewed, "
+                      f"stepping down")
+                await self._step_down()
+
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def _become_leader(self, vacancy: Optional[float]):
+        self.is_leader = True
+        self.elections_won += 1
+        LEADER.set(self.replica_id, value=1)
+        if vacancy is not None:
+            # Time the lease sat expired, plus the TTL the old holder could not have renewed in
+            self.last_failover_seconds = vacancy + self.lease_ttl
+            LEADER_LAST_FAILOVER.set(value=self.last_failover_seconds)
+            print(f"[LEADER] Elected (term {self.term}) after failover, "
+                  f"background jobs resumed within ~{self.last_failover_seconds:.1f}s")
+        else:
+            print(f"[LEADER] Elected (term {self.term})")
+        try:
+            await self.on_elected()
+        except Exception as e:
+            print(f"[LEADER] on_elected failed: {e}")
+
+    async def _step_down(self):
+        self.is_leader = False
+        LEADER.set(self.replica_id, value=0)
+        try:
+            await self.on_demoted()
+        except Exception as e:
+            print(f"[LEADER] on_demoted failed: {e}")
+
+    async def stop(self):
+        """Leave the election and hand the lease over"""
+        self.running = False
+        if self.is_leader:
+            await self._step_down()
+            try:
+                await asyncio.to_thread(self._release)
+            except Exception as e:
+                print(f"[LEADER] Failed to release lease: {e}")
+
+    def status(self) -> dict:
+        """Current election state for health endpoints"""
+        return {
+            "replica_id": self.replica_id,
+            "is_leader": self.is_leader,
+            "holder": self.holder,
+            "term": self.term,
+            "lease_expires_in": round(self.lease_expires_at - time.time(), 1) if self.is_leader else None,
+            "last_failover_seconds": self.last_failover_seconds,
+            "elections_won": self.elections_won,
+        }
@@ -0,0 +1,114 @@
+# LIFECYCLE
+# Every long-running background task is started through LIFECYCLE.spawn, and
+# every component with state to save registers a shutdown hook. On SIGTERM
+# (post_stop, while the bot can still reach Telegram) the hooks run stage by
+# stage: stop taking new work, flush buffered writes, checkpoint what is
+# still pending, close connections. The whole shutdown shares one deadline;
+# tasks still running after the hooks are cancelled and awaited, so nothing
+# is left to be killed mid-write when the process exits.
+
+import os
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List
+
+# ===== CONFIGURATION =====
+# Kubernetes/Railway send SIGKILL 30s after SIGTERM by default; stay well inside that
+SHUTDOWN_DEADLINE_SECONDS = float(os.getenv("SHUTDOWN_DEADLINE_SECONDS", "10"))
+
+# Time kept back for each later stage, so a hung hook cannot starve the flush and checkpoint
+SHUTDOWN_STAGE_RESERVE_SECONDS = 1.0
+
+# Shutdown stages, run in this order; hooks of one stage run concurrently
+STOP_INTAKE = 0  # leader lease, GM/GN, buy monitor: no new work after this
+FLUSH = 1        # buffered rows and open welcome waves
+CHECKPOINT = 2   # pending work the next process picks up
+CLOSE = 3        # HTTP sessions, listeners
+
+STAGE_NAMES = {STOP_INTAKE: "stop intake", FLUSH: "flush", CHECKPOINT: "checkpoint", CLOSE: "close"}
+
+
+@dataclass(slots=True)
+class ShutdownHook:
+    stage: int
+    name: str
+    hook: Callable[[], Awaitable]
+
+
+class Lifecycle:
+    """Tracks background tasks and runs shutdown hooks in stages under one deadline"""
+
+    def __init__(self):
+        self.tasks: Dict[asyncio.Task, str] = {}
+        self.hooks: List[ShutdownHook] = []
+        self.stopping = False
+        self.report: Dict[str, str] = {}  # hook or task -> outcome of the last shutdown
+
+    def spawn(self, coro, name: str) -> asyncio.Task:
+        """Start a background task that shutdown waits for (or cancels)"""
+        task = asyncio.create_task(coro, name=name)
+        self.tasks[task] = name
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task):
+        name = self.tasks.pop(task, task.get_name())
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[LIFECYCLE] Task {name} failed: {task.exception()!r}")
+
+    def on_shutdown(self, stage: int, name: str, hook: Callable[[], Awaitable]):
+        """Run `hook()` in `stage` at shutdown (a hook registered twice under one name runs once)"""
+        self.hooks = [h for h in self.hooks if h.name != name]
+        self.hooks.append(ShutdownHook(stage, name, hook))
+
+    async def _run_hook(self, hook: ShutdownHook, deadline: float):
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(hook.hook(), max(0.0, deadline - started))
+            outcome = "ok" if result is None else f"ok ({result})"
+        except asyncio.TimeoutError:
+            outcome = "timed out"
+        except Exception as e:
+            outcome = f"failed: {e!r}"
+        self.report[hook.name] = f"{outcome}, {(time.monotonic() - started) * 1000:.0f}ms"
+
+    async def shutdown(self, deadline_seconds: float = SHUTDOWN_DEADLINE_SECONDS):
+        """Run every stage's hooks, then cancel the tasks still running; returns the report"""
+        if self.stopping:
+            return self.report
+        self.stopping = True
+        started = time.monotonic()
+        deadline = started + deadline_seconds
+        print(f"[LIFECYCLE] Shutting down: {len(self.hooks)} hook(s), {len(self.tasks)} task(s), "
+              f"deadline {deadline_seconds:g}s")
+
+        stages = sorted({h.stage for h in self.hooks})
+        for i, stage in enumerate(stages):
+            hooks = [h for h in self.hooks if h.stage == stage]
+            reserve = (len(stages) - 1 - i) * min(SHUTDOWN_STAGE_RESERVE_SECONDS, deadline_seconds / len(stages))
+            await asyncio.gather(*(self._run_hook(h, deadline - reserve) for h in hooks))
+            print(f"[LIFECYCLE] {STAGE_NAMES.get(stage, stage)}: "
+                  + ", ".join(f"{h.name} {self.report[h.name]}" for h in hooks))
+
+        # Whatever is left (e.g. the election heartbeat sleeping) has nothing to save
+        current = asyncio.current_task()
+        leftover = [task for task in self.tasks if task is not current and not task.done()]
+        for task in leftover:
+            task.cancel()
+        if leftover:
+            done, pending = await asyncio.wait(leftover, timeout=max(0.1, deadline - time.monotonic()))
+            for task in pending:
+                self.report[self.tasks.get(task, task.get_name())] = "still running at exit"
+            print(f"[LIFECYCLE] Cancelled {len(leftover)} task(s): "
+                  + ", ".join(sorted(task.get_name() for task in leftover)))
+
+        elapsed = time.monotonic() - started
+        problems = [f"{name} {outcome}" for name, outcome in self.report.items() if not outcome.startswith("ok")]
+        print(f"[LIFECYCLE] Shutdown finished in {elapsed * 1000:.0f}ms"
+              + (f", problems: {'; '.join(problems)}" if problems else ""))
+        return self.report
+
+
+# One lifecycle per process
+LIFECYCLE = Lifecycle()
@@ -0,0 +1,195 @@
+# MEDIA DERIVATIVES
+# Photos the bot uploads (buy.png, newweb.png, nft.jpg, qrcodes/) are
+# re-encoded once into Telegram-sized JPEGs (longest side 1280 px, the
+# size Telegram keeps anyway, metadata stripped) and cached on disk under
+# the hash of the source bytes, so a changed file gets a new derivative
+# and an unchanged one is never re-encoded. Sends use the derivative.
+# Pillow is optional: without it the originals are sent as before.
+#
+#   python media.py            # build derivatives and report the savings
+
+import os
+import io
+import sys
+import hashlib
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# ===== CONFIGURATION =====
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", "media_cache")
+
+# "jpeg" or "webp"
+MEDIA_FORMAT = os.getenv("MEDIA_FORMAT", "jpeg").strip().lower()
+MEDIA_MAX_SIDE = int(os.getenv("MEDIA_MAX_SIDE", "1280"))
+MEDIA_QUALITY = int(os.getenv("MEDIA_QUALITY", "85"))
+
+# Photos prepared at startup; anything else sent through MEDIA is prepared on first use
+MEDIA_ASSETS = ["buy.png", "newweb.png", "nft.jpg", "qrcodes"]
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+# Part of the cache key, so changing the settings builds new derivatives
+_SETTINGS = f"{MEDIA_FORMAT}-{MEDIA_MAX_SIDE}-q{MEDIA_QUALITY}"
+
+
+@dataclass(slots=True)
+class Derivative:
+    """Optimised copy of one source file"""
+    source: str
+    path: str  # what to send: the derivative, or the source if it could not be made smaller
+    source_bytes: int
+    size_bytes: int
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.source_bytes - self.size_bytes
+
+
+_pil = None
+
+
+def _pillow():
+    """(Image, ImageOps), or None without Pillow; imported on first use so importing bot stays fast"""
+    global _pil
+    if _pil is None:
+        try:
+            from PIL import Image, ImageOps
+            _pil = (Image, ImageOps)
+        except ImportError:
+            _pil = ()
+    return _pil or None
+
+
+def _encode(data: bytes) -> bytes:
+    """Resize, drop metadata and re-encode (transparency is flattened onto white)"""
+    Image, ImageOps = _pillow()
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((MEDIA_MAX_SIDE, MEDIA_MAX_SIDE), Image.LANCZOS)
+        out = io.BytesIO()
+        if MEDIA_FORMAT == "webp":
+            img.save(out, "WEBP", quality=MEDIA_QUALITY, method=6)
+        else:
+            img.save(out, "JPEG", quality=MEDIA_QUALITY, optimize=True, progressive=True)
+        return out.getvalue()
+
+
+class MediaLibrary:
+    """Source path -> Derivative, rebuilt when the source file changes"""
+
+    def __init__(self, cache_dir: str = MEDIA_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._derivatives: Dict[str, Tuple[Tuple[int, int], Derivative]] = {}  # path -> ((mtime_ns, size), ...)
+        self._lock = threading.Lock()
+        self._warned = False
+
+    def _cached(self, source: str, stat) -> Optional[Derivative]:
+        entry = self._derivatives.get(source)
+        if entry and entry[0] == (stat.st_mtime_ns, stat.st_size):
+            return entry[1]
+        return None
+
+    def derivative(self, source: str) -> Derivative:
+        """Derivative of a photo, made (or found in the disk cache) if the source is new or changed (blocking)"""
+        stat = os.stat(source)
+        found = self._cached(source, stat)
+        if found:
+            return found
+        with self._lock:
+            found = self._cached(source, stat)
+            if found:
+                return found
+            found = self._build(source, stat.st_size)
+            self._derivatives[source] = ((stat.st_mtime_ns, stat.st_size), found)
+            return found
+
+    def _build(self, source: str, source_bytes: int) -> Derivative:
+        unchanged = Derivative(source, source, source_bytes, source_bytes)
+        if _pillow() is None:
+            if not self._warned:
+                print("[MEDIA] Pillow not installed, sending original files")
+                self._warned = True
+            return unchanged
+
+        with open(source, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data + _SETTINGS.encode()).hexdigest()[:20]
+        extension = ".webp" if MEDIA_FORMAT == "webp" else ".jpg"
+        path = os.path.join(self.cache_dir, digest + extension)
+        if not os.path.exists(path):
+            try:
+                encoded = _encode(data)
+            except Exception as e:
+                print(f"[MEDIA] Could not optimise {source}: {e}")
+                return unchanged
+            if len(encoded) >= source_bytes:
+                return unchanged
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Written under a temporary name so a crash never leaves a half file in the cache
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(encoded)
+            os.replace(tmp, path)
+        return Derivative(source, path, source_bytes, os.path.getsize(path))
+
+    def path(self, source: str) -> str:
+        """File to upload for a photo (blocking, see get)"""
+        try:
+            return self.derivative(source).path
+        except OSError:
+            return source
+
+    async def get(self, source: str) -> str:
+        """File to upload for a photo; encoding runs in a thread the first time"""
+        entry = self._derivatives.get(source)
+        if entry:
+            try:
+                stat = os.stat(source)
+                if entry[0] == (stat.st_mtime_ns, stat.st_size):
+                    return entry[1].path
+            except OSError:
+                return source
+        return await asyncio.to_thread(self.path, source)
+
+    def prepare(self, sources: List[str] = MEDIA_ASSETS) -> List[Derivative]:
+        """Build derivatives for files and directories of photos (blocking, run at startup)"""
+        done = []
+        for source in sources:
+            if os.path.isdir(source):
+                files = sorted(os.path.join(source, name) for name in os.listdir(source))
+            else:
+                files = [source]
+            for path in files:
+                if path.lower().endswith(PHOTO_EXTENSIONS) and os.path.isfile(path):
+                    done.append(self.derivative(path))
+        return done
+
+
+def report(derivatives: List[Derivative]) -> str:
+    """Per-asset byte savings as a table"""
+    lines = [f"{'asset':<24} {'original':>10} {'sent':>10} {'saved':>7}"]
+    for d in derivatives:
+        saved = d.saved_bytes / d.source_bytes if d.source_bytes else 0
+        lines.append(f"{d.source:<24} {d.source_bytes / 1024:>8.0f}KB {d.size_bytes / 1024:>8.0f}KB {saved:>7.0%}")
+    total_source = sum(d.source_bytes for d in derivatives)
+    total_sent = sum(d.size_bytes for d in derivatives)
+    if total_source:
+        lines.append(f"{'total':<24} {total_source / 1024:>8.0f}KB {total_sent / 1024:>8.0f}KB "
+                     f"{1 - total_sent / total_source:>7.0%}")
+    return "\n".join(lines)
+
+
+# One library per process
+MEDIA = MediaLibrary()
+
+
+if __name__ == "__main__":
+    print(report(MEDIA.prepare(sys.argv[1:] or MEDIA_ASSETS)))
@@ -0,0 +1,248 @@
+# METRICS
+# Handler latency, upstream call timings and buy-alert lag,
+# exposed in Prometheus text format on a local HTTP endpoint
+
+import os
+import time
+import bisect
+import functools
+from typing import Dict, List, Tuple
+
+from telegram.ext import ApplicationHandlerStop
+from telegram.request import HTTPXRequest
+
+# ===== CONFIGURATION =====
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 (default) disables the endpoint
+
+# Handlers slower than this are logged individually
+SLOW_HANDLER_SECONDS = float(os.getenv("SLOW_HANDLER_SECONDS", "2"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LAG_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 45, 60, 120, 300)
+
+_registry: List["_Metric"] = []
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic counter with optional labels"""
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def get(self, *label_values: str) -> float:
+        return self.values.get(label_values, 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+    kind = "gauge"
+
+    def set(self, *label_values: str, value: float):
+        self.values[label_values] = value
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram with optional labels"""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self.series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+def render_metrics() -> str:
+    """All registered metrics in Prometheus text format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ===== BOT METRICS =====
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Handler callback latency", ("handler",))
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Handler callbacks that raised", ("handler",))
+UPSTREAM_SECONDS = Histogram("bot_upstream_seconds", "Outbound API call latency", ("service", "call"))
+UPSTREAM_ERRORS = Counter("bot_upstream_errors_total", "Failed outbound API calls", ("service", "call"))
+HTTP_CLIENT_RETRIES = Counter("bot_http_retries_total", "Outbound HTTP requests retried", ("host",))
+USER_PROFILE_UPSERTS = Counter("bot_user_profile_upserts_total", "users table upserts written or skipped",
+                               ("result",))
+WELCOME_MESSAGES = Counter("bot_welcome_messages_total", "Welcome messages sent, one per join wave", ("kind",))
+CHART_REQUESTS = Counter("bot_chart_requests_total", "/chart images rendered, served from cache or unavailable",
+                         ("result",))
+UPDATE_QUEUE_SECONDS = Histogram("bot_update_queue_seconds", "Update enqueue to handler latency")
+BUY_MONITOR_CYCLE = Histogram("buy_monitor_cycle_seconds", "One buy monitor polling pass")
+BUY_MONITOR_SWAPS = Counter("buy_monitor_swaps_total", "Swaps parsed by the buy monitor", ("token", "side"))
+ALERT_DELIVERIES = Counter("buy_alert_deliveries_total", "Alert outbox delivery results", ("result",))
+ALERT_MESSAGES = Counter("buy_alert_messages_total", "Alert messages sent, single buys or digests", ("kind",))
+ALERT_OUTBOX_PENDING = Gauge("buy_alert_outbox_pending", "Alerts waiting in the outbox")
+BUY_ALERT_LAG = Histogram("buy_alert_lag_seconds", "Swap blockTime to alert sent", buckets=LAG_BUCKETS)
+BUY_MONITOR_POLL_INTERVAL = Gauge("buy_monitor_poll_interval_seconds", "Current polling interval", ("token",))
+RPC_CALLS = Counter("solana_rpc_calls_total", "JSON-RPC calls sent (each batch item counts)", ("method",))
+RPC_RATE_LIMITED = Counter("solana_rpc_rate_limited_total", "Rate-limit replies (HTTP 429) from the RPC endpoint")
+RPC_WAIT_SECONDS = Counter("solana_rpc_wait_seconds_total", "Time spent waiting for the RPC rate limit or backoff")
+RPC_BUDGET_USED = Gauge("solana_rpc_budget_used", "JSON-RPC calls spent today (UTC)")
+RPC_BUDGET_REMAINING = Gauge("solana_rpc_budget_remaining", "JSON-RPC calls left today (-1 = no daily budget)")
+LEADER = Gauge("bot_leader", "1 while this replica holds the background-jobs lease", ("replica",))
+LEADER_TERM = Gauge("bot_leader_term", "Lease term last seen by this replica")
+LEADER_LAST_FAILOVER = Gauge("bot_leader_last_failover_seconds",
+                             "Upper bound on the background-jobs outage before this replica last took over")
+
+
+class track_upstream:
+    """
+    Times one outbound call: `with track_upstream("dexscreener", "pair") as call:`.
+    Exceptions count as errors; call.fail() marks a bad response explicitly.
+    """
+
+    __slots__ = ("service", "call", "started", "failed")
+
+    def __init__(self, service: str, call: str = ""):
+        self.service = service
+        self.call = call
+        self.failed = False
+
+    def fail(self):
+        self.failed = True
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        UPSTREAM_SECONDS.observe(time.perf_counter() - self.started, self.service, self.call)
+        if exc_type is not None or self.failed:
+            UPSTREAM_ERRORS.inc(self.service, self.call)
+        return False
+
+
+def _instrument_callback(callback):
+    name = getattr(callback, "__name__", repr(callback))
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except ApplicationHandlerStop:
+            raise
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            HANDLER_SECONDS.observe(elapsed, name)
+            if elapsed >= SLOW_HANDLER_SECONDS:
+                chat = update.effective_chat.id if getattr(update, "effective_chat", None) else None
+                print(f"[SLOW HANDLER] {name} took {elapsed:.2f}s (chat {chat})")
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def instrument_handlers(application):
+    """Wrap the callback of every handler registered on the application"""
+    count = 0
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            if not getattr(handler.callback, "__instrumented__", False):
+                handler.callback = _instrument_callback(handler.callback)
+                count += 1
+    print(f"[METRICS] Instrumented {count} handler(s)")
+
+
+class InstrumentedHTTPXRequest(HTTPXRequest):
+    """Bot API request backend that times every Telegram call"""
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        with track_upstream("telegram", api_method):
+            return await super().do_request(url, method, request_data, *args, **kwargs)
+
+
+_runner = None  # aiohttp AppRunner once started
+
+
+async def start_metrics_server():
+    """Serve /metrics on METRICS_LISTEN:METRICS_PORT"""
+    global _runner
+    if METRICS_PORT <= 0 or _runner is not None:
+        return
+    # Imported here so that importing metrics (and bot) does not pull in aiohttp
+    from aiohttp import web
+
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+    web_app = web.Application()
+    web_app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(web_app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, METRICS_LISTEN, METRICS_PORT).start()
+    except OSError as e:
+        # Port taken (e.g. another replica on this host): run without metrics rather than not at all
+        print(f"[METRICS] Cannot listen on {METRICS_LISTEN}:{METRICS_PORT}, metrics disabled: {e}")
+        await runner.cleanup()
+        return
+    _runner = runner
+    print(f"[METRICS] Serving http://{METRICS_LISTEN}:{METRICS_PORT}/metrics")
+
+
+async def stop_metrics_server():
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
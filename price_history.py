@@ -0,0 +1,299 @@
+# PRICE HISTORY
+# Price samples recorded by the buy monitor (every swap, plus a DexScreener
+# reading at least every PRICE_SAMPLE_SECONDS) kept as OHLC candles in three
+# tiers: 1 minute, 15 minutes and 1 hour, each with its own retention.
+# /pricecheck stats and /chart images are answered from here without any
+# upstream call. Samples are aggregated in memory and merged into SQLite in
+# batches, like the swap history.
+
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from token_registry import PRIMARY_TOKEN
+
+# ===== CONFIGURATION =====
+PRICE_DB = os.getenv("PRICE_DB", os.getenv("STATS_DB", "weekly_stats.db"))
+
+# Candle width (seconds) -> how long candles of that width are kept
+PRICE_TIERS = {
+    60: 2 * 86400,
+    900: 30 * 86400,
+    3600: 365 * 86400,
+}
+
+# The monitor takes a DexScreener reading at least this often, swaps or not
+PRICE_SAMPLE_SECONDS = float(os.getenv("PRICE_SAMPLE_SECONDS", "60"))
+
+# Buffered candles are merged into the table this often
+PRICE_FLUSH_SECONDS = float(os.getenv("PRICE_FLUSH_SECONDS", "10"))
+PRICE_PRUNE_SECONDS = 3600
+
+# Stored data older than this is not used to answer /pricecheck
+PRICE_FRESH_SECONDS = float(os.getenv("PRICE_FRESH_SECONDS", "300"))
+
+
+# Database files whose candle tables exist (checked once per process)
+_schema_ready: Set[str] = set()
+_schema_lock = threading.Lock()
+
+
+def _setup_schema(conn: sqlite3.Connection):
+    # One row per token, tier and bucket; WITHOUT ROWID keeps it to the key and the values
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS price_candles (
+        mint TEXT,
+        tier INTEGER,
+        bucket INTEGER,
+        open REAL,
+        high REAL,
+        low REAL,
+        close REAL,
+        volume_usd REAL,
+        samples INTEGER,
+        open_at REAL,
+        close_at REAL,
+        PRIMARY KEY (mint, tier, bucket)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS price_latest (
+        mint TEXT PRIMARY KEY,
+        price_usd REAL,
+        market_cap REAL,
+        liquidity_usd REAL,
+        updated_at REAL
+    )
+    """)
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=10)
+    if db_path not in _schema_ready:
+        with _schema_lock:
+            if db_path not in _schema_ready:
+                _setup_schema(conn)
+                _schema_ready.add(db_path)
+    return conn
+
+
+@dataclass(slots=True)
+class Candle:
+    """OHLC of one bucket (or of the samples since the last flush, while buffered)"""
+    bucket: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume_usd: float = 0.0
+    samples: int = 1
+    # Times of the open and close samples: swaps arrive newest first, so order is not arrival order
+    open_at: float = 0.0
+    close_at: float = 0.0
+
+
+@dataclass(slots=True)
+class PriceStats:
+    """Figures /pricecheck shows, from stored candles"""
+    price_usd: float
+    market_cap: float
+    liquidity_usd: float
+    updated_at: float
+    change_1h: Optional[float]  # percent
+    change_24h: Optional[float]
+    high_24h: float
+    low_24h: float
+    volume_24h: float
+
+
+def tier_for(seconds: float) -> int:
+    """Narrowest tier that covers a range in at most ~200 candles"""
+    for tier in sorted(PRICE_TIERS):
+        if seconds / tier <= 200:
+            return tier
+    return max(PRICE_TIERS)
+
+
+class PriceHistory:
+    """Buffered candle writer and queries for the price tables"""
+
+    def __init__(self, db_path: str = PRICE_DB, flush_interval: float = PRICE_FLUSH_SECONDS):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        # Samples since the last flush: (mint, tier, bucket) -> candle
+        self.pending: Dict[Tuple[str, int, int], Candle] = {}
+        self.latest: Dict[str, tuple] = {}  # mint -> (price, market cap, liquidity, time), not yet written
+        self.last_prune: float = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def record(self, mint: str, price_usd: float, timestamp: float, volume_usd: float = 0.0,
+               market_cap: Optional[float] = None, liquidity_usd: Optional[float] = None):
+        """Add one price sample (and the USD volume of the swap behind it, if any) to every tier"""
+        if price_usd <= 0:
+            return
+        for tier in PRICE_TIERS:
+            bucket = int(timestamp // tier * tier)
+            self._merge((mint, tier, bucket), Candle(bucket, price_usd, price_usd, price_usd, price_usd,
+                                                     volume_usd, 1, timestamp, timestamp))
+        # Newest price; market cap and liquidity from whichever sample last carried them
+        price, market, liquidity, at = self.latest.get(mint, (0.0, 0.0, 0.0, 0.0))
+        if timestamp >= at:
+            price, at = price_usd, timestamp
+        self.latest[mint] = (price, market_cap or market, liquidity_usd or liquidity, at)
+
+    def _merge(self, key: Tuple[str, int, int], new: Candle):
+        """Fold a candle into the buffered one of the same bucket (same rules as the UPSERT)"""
+        candle = self.pending.get(key)
+        if candle is None:
+            self.pending[key] = new
+            return
+        candle.high = max(candle.high, new.high)
+        candle.low = min(candle.low, new.low)
+        candle.volume_usd += new.volume_usd
+        candle.samples += new.samples
+        if new.open_at < candle.open_at:
+            candle.open, candle.open_at = new.open, new.open_at
+        if new.close_at >= candle.close_at:
+            candle.close, candle.close_at = new.close, new.close_at
+
+    def _write(self, candles: Dict[Tuple[str, int, int], Candle], latest: Dict[str, tuple], prune: bool) -> int:
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                # Buffered candles only hold the samples since the last flush: extend high/low,
+                # keep whichever open and close is earlier/later, add up volume and samples
+                conn.executemany("""
+                INSERT INTO price_candles (mint, tier, bucket, open, high, low, close, volume_usd, samples,
+                                           open_at, close_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(mint, tier, bucket) DO UPDATE SET
+                    open = CASE WHEN excluded.open_at < open_at THEN excluded.open ELSE open END,
+                    high = MAX(high, excluded.high),
+                    low = MIN(low, excluded.low),
+                    close = CASE WHEN excluded.close_at >= close_at THEN excluded.close ELSE close END,
+                    volume_usd = volume_usd + excluded.volume_usd,
+                    samples = samples + excluded.samples,
+                    open_at = MIN(open_at, excluded.open_at),
+                    close_at = MAX(close_at, excluded.close_at)
+                """, [(mint, tier, c.bucket, c.open, c.high, c.low, c.close, c.volume_usd, c.samples,
+                       c.open_at, c.close_at) for (mint, tier, _), c in candles.items()])
+                conn.executemany("""
+                INSERT INTO price_latest (mint, price_usd, market_cap, liquidity_usd, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(mint) DO UPDATE SET
+                    price_usd = excluded.price_usd,
+                    market_cap = CASE WHEN excluded.market_cap > 0 THEN excluded.market_cap ELSE market_cap END,
+                    liquidity_usd = CASE WHEN excluded.liquidity_usd > 0 THEN excluded.liquidity_usd
+                                         ELSE liquidity_usd END,
+                    updated_at = excluded.updated_at
+                WHERE excluded.updated_at >= updated_at
+                """, [(mint, *values) for mint, values in latest.items()])
+            return self._prune(conn) if prune else 0
+        finally:
+            conn.close()
+
+    def _prune(self, conn: sqlite3.Connection) -> int:
+        now = time.time()
+        removed = 0
+        with conn:
+            for tier, keep in PRICE_TIERS.items():
+                removed += conn.execute("DELETE FROM price_candles WHERE tier = ? AND bucket < ?",
+                                        (tier, int(now - keep))).rowcount
+        return removed
+
+    async def flush(self):
+        """Merge everything buffered into the tables in one transaction"""
+        async with self._lock:
+            if not self.pending and not self.latest:
+                return
+            candles, latest = self.pending, self.latest
+            self.pending, self.latest = {}, {}
+            prune = time.time() - self.last_prune >= PRICE_PRUNE_SECONDS
+            try:
+                removed = await asyncio.to_thread(self._write, candles, latest, prune)
+            except Exception as e:
+                print(f"[PRICES] Failed to write {len(candles)} candle(s): {e}")
+                # Put them back, merged with whatever was recorded meanwhile
+                for key, c in candles.items():
+                    self._merge(key, c)
+                for mint, values in latest.items():
+                    self.latest.setdefault(mint, values)
+                return
+            if prune:
+                self.last_prune = time.time()
+                if removed:
+                    print(f"[PRICES] Pruned {removed} old candle(s)")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Start the periodic flush task"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush task and write whatever is still buffered"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    # ===== QUERIES (blocking, run them with asyncio.to_thread) =====
+    def candles(self, since: float, tier: int, mint: str = PRIMARY_TOKEN.mint) -> List[Candle]:
+        """Stored candles of one tier from a timestamp on, oldest first"""
+        conn = _connect(self.db_path)
+        try:
+            rows = conn.execute("""
+            SELECT bucket, open, high, low, close, volume_usd, samples, open_at, close_at
+            FROM price_candles
+            WHERE mint = ? AND tier = ? AND bucket >= ?
+            ORDER BY bucket
+            """, (mint, tier, int(since // tier * tier))).fetchall()
+            return [Candle(*row) for row in rows]
+        finally:
+            conn.close()
+
+    def stats(self, mint: str = PRIMARY_TOKEN.mint, now: Optional[float] = None) -> Optional[PriceStats]:
+        """Latest quote with 1h/24h change, range and volume; None without fresh data"""
+        now = time.time() if now is None else now
+        conn = _connect(self.db_path)
+        try:
+            latest = conn.execute("SELECT price_usd, market_cap, liquidity_usd, updated_at FROM price_latest "
+                                  "WHERE mint = ?", (mint,)).fetchone()
+        finally:
+            conn.close()
+        if not latest or now - latest[3] > PRICE_FRESH_SECONDS:
+            return None
+        price, market_cap, liquidity, updated_at = latest
+
+        hour = self.candles(now - 3600, 60, mint)
+        day = self.candles(now - 86400, 900, mint)
+
+        def change(candles: List[Candle]) -> Optional[float]:
+            if not candles or candles[0].open <= 0:
+                return None
+            return (price / candles[0].open - 1) * 100
+
+        return PriceStats(
+            price_usd=price,
+            market_cap=market_cap,
+            liquidity_usd=liquidity,
+            updated_at=updated_at,
+            change_1h=change(hour),
+            change_24h=change(day),
+            high_24h=max([c.high for c in day] + [price]),
+            low_24h=min([c.low for c in day] + [price]),
+            volume_24h=sum(c.volume_usd for c in day),
+        )
+
+
+# Written by the monitor, read by /pricecheck and /chart (on any replica)
+PRICE_HISTORY = PriceHistory()
@@ -0,0 +1,165 @@
+# POOL PRICING
+# Token/SOL price taken straight from the Raydium pool vault balances
+# visible in every parsed swap, so alert figures are as fresh as the swap
+# itself. DexScreener is only polled for slow-moving data (SOL/USD, supply).
+
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from solana_tx import ParsedTransaction, TokenBalance
+
+# ===== CONFIGURATION =====
+# Owner of every Raydium AMM v4 pool vault
+RAYDIUM_AUTHORITY = "5Q544fKrFoe6tsEbD7S8EmxGTJYAKtTVhAW5Q5pge4j1"
+
+# Vault token accounts of the SUOLALA/SOL pool. Optional: learned from the
+# first swap that touches exactly one SUOLALA and one WSOL Raydium vault
+POOL_TOKEN_VAULT = os.getenv("POOL_TOKEN_VAULT") or None
+POOL_SOL_VAULT = os.getenv("POOL_SOL_VAULT") or None
+
+# How long DexScreener market data (SOL/USD, supply) is reused
+MARKET_DATA_TTL = float(os.getenv("MARKET_DATA_TTL", "120"))
+
+
+@dataclass(slots=True)
+class PoolReserves:
+    """Pool vault balances after one swap"""
+    token_reserve: float
+    sol_reserve: float
+    token_delta: float  # change in the pool's token vault (negative on a buy)
+    sol_delta: float  # change in the pool's WSOL vault (positive on a buy)
+    slot: int
+    block_time: int
+
+    @property
+    def price_sol(self) -> float:
+        return self.sol_reserve / self.token_reserve if self.token_reserve > 0 else 0.0
+
+
+@dataclass(slots=True)
+class MarketData:
+    """Slow-moving fields from DexScreener"""
+    sol_price_usd: float
+    token_supply: float  # FDV / price, used to turn the pool price into market cap
+    price_usd: float  # DexScreener's own price, only used before the first swap is seen
+    liquidity_usd: float
+    fetched_at: float
+
+
+class PoolPriceEngine:
+    """
+    Tracks the latest pool reserves from parsed transactions.
+    Readings older (by slot) than the current one are ignored, since the
+    monitor walks signatures newest-first.
+    """
+
+    def __init__(self, token_mint: str, quote_mint: str,
+                 token_vault: Optional[str] = POOL_TOKEN_VAULT,
+                 sol_vault: Optional[str] = POOL_SOL_VAULT,
+                 market_ttl: float = MARKET_DATA_TTL, symbol: str = "SUOLALA"):
+        self.symbol = symbol
+        self.token_mint = token_mint
+        self.quote_mint = quote_mint
+        self.token_vault = token_vault
+        self.sol_vault = sol_vault
+        self.market_ttl = market_ttl
+        self.reserves: Optional[PoolReserves] = None
+        self.market: Optional[MarketData] = None
+        self.updated_at: float = 0
+
+    def _find_vaults(self, balances: Tuple[TokenBalance, ...]) -> Optional[Tuple[TokenBalance, TokenBalance]]:
+        """The pool's token and WSOL vault entries among pre- or post-token balances"""
+        token_vaults, sol_vaults = [], []
+        for balance in balances:
+            if balance.owner != RAYDIUM_AUTHORITY:
+                continue
+            if balance.mint == self.token_mint:
+                token_vaults.append(balance)
+            elif balance.mint == self.quote_mint:
+                sol_vaults.append(balance)
+
+        if self.token_vault and self.sol_vault:
+            token = next((b for b in token_vaults if b.account == self.token_vault), None)
+            sol = next((b for b in sol_vaults if b.account == self.sol_vault), None)
+            return (token, sol) if token and sol else None
+
+        # Multi-hop routes can touch other Raydium pools' WSOL vaults, so only
+        # learn the vaults from an unambiguous swap
+        if len(token_vaults) == 1 and len(sol_vaults) == 1:
+            self.token_vault, self.sol_vault = token_vaults[0].account, sol_vaults[0].account
+            print(f"[PRICING] {self.symbol} pool vaults: {self.token_vault} ({self.symbol}), {self.sol_vault} (SOL)")
+            return token_vaults[0], sol_vaults[0]
+        return None
+
+    def observe(self, tx: ParsedTransaction) -> Optional[PoolReserves]:
+        """Update the pool price from a parsed swap; returns its reserves if it touched the pool"""
+        post = self._find_vaults(tx.post_token_balances)
+        if not post:
+            return None
+        pre = self._find_vaults(tx.pre_token_balances)
+
+        token_reserve, sol_reserve = post[0].amount, post[1].amount
+        token_delta = token_reserve - pre[0].amount if pre else 0.0
+        sol_delta = sol_reserve - pre[1].amount if pre else 0.0
+        reading = PoolReserves(
+            token_reserve=token_reserve,
+            sol_reserve=sol_reserve,
+            token_delta=token_delta,
+            sol_delta=sol_delta,
+            slot=tx.slot,
+            block_time=tx.block_time or int(time.time()),
+        )
+        if reading.token_reserve <= 0 or reading.sol_reserve <= 0:
+            return None
+        if self.reserves is None or reading.slot >= self.reserves.slot:
+            self.reserves = reading
+            self.updated_at = time.time()
+        return reading
+
+    def market_stale(self) -> bool:
+        return self.market is None or time.time() - self.market.fetched_at >= self.market_ttl
+
+    def set_market(self, pair: dict, sol_price_usd: float = 0.0):
+        """Store DexScreener pair data; sol_price_usd overrides the pair-derived SOL price"""
+        price_usd = float(pair.get("priceUsd") or 0)
+        price_native = float(pair.get("priceNative") or 0)
+        fdv = float(pair.get("fdv") or 0)
+        liquidity = pair.get("liquidity") or {}
+        if not sol_price_usd and price_native > 0:
+            sol_price_usd = price_usd / price_native
+        self.market = MarketData(
+            sol_price_usd=sol_price_usd,
+            token_supply=fdv / price_usd if price_usd > 0 else 0.0,
+            price_usd=price_usd,
+            liquidity_usd=float(liquidity.get("usd") or 0),
+            fetched_at=time.time(),
+        )
+
+    @property
+    def sol_price_usd(self) -> float:
+        return self.market.sol_price_usd if self.market else 0.0
+
+    def quote(self) -> Optional[Tuple[float, float, float, str]]:
+        """(price_usd, market_cap, liquidity_usd, source) from the freshest data available"""
+        if not self.market or self.market.sol_price_usd <= 0:
+            return None
+        sol_usd = self.market.sol_price_usd
+        if self.reserves:
+            price_usd = self.reserves.price_sol * sol_usd
+            # Both sides of a constant-product pool hold equal value
+            liquidity_usd = 2 * self.reserves.sol_reserve * sol_usd
+            return price_usd, price_usd * self.market.token_supply, liquidity_usd, "pool"
+        price_usd = self.market.price_usd
+        return price_usd, price_usd * self.market.token_supply, self.market.liquidity_usd, "dexscreener"
+
+    def status(self) -> dict:
+        """Current pricing state for health endpoints"""
+        return {
+            "pool_price_sol": self.reserves.price_sol if self.reserves else None,
+            "pool_slot": self.reserves.slot if self.reserves else None,
+            "pool_age_seconds": round(time.time() - self.updated_at, 1) if self.reserves else None,
+            "sol_price_usd": self.sol_price_usd,
+            "market_age_seconds": round(time.time() - self.market.fetched_at, 1) if self.market else None,
+        }
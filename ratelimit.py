@@ -0,0 +1,163 @@
+# COMMAND RATE LIMITING
+# Per-user, per-chat and global token buckets in front of the command handlers
+
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+# ===== CONFIGURATION =====
+# Burst size (tokens) and refill rate (tokens per second) for each scope
+USER_BURST = float(os.getenv("RATE_USER_BURST", "6"))
+USER_RATE = float(os.getenv("RATE_USER_PER_SEC", "0.2"))
+CHAT_BURST = float(os.getenv("RATE_CHAT_BURST", "20"))
+CHAT_RATE = float(os.getenv("RATE_CHAT_PER_SEC", "1"))
+GLOBAL_BURST = float(os.getenv("RATE_GLOBAL_BURST", "60"))
+GLOBAL_RATE = float(os.getenv("RATE_GLOBAL_PER_SEC", "5"))
+
+# Token cost per command: upstream HTTP calls and media uploads cost more
+COMMAND_COSTS = {
+    "pricecheck": 2,
+    "suolala": 2,
+    "translate": 3,
+    "randomnft": 3,
+    "whales": 2,
+    "wallet": 2,
+}
+DEFAULT_COMMAND_COST = 1
+
+# Sweep idle buckets after this many checks
+SWEEP_EVERY = 500
+
+
+class TokenBucket:
+    """Classic token bucket, refilled lazily on access"""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float, now: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def has(self, cost: float, now: float) -> bool:
+        """Check whether cost tokens are available without taking them"""
+        self._refill(now)
+        return self.tokens >= cost
+
+    def take(self, cost: float, now: float):
+        """Remove cost tokens (caller checked has() first)"""
+        self._refill(now)
+        self.tokens -= cost
+
+    def retry_after(self, cost: float, now: float) -> float:
+        """Seconds until cost tokens will be available"""
+        self._refill(now)
+        if self.tokens >= cost or self.rate <= 0:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        """A full bucket is indistinguishable from a new one and can be dropped"""
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class CommandRateLimiter:
+    """
+    Admits a command only if the user, chat and global buckets can all pay its cost.
+    State is O(active users + active chats): refilled buckets are swept away.
+    """
+
+    def __init__(
+        self,
+        user_limits: Tuple[float, float] = (USER_BURST, USER_RATE),
+        chat_limits: Tuple[float, float] = (CHAT_BURST, CHAT_RATE),
+        global_limits: Tuple[float, float] = (GLOBAL_BURST, GLOBAL_RATE),
+        costs: Optional[Dict[str, float]] = None,
+    ):
+        self.user_limits = user_limits
+        self.chat_limits = chat_limits
+        self.costs = COMMAND_COSTS if costs is None else costs
+        self.global_bucket = TokenBucket(*global_limits, time.monotonic())
+        self.user_buckets: Dict[int, TokenBucket] = {}
+        self.chat_buckets: Dict[int, TokenBucket] = {}
+        self.notified_until: Dict[int, float] = {}
+        self._checks = 0
+        self.allowed = 0
+        self.shed = 0
+
+    def cost(self, command: str) -> float:
+        return self.costs.get(command, DEFAULT_COMMAND_COST)
+
+    def check(self, user_id: int, chat_id: int, command: str, now: Optional[float] = None) -> Tuple[bool, str, float]:
+        """
+        Try to admit one command.
+        Returns (allowed, limiting scope, seconds until it would be allowed).
+        """
+        now = time.monotonic() if now is None else now
+        cost = self.cost(command)
+
+        self._checks += 1
+        if self._checks % SWEEP_EVERY == 0:
+            self.sweep(now)
+
+        user_bucket = self.user_buckets.get(user_id)
+        if user_bucket is None:
+            user_bucket = self.user_buckets[user_id] = TokenBucket(*self.user_limits, now)
+        chat_bucket = self.chat_buckets.get(chat_id)
+        if chat_bucket is None:
+            chat_bucket = self.chat_buckets[chat_id] = TokenBucket(*self.chat_limits, now)
+
+        # All-or-nothing: a denied command must not drain the other buckets
+        for scope, bucket in (("user", user_bucket), ("chat", chat_bucket), ("global", self.global_bucket)):
+            if not bucket.has(cost, now):
+                self.shed += 1
+                return False, scope, bucket.retry_after(cost, now)
+
+        user_bucket.take(cost, now)
+        chat_bucket.take(cost, now)
+        self.global_bucket.take(cost, now)
+        self.allowed += 1
+        return True, "", 0.0
+
+    def should_notify(self, user_id: int, retry_after: float, now: Optional[float] = None) -> bool:
+        """True once per cooldown period per user, so shedding stays cheap"""
+        now = time.monotonic() if now is None else now
+        if self.notified_until.get(user_id, 0) > now:
+            return False
+        self.notified_until[user_id] = now + retry_after
+        return True
+
+    def sweep(self, now: Optional[float] = None):
+        """Drop buckets that have refilled and expired cooldown notices"""
+        now = time.monotonic() if now is None else now
+        for buckets in (self.user_buckets, self.chat_buckets):
+            for key in [k for k, b in buckets.items() if b.is_full(now)]:
+                del buckets[key]
+        for key in [k for k, until in self.notified_until.items() if until <= now]:
+            del self.notified_until[key]
+
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "shed": self.shed,
+            "tracked_users": len(self.user_buckets),
+            "tracked_chats": len(self.chat_buckets),
+        }
+
+
+def command_name(text: str, bot_username: Optional[str]) -> Optional[str]:
+    """Extract the command from '/cmd@bot args'; None if addressed to another bot"""
+    if not text or not text.startswith("/"):
+        return None
+    head = text.split()[0][1:]
+    name, _, target = head.partition("@")
+    if target and bot_username and target.lower() != bot_username.lower():
+        return None
+    return name.lower()
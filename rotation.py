@@ -0,0 +1,220 @@
+# CONTENT ROTATION
+# No-repeat picks per chat for motivations, keyword auto-replies and the
+# /suolala images. Each (chat, deck) is a shuffled deck dealt one card per
+# pick: nothing repeats until every item has been shown, and the next
+# shuffle never starts with the card just dealt. A deck is stored as
+# (seed, size, cursor), the permutation is rebuilt from the seed, so the
+# table stays a few bytes per chat and rotation survives restarts.
+# Cursors are written in batches; chats idle for ROTATION_IDLE_SECONDS
+# are dropped from memory (and reloaded from the table when they return).
+
+import os
+import time
+import random
+import sqlite3
+import asyncio
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+# ===== CONFIGURATION =====
+ROTATION_DB = os.getenv("ROTATION_DB", os.getenv("STATS_DB", "weekly_stats.db"))
+
+# Decks kept in memory, and how long an unused one stays
+ROTATION_MAX_DECKS = int(os.getenv("ROTATION_MAX_DECKS", "10000"))
+ROTATION_IDLE_SECONDS = float(os.getenv("ROTATION_IDLE_SECONDS", "3600"))
+
+# Dealt cards are written this often (a crash costs at most this much rotation progress)
+ROTATION_FLUSH_SECONDS = float(os.getenv("ROTATION_FLUSH_SECONDS", "30"))
+
+DeckKey = Tuple[int, str]  # (chat_id, deck name)
+
+
+# Database files already set up by this process
+_schema_ready: Set[str] = set()
+_schema_lock = threading.Lock()
+
+
+def _setup_schema(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS rotation_decks (
+        chat_id INTEGER,
+        deck TEXT,
+        seed INTEGER,
+        size INTEGER,
+        cursor INTEGER,
+        PRIMARY KEY (chat_id, deck)
+    ) WITHOUT ROWID
+    """)
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=10)
+    if db_path not in _schema_ready:
+        with _schema_lock:
+            if db_path not in _schema_ready:
+                _setup_schema(conn)
+                _schema_ready.add(db_path)
+    return conn
+
+
+def _shuffled(seed: int, size: int) -> array:
+    order = list(range(size))
+    random.Random(seed).shuffle(order)
+    return array("I", order)  # 4 bytes per card instead of a list of int objects
+
+
+@dataclass(slots=True)
+class Deck:
+    """One chat's position in one rotation"""
+    seed: int
+    size: int
+    cursor: int  # cards dealt from the current shuffle
+    order: array = field(default_factory=lambda: array("I"))  # rebuilt from the seed, not stored
+    last_used: float = 0.0  # monotonic
+    dirty: bool = False
+
+    def __post_init__(self):
+        if not self.order:
+            self.order = _shuffled(self.seed, self.size)
+
+    def reshuffle(self):
+        """New shuffle that does not start with the card just dealt"""
+        last = self.order[-1] if self.order else None
+        while True:
+            self.seed = random.getrandbits(31)
+            self.order = _shuffled(self.seed, self.size)
+            if self.size < 2 or self.order[0] != last:
+                break
+        self.cursor = 0
+
+    def deal(self) -> int:
+        if self.cursor >= self.size:
+            self.reshuffle()
+        card = self.order[self.cursor]
+        self.cursor += 1
+        self.dirty = True
+        return card
+
+
+class RotationEngine:
+    """Per-chat shuffled decks, cached in memory and persisted in SQLite"""
+
+    def __init__(self, db_path: str = ROTATION_DB, max_decks: int = ROTATION_MAX_DECKS,
+                 idle_seconds: float = ROTATION_IDLE_SECONDS, flush_interval: float = ROTATION_FLUSH_SECONDS):
+        self.db_path = db_path
+        self.max_decks = max(1, max_decks)
+        self.idle_seconds = idle_seconds
+        self.flush_interval = flush_interval
+        self.decks: "OrderedDict[DeckKey, Deck]" = OrderedDict()  # least recently used first
+        self.evicted: Dict[DeckKey, tuple] = {}  # unwritten (seed, size, cursor) of dropped decks
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self.decks)
+
+    def _load(self, key: DeckKey) -> Optional[tuple]:
+        conn = _connect(self.db_path)
+        try:
+            return conn.execute("SELECT seed, size, cursor FROM rotation_decks WHERE chat_id = ? AND deck = ?",
+                                key).fetchone()
+        finally:
+            conn.close()
+
+    async def pick(self, chat_id: int, deck: str, size: int) -> int:
+        """Index of the next item of a deck of `size` items for this chat"""
+        if size <= 1:
+            return 0
+        key = (chat_id, deck)
+        state = self.decks.get(key)
+        if state is None:
+            row, unwritten = self.evicted.pop(key, None), True
+            if row is None:
+                row, unwritten = await asyncio.to_thread(self._load, key), False
+                state = self.decks.get(key)  # another pick may have loaded it meanwhile
+            if state is None and row:
+                state = self.decks[key] = Deck(*row, dirty=unwritten)
+        if state is None or state.size != size:
+            # New chat, or the items changed: start a fresh shuffle
+            state = self.decks[key] = Deck(random.getrandbits(31), size, 0)
+        self.decks.move_to_end(key)
+        state.last_used = time.monotonic()
+        card = state.deal()
+        self._evict()
+        return card
+
+    async def choose(self, chat_id: int, deck: str, items: Sequence):
+        """Next item of a deck for this chat"""
+        return items[await self.pick(chat_id, deck, len(items))]
+
+    def _evict(self, now: Optional[float] = None):
+        """Drop decks over the size limit or idle too long; unwritten ones are kept for the next flush"""
+        now = time.monotonic() if now is None else now
+        while self.decks:
+            key, state = next(iter(self.decks.items()))
+            if len(self.decks) <= self.max_decks and now - state.last_used < self.idle_seconds:
+                break
+            del self.decks[key]
+            if state.dirty:
+                self.evicted[key] = (state.seed, state.size, state.cursor)
+
+    def _write(self, rows: List[tuple]):
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany("""
+                INSERT INTO rotation_decks (chat_id, deck, seed, size, cursor)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(chat_id, deck) DO UPDATE SET
+                    seed = excluded.seed, size = excluded.size, cursor = excluded.cursor
+                """, rows)
+        finally:
+            conn.close()
+
+    async def flush(self):
+        """Write every deck dealt from since the last flush, then drop idle ones"""
+        async with self._lock:
+            self._evict()
+            rows = [(*key, *values) for key, values in self.evicted.items()]
+            written = []
+            for key, state in self.decks.items():
+                if state.dirty:
+                    rows.append((*key, state.seed, state.size, state.cursor))
+                    written.append(state)
+            if not rows:
+                return
+            evicted, self.evicted = self.evicted, {}
+            for state in written:
+                state.dirty = False
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except Exception as e:
+                print(f"[ROTATION] Failed to write {len(rows)} deck(s): {e}")
+                for key, values in evicted.items():
+                    self.evicted.setdefault(key, values)
+                for state in written:
+                    state.dirty = True
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Start the periodic flush task"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush task and write what is still unwritten"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+
+# One engine per process, next to the bot's SQLite connection
+ROTATIONS = RotationEngine()
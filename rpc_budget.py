@@ -0,0 +1,165 @@
+# RPC BUDGET
+# Keeps the buy monitor inside the Solana RPC provider's limits: a calls-per-
+# second token bucket, an optional daily call budget spread over the rest of
+# the UTC day, and exponential backoff when the endpoint answers 429.
+# Also holds the adaptive polling interval: fast while new signatures keep
+# arriving, slower when a token is idle.
+
+import os
+import time
+import random
+import asyncio
+from typing import Optional
+
+from ratelimit import TokenBucket
+from metrics import RPC_CALLS, RPC_RATE_LIMITED, RPC_WAIT_SECONDS, RPC_BUDGET_USED, RPC_BUDGET_REMAINING
+
+# ===== CONFIGURATION =====
+# JSON-RPC calls per second (every item of a batch counts) and burst size
+RPC_MAX_RPS = float(os.getenv("RPC_MAX_RPS", "8"))
+RPC_BURST = float(os.getenv("RPC_BURST", "20"))
+
+# JSON-RPC calls per UTC day (0 = no daily budget)
+RPC_DAILY_BUDGET = int(os.getenv("RPC_DAILY_BUDGET", "0"))
+
+# After a 429: wait Retry-After or 2, 4, 8... seconds (whichever is longer), capped
+RPC_BACKOFF_BASE = 2.0
+RPC_BACKOFF_MAX = float(os.getenv("RPC_BACKOFF_MAX", "120"))
+
+# Polling interval per token: halved when new signatures arrive, grown by
+# a quarter after each idle poll, always within these bounds
+POLL_MIN_SECONDS = float(os.getenv("POLL_MIN_SECONDS", "1.5"))
+POLL_MAX_SECONDS = float(os.getenv("POLL_MAX_SECONDS", "15"))
+POLL_START_SECONDS = 5.0
+POLL_SPEEDUP = 0.5
+POLL_SLOWDOWN = 1.25
+
+
+def _utc_day() -> int:
+    return int(time.time() // 86400)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header in seconds (the HTTP-date form is ignored)"""
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+class RpcBudget:
+    """Rate limit, daily budget and 429 backoff shared by every RPC call of the monitor"""
+
+    def __init__(self, rps: float = RPC_MAX_RPS, burst: float = RPC_BURST, daily_budget: int = RPC_DAILY_BUDGET):
+        self.bucket = TokenBucket(max(1.0, burst), rps, time.monotonic()) if rps > 0 else None
+        self.daily_budget = daily_budget
+        self.day = _utc_day()
+        self.used_today = 0
+        self.blocked_until = 0.0  # monotonic; set by a 429
+        self.backoff_level = 0
+        self._publish()
+
+    def _roll_day(self):
+        day = _utc_day()
+        if day != self.day:
+            self.day, self.used_today = day, 0
+
+    def remaining_today(self) -> Optional[int]:
+        """Calls left today, None without a daily budget"""
+        self._roll_day()
+        if self.daily_budget <= 0:
+            return None
+        return max(0, self.daily_budget - self.used_today)
+
+    def _publish(self):
+        remaining = self.remaining_today()
+        RPC_BUDGET_USED.set(value=self.used_today)
+        RPC_BUDGET_REMAINING.set(value=-1 if remaining is None else remaining)
+
+    async def acquire(self, calls: int, method: str) -> bool:
+        """Wait until `calls` JSON-RPC calls may be sent; False if today's budget cannot cover them"""
+        remaining = self.remaining_today()
+        if remaining is not None and calls > remaining:
+            return False
+
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            wait = self.blocked_until - now
+            if wait <= 0 and self.bucket:
+                # A batch bigger than the burst waits for a full bucket and leaves it in debt
+                wait = self.bucket.retry_after(min(calls, self.bucket.capacity), now)
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+            waited += wait
+
+        if self.bucket:
+            self.bucket.take(calls, time.monotonic())
+        self.used_today += calls
+        RPC_CALLS.inc(method, amount=calls)
+        if waited:
+            RPC_WAIT_SECONDS.inc(amount=waited)
+        self._publish()
+        return True
+
+    def rate_limited(self, retry_after: Optional[float] = None) -> float:
+        """Record a 429 and hold every call; returns the hold in seconds"""
+        backoff = min(RPC_BACKOFF_MAX, RPC_BACKOFF_BASE * 2 ** self.backoff_level) * random.uniform(0.8, 1.2)
+        delay = max(backoff, retry_after or 0.0)
+        self.backoff_level += 1
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        RPC_RATE_LIMITED.inc()
+        return delay
+
+    def succeeded(self):
+        """A call went through, so the next 429 starts the backoff over"""
+        self.backoff_level = 0
+
+    def held_for(self) -> float:
+        """Seconds until calls are allowed again after a 429"""
+        return max(0.0, self.blocked_until - time.monotonic())
+
+    def pace_interval(self, calls_per_poll: float) -> float:
+        """Shortest polling interval that makes the rest of today's budget last until UTC midnight"""
+        remaining = self.remaining_today()
+        if remaining is None:
+            return 0.0
+        seconds_left = 86400 - time.time() % 86400
+        if remaining <= 0:
+            return seconds_left
+        return calls_per_poll * seconds_left / remaining
+
+    def status(self) -> dict:
+        """Current spend for health endpoints"""
+        return {
+            "calls_today": self.used_today,
+            "remaining_today": self.remaining_today(),
+            "backoff_seconds": round(self.held_for(), 1),
+        }
+
+
+class AdaptiveInterval:
+    """Polling interval that shrinks while new signatures keep arriving and grows when idle"""
+
+    __slots__ = ("seconds", "min_seconds", "max_seconds")
+
+    def __init__(self, start: float = POLL_START_SECONDS, min_seconds: float = POLL_MIN_SECONDS,
+                 max_seconds: float = POLL_MAX_SECONDS):
+        self.min_seconds = min_seconds
+        self.max_seconds = max(min_seconds, max_seconds)
+        self.seconds = min(self.max_seconds, max(min_seconds, start))
+
+    def update(self, new_signatures: int, page_full: bool = False) -> float:
+        """Adjust after a poll; a full page means we are falling behind, so go to the minimum"""
+        if page_full:
+            self.seconds = self.min_seconds
+        elif new_signatures:
+            self.seconds = max(self.min_seconds, self.seconds * POLL_SPEEDUP)
+        else:
+            self.seconds = min(self.max_seconds, self.seconds * POLL_SLOWDOWN)
+        return self.seconds
+
+
+# One budget per process: it outlives monitor restarts (e.g. a leadership change)
+RPC_BUDGET = RpcBudget()
@@ -0,0 +1,101 @@
+# SOLANA TRANSACTION DECODING
+# Compact typed views of getTransaction (jsonParsed) results. The monitor
+# only needs balances, account keys, program IDs, slot and blockTime, so
+# those are copied into __slots__ objects and the large nested dict is
+# dropped as soon as a response is decoded.
+
+import sys
+from dataclasses import dataclass
+from typing import Collection, FrozenSet, Optional, Tuple
+
+
+@dataclass(slots=True)
+class TokenBalance:
+    """One entry of pre/postTokenBalances"""
+    account: Optional[str]  # token account address
+    mint: str
+    owner: Optional[str]
+    amount: float  # in token units (raw / 10^decimals)
+
+
+@dataclass(slots=True)
+class ParsedTransaction:
+    """The parts of a getTransaction result the buy monitor reads"""
+    signature: str
+    slot: int
+    block_time: Optional[int]
+    failed: bool
+    account_keys: Tuple[str, ...]
+    pre_lamports: Tuple[int, ...]
+    post_lamports: Tuple[int, ...]
+    pre_token_balances: Tuple[TokenBalance, ...]
+    post_token_balances: Tuple[TokenBalance, ...]
+    program_ids: FrozenSet[str]  # programs of top-level and inner instructions
+
+    def invokes(self, programs: Collection[str]) -> bool:
+        """True if any of the programs is called or listed in the account keys"""
+        return any(p in self.program_ids for p in programs) or any(k in programs for k in self.account_keys)
+
+    def lamport_change(self, pubkey: str) -> Optional[int]:
+        """Post minus pre lamports of an account, None if it is not in the transaction"""
+        try:
+            i = self.account_keys.index(pubkey)
+            return self.post_lamports[i] - self.pre_lamports[i]
+        except (ValueError, IndexError):
+            return None
+
+
+def _amount(balance: dict) -> float:
+    amount = balance.get("uiTokenAmount") or {}
+    raw = amount.get("amount")
+    if raw is not None and amount.get("decimals") is not None:
+        return int(raw) / 10 ** int(amount["decimals"])
+    return float(amount.get("uiAmount") or 0)
+
+
+def _balances(entries: Optional[list], account_keys: Tuple[str, ...]) -> Tuple[TokenBalance, ...]:
+    if not entries:
+        return ()
+    count, intern = len(account_keys), sys.intern
+    balances = []
+    for entry in entries:
+        index = entry.get("accountIndex", -1)
+        owner = entry.get("owner")
+        balances.append(TokenBalance(
+            account_keys[index] if 0 <= index < count else None,
+            # Mints and owners (pools, authorities) repeat across transactions
+            intern(entry.get("mint") or ""),
+            intern(owner) if owner else None,
+            _amount(entry),
+        ))
+    return tuple(balances)
+
+
+def decode_transaction(result: Optional[dict], signature: str = "") -> Optional[ParsedTransaction]:
+    """ParsedTransaction from a jsonParsed getTransaction result (None for a missing transaction)"""
+    if not result:
+        return None
+    meta = result.get("meta") or {}
+    message = (result.get("transaction") or {}).get("message") or {}
+
+    account_keys = tuple(
+        sys.intern(key.get("pubkey", "") if isinstance(key, dict) else key)
+        for key in message.get("accountKeys") or ()
+    )
+    programs = {ix.get("programId") for ix in message.get("instructions") or ()}
+    for inner in meta.get("innerInstructions") or ():
+        programs.update(ix.get("programId") for ix in inner.get("instructions") or ())
+    programs.discard(None)
+
+    return ParsedTransaction(
+        signature=signature or next(iter((result.get("transaction") or {}).get("signatures") or ()), ""),
+        slot=result.get("slot") or 0,
+        block_time=result.get("blockTime"),
+        failed=meta.get("err") is not None,
+        account_keys=account_keys,
+        pre_lamports=tuple(meta.get("preBalances") or ()),
+        post_lamports=tuple(meta.get("postBalances") or ()),
+        pre_token_balances=_balances(meta.get("preTokenBalances"), account_keys),
+        post_token_balances=_balances(meta.get("postTokenBalances"), account_keys),
+        program_ids=frozenset(programs),
+    )
@@ -0,0 +1,72 @@
+# TOKEN REGISTRY
+# Tokens the buy monitor tracks. SUOLALA is always first (the primary token:
+# chats get its alerts by default and commands fall back to it); more can be
+# added with TRACKED_TOKENS, and chats opt in per token with /alerts.
+#
+#   TRACKED_TOKENS="BONK:<mint>:<dexscreener pair>,WIF:<mint>:<pair>[:<token vault>:<sol vault>]"
+
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from pricing import POOL_TOKEN_VAULT, POOL_SOL_VAULT
+
+# ===== CONFIGURATION =====
+SUOLALA_MINT = "CY1P83KnKwFYostvjQcoR2HJLyEJWRBRaVQmYyyD3cR8"
+
+# DexScreener pair address for SUOLALA/SOL
+DEXSCREENER_PAIR = "79Qaq5b1JfC8bFuXkAvXTR67fRPmMjMVNkEA3bb8bLzi"
+
+
+@dataclass(frozen=True)
+class TrackedToken:
+    """One token/SOL Raydium pair the monitor watches"""
+    symbol: str
+    mint: str
+    pair: str  # DexScreener pair address
+    token_vault: Optional[str] = None  # optional, learned from swaps otherwise
+    sol_vault: Optional[str] = None
+
+
+def parse_tracked_tokens(spec: str) -> List[TrackedToken]:
+    """Tokens from a TRACKED_TOKENS string; malformed entries are skipped"""
+    tokens = []
+    for entry in spec.split(","):
+        parts = [p.strip() for p in entry.strip().split(":")]
+        if len(parts) not in (3, 5) or not all(parts):
+            if entry.strip():
+                print(f"[TOKENS] Ignoring malformed TRACKED_TOKENS entry: {entry.strip()}")
+            continue
+        symbol, mint, pair = parts[:3]
+        vaults = parts[3:] or [None, None]
+        tokens.append(TrackedToken(symbol.upper(), mint, pair, *vaults))
+    return tokens
+
+
+def _load_tokens() -> List[TrackedToken]:
+    tokens = [TrackedToken("SUOLALA", SUOLALA_MINT, DEXSCREENER_PAIR, POOL_TOKEN_VAULT, POOL_SOL_VAULT)]
+    for token in parse_tracked_tokens(os.getenv("TRACKED_TOKENS", "")):
+        if any(t.mint == token.mint or t.symbol == token.symbol for t in tokens):
+            print(f"[TOKENS] Duplicate token {token.symbol} ignored")
+            continue
+        tokens.append(token)
+    return tokens
+
+
+TRACKED_TOKENS: List[TrackedToken] = _load_tokens()
+PRIMARY_TOKEN = TRACKED_TOKENS[0]
+TOKENS_BY_MINT: Dict[str, TrackedToken] = {t.mint: t for t in TRACKED_TOKENS}
+
+
+def find_token(symbol: Optional[str] = None) -> Optional[TrackedToken]:
+    """Tracked token by symbol (case-insensitive); no symbol means the primary token"""
+    if not symbol:
+        return PRIMARY_TOKEN
+    symbol = symbol.upper().lstrip("$")
+    return next((t for t in TRACKED_TOKENS if t.symbol == symbol), None)
+
+
+def token_symbol(mint: Optional[str]) -> str:
+    """Symbol for a mint (alerts queued before multi-token support have none)"""
+    token = TOKENS_BY_MINT.get(mint) if mint else None
+    return token.symbol if token else PRIMARY_TOKEN.symbol
@@ -0,0 +1,73 @@
+# CONCURRENT UPDATE PROCESSING
+# Runs updates from different chats in parallel while keeping each chat in order
+
+import os
+import asyncio
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# Maximum number of handlers running at the same time (1 = fully sequential)
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "32"))
+
+# PTB's own semaphore is taken before do_process_update and is not guaranteed to
+# wake waiters in order on Python 3.10, which would break per-chat ordering.
+# We keep it out of the way and enforce the real cap after the per-chat lock.
+_UNBOUNDED = 2 ** 31
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Concurrent update processor with FIFO ordering per chat"""
+
+    def __init__(self, concurrency_limit: int = MAX_CONCURRENT_UPDATES):
+        if concurrency_limit < 1:
+            raise ValueError("MAX_CONCURRENT_UPDATES must be a positive integer")
+        super().__init__(_UNBOUNDED)
+        self.concurrency_limit = concurrency_limit
+        self._slots = asyncio.Semaphore(concurrency_limit)
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_pending: Dict[int, int] = {}
+
+    @staticmethod
+    def _ordering_key(update: object) -> Optional[int]:
+        if isinstance(update, Update):
+            if update.effective_chat:
+                return update.effective_chat.id
+            if update.effective_user:
+                return update.effective_user.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self._ordering_key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        # Lock entry is synchronous up to the first await, so waiters queue in arrival order
+        lock = self._chat_locks.get(key)
+        if lock is None:
+            lock = self._chat_locks[key] = asyncio.Lock()
+        self._chat_pending[key] = self._chat_pending.get(key, 0) + 1
+        try:
+            async with lock:
+                async with self._slots:
+                    await coroutine
+        finally:
+            # Drop idle chats so state stays O(chats with pending updates)
+            self._chat_pending[key] -= 1
+            if self._chat_pending[key] == 0:
+                del self._chat_pending[key]
+                del self._chat_locks[key]
+
+    @property
+    def active_chats(self) -> int:
+        """Number of chats with updates queued or running"""
+        return len(self._chat_locks)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,63 @@
+# USER PROFILE CACHE
+# Last stored username/first_name per user, so track_messages only upserts
+# the users table when a profile actually changed (almost never) instead of
+# on every message. Bounded LRU, warmed from the table at startup.
+
+import os
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from metrics import USER_PROFILE_UPSERTS
+
+# ===== CONFIGURATION =====
+# Profiles kept in memory; the least recently seen users are evicted first
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "50000"))
+
+Profile = Tuple[Optional[str], Optional[str]]  # (username, first_name)
+
+
+class UserProfileCache:
+    """LRU of user_id -> (username, first_name) as stored in the users table"""
+
+    def __init__(self, max_size: int = USER_CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        self._profiles: "OrderedDict[int, Profile]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def warm(self, cur) -> int:
+        """Load stored profiles, most recently active users first; returns how many were cached"""
+        rows = cur.execute("""
+        SELECT u.user_id, u.username, u.first_name
+        FROM users u
+        LEFT JOIN (SELECT user_id, MAX(year_week) AS last_week FROM stats GROUP BY user_id) s
+            ON s.user_id = u.user_id
+        ORDER BY s.last_week DESC
+        LIMIT ?
+        """, (self.max_size,)).fetchall()
+        # Oldest first, so the most active users end up least likely to be evicted
+        for user_id, username, first_name in reversed(rows):
+            self.remember(user_id, username, first_name)
+        return len(rows)
+
+    def is_current(self, user_id: int, username: Optional[str], first_name: Optional[str]) -> bool:
+        """True if the users table already holds this profile (no upsert needed)"""
+        profile = self._profiles.get(user_id)
+        if profile is None or profile != (username, first_name):
+            USER_PROFILE_UPSERTS.inc("written")
+            return False
+        self._profiles.move_to_end(user_id)
+        USER_PROFILE_UPSERTS.inc("skipped")
+        return True
+
+    def remember(self, user_id: int, username: Optional[str], first_name: Optional[str]):
+        """Record a profile once it is committed to the users table"""
+        self._profiles[user_id] = (username, first_name)
+        self._profiles.move_to_end(user_id)
+        if len(self._profiles) > self.max_size:
+            self._profiles.popitem(last=False)
+
+
+# One cache per process, next to the bot's SQLite connection
+USER_PROFILES = UserProfileCache()
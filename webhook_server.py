@@ -0,0 +1,131 @@
+# WEBHOOK SERVING MODE
+# Embedded aiohttp server that feeds Telegram updates into the Application
+
+import os
+import hmac
+import json
+import signal
+import asyncio
+from typing import Callable, Dict
+from aiohttp import web
+
+from telegram import Update
+
+from latency import latency_report
+
+# ===== CONFIGURATION =====
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", os.getenv("PORT", "8080")))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+
+# Public base URL Telegram should call (e.g. https://bot.example.com).
+# Leave empty to run the server without registering a webhook (local testing).
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+
+# Sent back by Telegram in X-Telegram-Bot-Api-Secret-Token on every request.
+# Required in webhook mode (1-256 characters: A-Z, a-z, 0-9, _ and -)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Extra sections for /healthz, e.g. leader election status
+_health_providers: Dict[str, Callable[[], dict]] = {}
+
+
+def register_health_provider(name: str, provider: Callable[[], dict]):
+    """Add a named section to the /healthz response"""
+    _health_providers[name] = provider
+
+
+def create_web_app(application) -> web.Application:
+    """Build the aiohttp app with the update and health endpoints"""
+
+    async def handle_update(request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        if not WEBHOOK_SECRET or not hmac.compare_digest(token, WEBHOOK_SECRET):
+            return web.Response(status=403)
+
+        try:
+            data = await request.json()
+            if not isinstance(data, dict):
+                raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+            update = Update.de_json(data, application.bot)
+        except (json.JSONDecodeError, ValueError, TypeError, KeyError) as e:
+            print(f"[WEBHOOK] Rejected malformed update: {e}")
+            return web.Response(status=400)
+
+        if update is None:
+            return web.Response(status=400)
+
+        # Hand off immediately so Telegram gets its 200 without waiting on handlers
+        await application.update_queue.put(update)
+        return web.Response(status=200)
+
+    async def handle_health(request: web.Request) -> web.Response:
+        body = {
+            "status": "ok" if application.running else "starting",
+            "mode": "webhook",
+            "pending_updates": application.update_queue.qsize(),
+            "update_latency": latency_report(),
+        }
+        for name, provider in _health_providers.items():
+            try:
+                body[name] = provider()
+            except Exception as e:
+                body[name] = {"error": str(e)}
+        return web.json_response(body)
+
+    web_app = web.Application()
+    web_app.router.add_post(WEBHOOK_PATH, handle_update)
+    web_app.router.add_get("/healthz", handle_health)
+    return web_app
+
+
+async def run_webhook(application):
+    """Run the bot in webhook mode until SIGINT/SIGTERM"""
+    if not WEBHOOK_SECRET:
+        # The endpoint is public; without the secret anyone could post fake updates
+        raise SystemExit("[WEBHOOK] WEBHOOK_SECRET is not set, refusing to start in webhook mode")
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+
+    runner = web.AppRunner(create_web_app(application), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_LISTEN, WEBHOOK_PORT)
+    await site.start()
+    print(f"[WEBHOOK] Listening on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    if WEBHOOK_URL:
+        await application.bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=True,
+        )
+        print(f"[WEBHOOK] Registered webhook {WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}")
+    else:
+        print("[WEBHOOK] WEBHOOK_URL not set, skipping setWebhook (local mode)")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+
+    try:
+        await stop_event.wait()
+    finally:
+        print("[WEBHOOK] Shutting down")
+        await runner.cleanup()
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
@@ -0,0 +1,156 @@
+# WELCOME WAVES
+# Joins are buffered per chat for WELCOME_WINDOW_SECONDS and greeted with one
+# message mentioning everyone who joined, instead of one animation (and one
+# delete task) per user. During a raid that is one Bot API call per window
+# rather than per join. The animation is uploaded once per process; later
+# waves reuse the file_id Telegram returned.
+
+import os
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from telegram.error import BadRequest, RetryAfter
+from telegram.helpers import escape_markdown
+
+from deletions import DELETIONS
+from metrics import WELCOME_MESSAGES
+
+# ===== CONFIGURATION =====
+WELCOME_ANIMATION = os.getenv("WELCOME_ANIMATION", "welcome.gif")
+
+# Joins within this many seconds of the first one are greeted together
+WELCOME_WINDOW_SECONDS = float(os.getenv("WELCOME_WINDOW_SECONDS", "5"))
+
+# Welcome messages are deleted after this many seconds
+WELCOME_DELETE_SECONDS = 300
+
+# Members named in one message (the rest are counted), and the length of each name;
+# keeps the caption under Telegram's 1024 character limit
+WELCOME_MAX_MENTIONS = 20
+WELCOME_NAME_LENGTH = 32
+
+WELCOME_FOOTER = (
+    "🐉 **Welcome to 索拉拉 SUOLALA CTO**\n"
+    "💎 Stay strong. Stay patient."
+)
+
+
+@dataclass
+class JoinWave:
+    """Members who joined one chat during the current window"""
+    bot: object
+    members: Dict[int, str] = field(default_factory=dict)  # user_id -> first name, in join order
+    task: Optional[asyncio.Task] = None
+
+
+def format_welcome(members: Dict[int, str], markdown: bool = True) -> str:
+    """Welcome text naming the members (the first WELCOME_MAX_MENTIONS of them), as Markdown mentions or plain"""
+    mentions = []
+    for user_id, name in list(members.items())[:WELCOME_MAX_MENTIONS]:
+        name = (name or "fren")[:WELCOME_NAME_LENGTH]
+        mentions.append(f"[{escape_markdown(name)}](tg://user?id={user_id})" if markdown else name)
+    others = len(members) - len(mentions)
+    if others:
+        mentions.append(f"{others} more")
+    if len(mentions) > 1:
+        names = ", ".join(mentions[:-1]) + " and " + mentions[-1]
+    else:
+        names = mentions[0]
+    footer = WELCOME_FOOTER if markdown else WELCOME_FOOTER.replace("**", "")
+    return f"🎉 Welcome {names}!\n\n" + footer
+
+
+class WelcomeAggregator:
+    """Buffers joins per chat and sends one welcome per window"""
+
+    def __init__(self, window_seconds: float = WELCOME_WINDOW_SECONDS,
+                 delete_seconds: float = WELCOME_DELETE_SECONDS, animation_path: str = WELCOME_ANIMATION):
+        self.window_seconds = window_seconds
+        self.delete_seconds = delete_seconds
+        self.animation_path = animation_path
+        self.waves: Dict[int, JoinWave] = {}  # chat_id -> open wave
+        self.animation_file_id: Optional[str] = None
+        self.joins = 0
+        self.messages = 0
+
+    def add(self, bot, chat_id: int, users) -> int:
+        """Queue human members of a join for the chat's current wave; returns how many were queued"""
+        wave = self.waves.get(chat_id)
+        queued = 0
+        for user in users:
+            if user.is_bot:
+                continue
+            if wave is None:
+                wave = self.waves[chat_id] = JoinWave(bot)
+                wave.task = asyncio.create_task(self._close_later(chat_id, wave))
+            wave.members[user.id] = user.first_name
+            queued += 1
+        self.joins += queued
+        return queued
+
+    async def _close_later(self, chat_id: int, wave: JoinWave):
+        await asyncio.sleep(self.window_seconds)
+        if self.waves.get(chat_id) is wave:
+            del self.waves[chat_id]
+        await self._send(chat_id, wave)
+
+    async def flush(self):
+        """Send every open wave now (shutdown, benchmarks)"""
+        waves, self.waves = self.waves, {}
+        for wave in waves.values():
+            if wave.task:
+                wave.task.cancel()
+        await asyncio.gather(*(self._send(chat_id, wave) for chat_id, wave in waves.items()))
+
+    async def _send(self, chat_id: int, wave: JoinWave):
+        text = format_welcome(wave.members)
+        try:
+            try:
+                message = await self._send_once(wave.bot, chat_id, text)
+            except RetryAfter as e:
+                # Flood control during a raid: wait once as told, the wave stays one message
+                await asyncio.sleep(float(e.retry_after))
+                message = await self._send_once(wave.bot, chat_id, text)
+        except Exception as e:
+            print(f"[WELCOME] Welcome failed in chat {chat_id}, sending plain text: {e}")
+            try:
+                # Fallback without media or Markdown, still one message for the whole wave
+                message = await wave.bot.send_message(chat_id=chat_id, text=format_welcome(wave.members, False))
+                WELCOME_MESSAGES.inc("fallback")
+            except Exception as e2:
+                print(f"[WELCOME] Failed to welcome {len(wave.members)} member(s) in chat {chat_id}: {e2}")
+                WELCOME_MESSAGES.inc("failed")
+                return
+        self.messages += 1
+        DELETIONS.schedule(message, self.delete_seconds)
+
+    async def _send_once(self, bot, chat_id: int, text: str):
+        """Animation with the welcome as caption (cached file_id), or text if there is no animation"""
+        if self.animation_file_id:
+            try:
+                message = await bot.send_animation(chat_id=chat_id, animation=self.animation_file_id,
+                                                   caption=text, parse_mode="Markdown")
+                WELCOME_MESSAGES.inc("animation")
+                return message
+            except BadRequest as e:
+                # file_id no longer valid (e.g. a new bot token): upload again below
+                print(f"[WELCOME] Cached animation rejected, uploading again: {e}")
+                self.animation_file_id = None
+
+        if os.path.exists(self.animation_path):
+            with open(self.animation_path, "rb") as gif:
+                message = await bot.send_animation(chat_id=chat_id, animation=gif,
+                                                   caption=text, parse_mode="Markdown")
+            if message.animation:
+                self.animation_file_id = message.animation.file_id
+            WELCOME_MESSAGES.inc("animation_upload")
+            return message
+
+        message = await bot.send_message(chat_id=chat_id, text=text, parse_mode="Markdown")
+        WELCOME_MESSAGES.inc("text")
+        return message
+
+
+# One aggregator per process (joins are greeted by whichever replica receives the update)
+WELCOME_WAVES = WelcomeAggregator()